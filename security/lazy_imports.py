@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+⚡ LAZY IMPORTS - BACKENDS OPTIONNELS
+Agent: contains-test-analyzer + bmad-qa
+Focus: Démarrage rapide CLI sécurité (hooks courte durée)
+Les backends (redis, psycopg2, docker, prometheus_client...) ne sont importés
+qu'au premier accès: une commande qui ne les utilise pas ne les charge pas
+et fonctionne même s'ils ne sont pas installés.
+Les modules sécurité (noms de fichiers avec tirets) sont chargés ici, sous
+un nom unique dans sys.modules partagé par la CLI et la suite de tests.
+"""
+
+import importlib
+import importlib.util
+import sys
+from pathlib import Path
+
+SECURITY_DIR = Path(__file__).resolve().parent
+TESTING_LOGS_DIR = SECURITY_DIR.parent / 'logs' / 'testing'
+
+MONITORING_MODULE = ('bmad_realtime_security_monitoring', 'realtime-security-monitoring.py')
+TESTS_MODULE = ('bmad_security_tests_suite', 'security-tests-suite.py')
+
+
+class LazyModule:
+    """Proxy module importé au premier accès attribut"""
+    
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+        
+    def _load(self):
+        """Importe le module réel (une seule fois)"""
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+    
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+    
+    def __repr__(self) -> str:
+        state = 'chargé' if self._module is not None else 'différé'
+        return f"<LazyModule {self._name} ({state})>"
+
+
+def load_security_module(module_spec):
+    """Charge un module sécurité (nom de fichier avec tirets) à la demande, une seule fois"""
+    name, filename = module_spec
+    if name in sys.modules:
+        return sys.modules[name]
+    
+    if str(SECURITY_DIR) not in sys.path:
+        sys.path.insert(0, str(SECURITY_DIR))
+    spec = importlib.util.spec_from_file_location(name, SECURITY_DIR / filename)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    try:
+        spec.loader.exec_module(module)
+    except BaseException:
+        del sys.modules[name]
+        raise
+    return module
@@ -7,33 +7,149 @@ Framework: Zero-Trust Security Architecture
 """
 
 import asyncio
+import ctypes
+import ctypes.util
+import fnmatch
+import functools
 import json
 import logging
 import time
 import hashlib
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any, Tuple
+import ipaddress
+import os
+import re
+import signal
+import sqlite3
+import struct
+import sys
+import socket
+import threading
+import zlib
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional, Any, Awaitable, Callable, Set, Tuple
 from dataclasses import dataclass, asdict
-from collections import defaultdict, deque
-import psutil
-import redis
-import psycopg2
-from psycopg2.extras import RealDictCursor
-import aiofiles
-import aiohttp
-import websockets
-from prometheus_client import Counter, Histogram, Gauge, start_http_server
+from collections import OrderedDict, defaultdict, deque
+from pathlib import Path
+from zoneinfo import ZoneInfo
+from lazy_imports import LazyModule
+
+# Backends chargés au premier usage (démarrage rapide, dépendances optionnelles)
+psutil = LazyModule('psutil')
+redis = LazyModule('redis')
+psycopg2 = LazyModule('psycopg2')
+psycopg2_extras = LazyModule('psycopg2.extras')
+aiofiles = LazyModule('aiofiles')
+aiohttp = LazyModule('aiohttp')
+aiohttp_web = LazyModule('aiohttp.web')
+websockets = LazyModule('websockets')
+prometheus_client = LazyModule('prometheus_client')
+numpy = LazyModule('numpy')
+
+class LazyMetric:
+    """Métrique Prometheus enregistrée au premier usage"""
+    
+    # Métriques déclarées (source du générateur de dashboards / recording rules)
+    registry: List['LazyMetric'] = []
+    
+    def __init__(self, kind: str, name: str, documentation: str, labelnames: List[str] = (), **options):
+        self.kind = kind
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = list(labelnames)
+        self.options = options
+        self._metric = None
+        LazyMetric.registry.append(self)
+        
+    def __getattr__(self, attr: str):
+        if self._metric is None:
+            metric_class = getattr(prometheus_client, self.kind)
+            self._metric = metric_class(self.name, self.documentation, self.labelnames, **self.options)
+        return getattr(self._metric, attr)
+
+AUDIT_LOG_DIR = '/var/log/bmad/audit'
+AUDIT_LOG_NAME = 'mcp-audit.log'
+DEFAULT_PERMISSIONS_MATRIX = str(
+    Path(__file__).resolve().parent / 'permissions' / 'mcp-permissions-matrix-enterprise.json')
+DEFAULT_DETAILED_MATRIX = str(Path(__file__).resolve().parent / 'mcp-permissions-matrix-detailed.json')
+# Chemins surveillés (audit-logging-config.yaml: file_system_access.monitor_paths)
+DEFAULT_FS_MONITOR_PATHS = ['/workspace', '/projects', '/security']
+APPROVED_ENCRYPTION_AT_REST = ['AES-256-GCM', 'ChaCha20-Poly1305']
+SEGREGATION_CONFLICTS = [{'deploy', 'admin'}, {'audit', 'purge'}]
+# Méthode MCP -> permission requise (premier motif trouvé, 'read' sinon)
+METHOD_PERMISSIONS = [
+    ('admin', ('admin', 'grant', 'revoke', 'purge', 'drop', 'truncate')),
+    ('execute', ('exec', 'run', 'invoke')),
+    ('write', ('write', 'create', 'update', 'insert', 'delete', 'push', 'merge', 'put', 'set', 'edit', 'move')),
+]
+# Seuils de sévérité sur le score de risque cumulé
+SEVERITY_THRESHOLDS = [(12.0, 'CRITICAL'), (7.0, 'HIGH'), (4.0, 'MEDIUM')]
+# Agents synthétiques (agrégats, pics non attribués, contrôles système): hors sharding
+SYNTHETIC_AGENT_IDS = frozenset({'multiple', 'unknown', 'system'})
+# Fenêtre (s) d'identité des observations hôte relayées: une même observation par fenêtre
+HOST_EVENT_DEDUP_WINDOW = 60
+# Heures ouvrées par défaut (ancienne fenêtre 06h-22h59, fuseau audit-logging-config.yaml)
+DEFAULT_BUSINESS_HOURS = {'timezone': 'UTC', 'windows': [{'days': 'mon-sun', 'hours': '06-23'}]}
+# Processus serveurs MCP (sous-chaîne cmdline, cf. .mcp..json)
+DEFAULT_MCP_SERVER_PROCESSES = {
+    'github': '@modelcontextprotocol/server-github',
+    'filesystem': '@modelcontextprotocol/server-filesystem',
+    'memory': '@modelcontextprotocol/server-memory',
+    'postgres': '@modelcontextprotocol/server-postgres',
+    'firecrawl': 'firecrawl-mcp',
+    'motion': 'motion-ai',
+    'shadcn': 'shadcn@latest'
+}
+# Zones réseau par défaut (surchargées par config['network_zones'])
+DEFAULT_NETWORK_ZONES = {
+    'loopback': ['127.0.0.0/8', '::1/128'],
+    'private': ['10.0.0.0/8', '172.16.0.0/12', '192.168.0.0/16', 'fc00::/7']
+}
+
+def _text(value) -> str:
+    """Réponse Redis (bytes sans decode_responses) -> str"""
+    return value.decode() if isinstance(value, bytes) else str(value)
+
+@functools.lru_cache(maxsize=1024)
+def _username_for_uid(uid: int) -> str:
+    """Nom utilisateur d'un uid (mis en cache, uid brut si inconnu)"""
+    import pwd  # POSIX uniquement: chargé à la demande
+    try:
+        return pwd.getpwuid(uid).pw_name
+    except KeyError:
+        return str(uid)
 
 # Métriques Prometheus pour monitoring
-SECURITY_EVENTS = Counter('bmad_security_events_total', 
+SECURITY_EVENTS = LazyMetric('Counter', 'bmad_security_events_total', 
                          'Total security events', ['agent', 'event_type', 'severity'])
-AUTHENTICATION_ATTEMPTS = Counter('bmad_auth_attempts_total',
+AUTHENTICATION_ATTEMPTS = LazyMetric('Counter', 'bmad_auth_attempts_total',
                                 'Authentication attempts', ['agent', 'status'])
-AUTHORIZATION_DECISIONS = Counter('bmad_authz_decisions_total', 
+AUTHORIZATION_DECISIONS = LazyMetric('Counter', 'bmad_authz_decisions_total', 
                                 'Authorization decisions', ['agent', 'resource', 'decision'])
-RESPONSE_TIME = Histogram('bmad_mcp_response_time_seconds',
+RESPONSE_TIME = LazyMetric('Histogram', 'bmad_mcp_response_time_seconds',
                          'MCP server response times', ['server', 'method'])
-ACTIVE_SESSIONS = Gauge('bmad_active_sessions', 'Active agent sessions', ['agent'])
+ACTIVE_SESSIONS = LazyMetric('Gauge', 'bmad_active_sessions', 'Active agent sessions', ['agent'])
+EVENTS_SHED = LazyMetric('Counter', 'bmad_event_queue_shed_total',
+                         'Security events shed under load', ['severity', 'reason'])
+QUEUE_DEPTH = LazyMetric('Gauge', 'bmad_event_queue_depth', 'Event queue depth', ['severity'])
+DB_QUERIES = LazyMetric('Counter', 'bmad_db_queries_total', 'Database queries per agent', ['agent'])
+DB_QUERY_TIME = LazyMetric('Counter', 'bmad_db_query_time_seconds_total',
+                           'Database execution time per agent', ['agent'])
+DB_ROWS = LazyMetric('Counter', 'bmad_db_rows_total', 'Database rows per agent', ['agent'])
+MCP_PROCESS_CPU = LazyMetric('Gauge', 'bmad_mcp_process_cpu_percent',
+                             'MCP server processes CPU percent', ['server'])
+MCP_PROCESS_RSS = LazyMetric('Gauge', 'bmad_mcp_process_rss_bytes',
+                             'MCP server processes resident memory', ['server'])
+MCP_PROCESS_FDS = LazyMetric('Gauge', 'bmad_mcp_process_open_fds',
+                             'MCP server processes open file descriptors', ['server'])
+MCP_PROCESS_CONNECTIONS = LazyMetric('Gauge', 'bmad_mcp_process_connections',
+                                     'MCP server processes network connections', ['server'])
+PIPELINE_STAGE_SECONDS = LazyMetric(
+    'Histogram', 'bmad_pipeline_stage_seconds', 'Security pipeline stage durations', ['stage'],
+    buckets=(0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0))
+ENRICHMENT_CACHE = LazyMetric('Counter', 'bmad_enrichment_cache_total',
+                              'Enrichment cache lookups', ['cache', 'result'])
+FS_UNATTRIBUTED_ACCESSES = LazyMetric('Counter', 'bmad_fs_unattributed_accesses_total',
+                                      'File accesses without a resolved accessor', ['mode'])
 
 @dataclass
 class SecurityEvent:
@@ -63,14 +179,1974 @@ class ComplianceViolation:
     remediation_required: bool
     escalation_level: int
 
+class SeverityPriorityQueue:
+    """File d'événements multi-niveaux par sévérité avec délestage
+    
+    Un niveau par sévérité, capacité propre, FIFO à l'intérieur d'un niveau;
+    get() sert toujours le niveau le plus sévère. Sous pression, les
+    événements LOW sont agrégés (compteurs par agent/type) au lieu d'être
+    empilés. Un niveau MEDIUM plein replie d'abord les LOW encore en file
+    (il reprend leur place) et n'évince son plus ancien événement que
+    lorsqu'il ne reste aucun LOW en file.
+    Un producteur CRITICAL/HIGH n'attend que si son propre niveau est
+    saturé: il ne patiente jamais derrière des événements moins sévères.
+    """
+    
+    LEVELS = ['CRITICAL', 'HIGH', 'MEDIUM', 'LOW']
+    DEFAULT_CAPACITY = {'CRITICAL': 2000, 'HIGH': 2000, 'MEDIUM': 3000, 'LOW': 3000}
+    PRESSURE_THRESHOLD = 0.8  # taux de remplissage déclenchant l'agrégation LOW
+    MAX_AGGREGATES = 1000
+    LOSSLESS_LEVELS = ('CRITICAL', 'HIGH')  # niveau plein: le producteur attend, aucune perte
+    
+    def __init__(self, capacity: Optional[Dict[str, int]] = None):
+        self.capacity = {**self.DEFAULT_CAPACITY, **(capacity or {})}
+        self.total_capacity = sum(self.capacity.values())
+        self.levels = {level: deque() for level in self.LEVELS}
+        self.shed_counts = defaultdict(int)
+        self._low_aggregates = {}
+        self._size = 0
+        self._not_empty = asyncio.Event()
+        self._not_full = asyncio.Event()
+        self._not_full.set()
+        self.wait_observer: Optional[Callable[[float], None]] = None  # temps passé en file (instrumentation)
+        
+    def level_of(self, event: SecurityEvent) -> str:
+        """Niveau = sévérité déclarée, promue si le score de risque l'exige"""
+        level = event.severity if event.severity in self.levels else 'LOW'
+        if event.risk_score >= 9.0:
+            return 'CRITICAL'
+        if event.risk_score >= 7.0 and level in ('MEDIUM', 'LOW'):
+            return 'HIGH'
+        return level
+    
+    async def put(self, event: SecurityEvent):
+        while not self._offer(event):
+            self._not_full.clear()
+            await self._not_full.wait()
+    
+    def put_nowait(self, event: SecurityEvent):
+        if not self._offer(event):
+            raise asyncio.QueueFull
+    
+    async def get(self) -> SecurityEvent:
+        while self.empty():
+            self._not_empty.clear()
+            await self._not_empty.wait()
+        return self.get_nowait()
+    
+    def get_nowait(self) -> SecurityEvent:
+        for level in self.LEVELS:
+            if self.levels[level]:
+                event = self.levels[level].popleft()
+                self._size -= 1
+                if self.wait_observer is not None and hasattr(event, '_enqueued_at'):
+                    self.wait_observer(time.perf_counter() - event._enqueued_at)
+                QUEUE_DEPTH.labels(severity=level).set(len(self.levels[level]))
+                self._not_full.set()
+                return event
+        if self._low_aggregates:
+            return self._flush_low_aggregates()
+        raise asyncio.QueueEmpty
+    
+    def empty(self) -> bool:
+        return self._size == 0 and not self._low_aggregates
+    
+    def qsize(self) -> int:
+        return self._size
+    
+    def _offer(self, event: SecurityEvent) -> bool:
+        """Tente l'insertion; False = l'appelant doit attendre de la place"""
+        level = self.level_of(event)
+        under_pressure = self._size >= self.total_capacity * self.PRESSURE_THRESHOLD
+        
+        if level == 'LOW' and (under_pressure or len(self.levels['LOW']) >= self.capacity['LOW']):
+            self._aggregate_low(event)
+            return True
+        
+        if len(self.levels[level]) >= self.capacity[level]:
+            if level in self.LOSSLESS_LEVELS:
+                return False
+            if level != 'LOW' and self.levels['LOW']:
+                self._fold_queued_low()
+            else:
+                self._evict_oldest(level)
+        
+        if self.wait_observer is not None:
+            event._enqueued_at = time.perf_counter()
+        self.levels[level].append(event)
+        self._size += 1
+        QUEUE_DEPTH.labels(severity=level).set(len(self.levels[level]))
+        self._not_empty.set()
+        return True
+    
+    def _fold_queued_low(self):
+        """Délestage LOW d'abord: le plus ancien LOW en file rejoint les agrégats"""
+        event = self.levels['LOW'].popleft()
+        self._size -= 1
+        QUEUE_DEPTH.labels(severity='LOW').set(len(self.levels['LOW']))
+        self._aggregate_low(event)
+    
+    def _evict_oldest(self, level: str):
+        """Évince l'événement le plus ancien du niveau (capacité du niveau respectée)"""
+        self.levels[level].popleft()
+        self._size -= 1
+        self._record_shed(level, 'evicted')
+    
+    def _aggregate_low(self, event: SecurityEvent):
+        """Replie un LOW en compteur (agent, type); au-delà du plafond il est perdu"""
+        key = (event.agent_id, event.event_type)
+        aggregate = self._low_aggregates.get(key)
+        if aggregate is None:
+            if len(self._low_aggregates) >= self.MAX_AGGREGATES:
+                self._record_shed('LOW', 'dropped')
+                return
+            aggregate = self._low_aggregates[key] = {'count': 0, 'max_risk_score': 0.0,
+                                                     'first_seen': event.timestamp}
+        aggregate['count'] += 1
+        aggregate['max_risk_score'] = max(aggregate['max_risk_score'], event.risk_score)
+        aggregate['last_seen'] = event.timestamp
+        self._record_shed('LOW', 'aggregated')
+        self._not_empty.set()
+    
+    def _flush_low_aggregates(self) -> SecurityEvent:
+        """Synthèse des LOW agrégés, servie quand la file est vidée"""
+        aggregates, self._low_aggregates = self._low_aggregates, {}
+        return SecurityEvent(
+            timestamp=datetime.now(),
+            agent_id='multiple' if len({agent for agent, _ in aggregates}) > 1 else next(iter(aggregates))[0],
+            event_type='aggregated_low_events',
+            severity='LOW',
+            resource='event_queue',
+            action='load_shedding',
+            source_ip='',
+            user_agent='',
+            details={'aggregates': [
+                {'agent_id': agent, 'event_type': event_type, **aggregate}
+                for (agent, event_type), aggregate in aggregates.items()
+            ]},
+            risk_score=max(aggregate['max_risk_score'] for aggregate in aggregates.values()),
+            compliance_flags=['MONITORING']
+        )
+    
+    def _record_shed(self, level: str, reason: str):
+        self.shed_counts[(level, reason)] += 1
+        EVENTS_SHED.labels(severity=level, reason=reason).inc()
+
+@dataclass
+class FileAccess:
+    """Accès fichier coalescé sur une fenêtre de debounce"""
+    path: str
+    operations: set
+    pid: Optional[int] = None
+    uid: Optional[int] = None  # accédant (fanotify); None: non résolu ou mode inotify
+    count: int = 0
+
+class FileSystemWatcher:
+    """Watcher filesystem Linux: fanotify si privilégié, sinon inotify (ctypes)
+    
+    L'arborescence est suivie par inotify (une watch par répertoire, pas par
+    fichier). En mode fanotify ces watches ne servent qu'à découvrir les
+    répertoires créés ou déplacés, qui reçoivent alors leur marque fanotify
+    (une marque de montage couvre une racine point de montage). Seuls les
+    sous-arbres signalés sont parcourus, hors boucle (asyncio.to_thread).
+    
+    Attribution: fanotify fournit le pid de l'accédant, dont l'uid est relevé
+    à la lecture et mis en cache par pid (un accédant bref a souvent disparu
+    au moment où ses événements suivants sont lus). Un uid introuvable reste
+    None: l'accès est non attribué, à signaler par l'appelant. inotify ne
+    connaît pas l'accédant et ne voit pas les lectures: ce mode ne rapporte
+    que des modifications, sans pid ni uid.
+    Les événements bruts sont coalescés par (chemin, pid) puis livrés par
+    lots toutes les `debounce` secondes.
+    """
+    
+    # inotify (linux/inotify.h)
+    IN_ATTRIB = 0x00000004
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ONLYDIR = 0x01000000
+    IN_ISDIR = 0x40000000
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+    INOTIFY_MASK = (IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+                    | IN_CREATE | IN_DELETE | IN_DELETE_SELF)
+    DIRECTORY_MASK = IN_CREATE | IN_MOVED_TO  # mode fanotify: découverte des répertoires seulement
+    INOTIFY_OPERATIONS = [(IN_CREATE, 'create'), (IN_CLOSE_WRITE, 'write'), (IN_DELETE, 'delete'),
+                          (IN_MOVED_FROM, 'move'), (IN_MOVED_TO, 'move'), (IN_ATTRIB, 'chmod')]
+    INOTIFY_HEADER = struct.Struct('iIII')
+    
+    # fanotify (linux/fanotify.h)
+    FAN_CLOEXEC = 0x1
+    FAN_NONBLOCK = 0x2
+    FAN_CLASS_NOTIF = 0x0
+    FAN_MARK_ADD = 0x1
+    FAN_MARK_ONLYDIR = 0x8
+    FAN_MARK_MOUNT = 0x10
+    FAN_EVENT_ON_CHILD = 0x08000000
+    FAN_MODIFY = 0x2
+    FAN_CLOSE_WRITE = 0x8
+    FAN_OPEN = 0x20
+    FAN_Q_OVERFLOW = 0x4000
+    FAN_NOFD = -1
+    FANOTIFY_MASK = FAN_OPEN | FAN_MODIFY | FAN_CLOSE_WRITE
+    FANOTIFY_OPERATIONS = [(FAN_OPEN, 'read'), (FAN_MODIFY, 'write'), (FAN_CLOSE_WRITE, 'write')]
+    FANOTIFY_METADATA = struct.Struct('=IBBHQii')
+    AT_FDCWD = -100
+    
+    READ_SIZE = 64 * 1024
+    PID_UID_CACHE_SIZE = 4096
+    ENOSPC = 28
+    
+    def __init__(self, roots: List[str], debounce: float = 0.5, use_fanotify: Optional[bool] = None):
+        self.roots = [os.path.normpath(root) for root in roots if os.path.isdir(root)]
+        self.debounce = debounce
+        self._libc = self._load_libc()
+        self.use_fanotify = (hasattr(os, 'geteuid') and os.geteuid() == 0
+                             if use_fanotify is None else use_fanotify)
+        self.mode = None
+        self.overflows = 0
+        self._inotify_fd = None
+        self._fanotify_fd = None
+        self._error: Optional[OSError] = None
+        self._watch_paths = {}
+        self._pid_uids = OrderedDict()
+        self._scan_requests = deque()
+        self._scan_task = None
+        self._pending: Dict[Tuple[str, Optional[int]], FileAccess] = {}
+        self._pending_event = asyncio.Event()
+    
+    @staticmethod
+    def _load_libc():
+        """libc exposant inotify (Linux): ImportError sinon, comme une dépendance absente"""
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+            libc.inotify_init1
+        except (OSError, AttributeError) as e:
+            raise ImportError(f"inotify indisponible: {e}", name='inotify') from e
+        return libc
+        
+    async def start(self):
+        """Ouvre inotify (+ fanotify si possible), pose watches et marques hors boucle"""
+        fd = self._libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, f"inotify_init1: {os.strerror(errno)}")
+        self._inotify_fd = fd
+        self.mode = 'fanotify' if self.use_fanotify and self._start_fanotify() else 'inotify'
+        try:
+            await self._watch_roots()
+        except OSError:
+            if self.mode != 'fanotify':
+                raise
+            # Marques fanotify épuisées: repli inotify (watches reposées avec le masque complet)
+            os.close(self._fanotify_fd)
+            self._fanotify_fd = None
+            self.mode = 'inotify'
+            await self._watch_roots()
+        
+        loop = asyncio.get_running_loop()
+        loop.add_reader(self._inotify_fd, self._read_events, self._inotify_fd, self._parse_inotify)
+        if self._fanotify_fd is not None:
+            loop.add_reader(self._fanotify_fd, self._read_events, self._fanotify_fd, self._parse_fanotify)
+        
+    def stop(self):
+        if self._scan_task is not None:
+            self._scan_task.cancel()
+        for fd in (self._inotify_fd, self._fanotify_fd):
+            if fd is not None:
+                asyncio.get_running_loop().remove_reader(fd)
+                os.close(fd)
+        self._inotify_fd = self._fanotify_fd = None
+    
+    async def next_batch(self) -> List[FileAccess]:
+        """Attend des événements puis la fenêtre de debounce, livre le lot coalescé
+        
+        Une erreur survenue dans le callback de lecture ou le parcours d'un
+        nouveau répertoire (ex. ENOSPC) est relevée ici, dans la tâche de l'appelant.
+        """
+        while not self._pending and self._error is None:
+            self._pending_event.clear()
+            await self._pending_event.wait()
+        if self._error is not None:
+            raise self._error
+        await asyncio.sleep(self.debounce)
+        batch, self._pending = self._pending, {}
+        return list(batch.values())
+    
+    def _start_fanotify(self) -> bool:
+        self._libc.fanotify_mark.argtypes = [ctypes.c_int, ctypes.c_uint, ctypes.c_uint64,
+                                             ctypes.c_int, ctypes.c_char_p]
+        fd = self._libc.fanotify_init(self.FAN_CLOEXEC | self.FAN_NONBLOCK | self.FAN_CLASS_NOTIF,
+                                      os.O_RDONLY | getattr(os, 'O_LARGEFILE', 0))
+        if fd < 0:
+            return False
+        self._fanotify_fd = fd
+        return True
+    
+    async def _watch_roots(self):
+        """Racines: marque de montage (fanotify, point de montage) ou parcours initial hors boucle"""
+        for root in self.roots:
+            if self.mode == 'fanotify' and os.path.ismount(root):
+                self._fanotify_mark(self.FAN_MARK_MOUNT, self.FANOTIFY_MASK, root)
+                continue
+            await asyncio.to_thread(self._scan_tree, root, False)
+    
+    def _scan_tree(self, top: str, report_existing: bool) -> List[str]:
+        """Parcours bloquant (thread): watch inotify + marque fanotify par répertoire
+        
+        report_existing: pour un répertoire apparu en cours de route, son
+        contenu créé avant la pose des watches est retourné (signalé 'create').
+        """
+        existing = []
+        mask = (self.INOTIFY_MASK if self.mode == 'inotify' else self.DIRECTORY_MASK) | self.IN_ONLYDIR
+        for directory, subdirectories, files in os.walk(top):
+            wd = self._libc.inotify_add_watch(self._inotify_fd, directory.encode(), mask)
+            if wd < 0:
+                errno = ctypes.get_errno()
+                if errno == self.ENOSPC:  # fs.inotify.max_user_watches atteint
+                    raise OSError(errno, "inotify max_user_watches atteint")
+                continue
+            self._watch_paths[wd] = directory
+            if self.mode == 'fanotify':
+                self._fanotify_mark(self.FAN_MARK_ONLYDIR, self.FANOTIFY_MASK | self.FAN_EVENT_ON_CHILD,
+                                    directory)
+            if report_existing:
+                existing += [os.path.join(directory, name) for name in subdirectories + files]
+        return existing
+    
+    def _fanotify_mark(self, flags: int, mask: int, path: str):
+        if self._libc.fanotify_mark(self._fanotify_fd, self.FAN_MARK_ADD | flags, mask,
+                                    self.AT_FDCWD, path.encode()) < 0:
+            errno = ctypes.get_errno()
+            if errno == self.ENOSPC:  # fs.fanotify.max_user_marks atteint
+                raise OSError(errno, "fanotify max_user_marks atteint")
+            if errno != 2:  # ENOENT: répertoire supprimé pendant le parcours
+                raise OSError(errno, f"fanotify_mark {path}: {os.strerror(errno)}")
+    
+    def _request_scan(self, path: str):
+        """Répertoire créé ou déplacé: parcours de son seul sous-arbre, hors boucle"""
+        self._scan_requests.append(path)
+        if self._scan_task is None or self._scan_task.done():
+            self._scan_task = asyncio.get_running_loop().create_task(self._scan_requested())
+    
+    async def _scan_requested(self):
+        while self._scan_requests:
+            path = self._scan_requests.popleft()
+            try:
+                existing = await asyncio.to_thread(self._scan_tree, path, True)
+            except OSError as e:
+                self._error = e
+                self._pending_event.set()
+                return
+            for existing_path in existing:
+                self._record(existing_path, None, self.IN_CREATE, self.INOTIFY_OPERATIONS)
+            if existing:
+                self._pending_event.set()
+    
+    def _read_events(self, fd: int, parse: Callable[[bytes], None]):
+        """Callback boucle: lit tout le tampon noyau disponible
+        
+        Une OSError ne doit pas se perdre dans le gestionnaire d'exceptions
+        de la boucle: elle est remise à next_batch.
+        """
+        try:
+            while True:
+                try:
+                    buffer = os.read(fd, self.READ_SIZE)
+                except BlockingIOError:
+                    break
+                if not buffer:
+                    break
+                parse(buffer)
+        except OSError as e:
+            self._error = e
+            asyncio.get_running_loop().remove_reader(fd)
+        if self._pending or self._error is not None:
+            self._pending_event.set()
+    
+    def _parse_inotify(self, buffer: bytes):
+        offset = 0
+        while offset < len(buffer):
+            wd, mask, _, name_len = self.INOTIFY_HEADER.unpack_from(buffer, offset)
+            name = buffer[offset + 16:offset + 16 + name_len].rstrip(b'\0').decode(errors='replace')
+            offset += 16 + name_len
+            
+            if mask & self.IN_Q_OVERFLOW:
+                self.overflows += 1
+                continue
+            if mask & self.IN_IGNORED:
+                self._watch_paths.pop(wd, None)
+                continue
+            directory = self._watch_paths.get(wd)
+            if directory is None:
+                continue
+            path = os.path.join(directory, name) if name else directory
+            if mask & self.IN_ISDIR and mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                self._request_scan(path)
+            if self.mode == 'inotify':
+                self._record(path, None, mask, self.INOTIFY_OPERATIONS)
+    
+    def _parse_fanotify(self, buffer: bytes):
+        offset = 0
+        own_pid = os.getpid()
+        uids = {}
+        while offset + self.FANOTIFY_METADATA.size <= len(buffer):
+            event_len, _, _, _, mask, fd, pid = self.FANOTIFY_METADATA.unpack_from(buffer, offset)
+            offset += event_len
+            if mask & self.FAN_Q_OVERFLOW or fd == self.FAN_NOFD:
+                self.overflows += 1
+                continue
+            try:
+                path = os.readlink(f'/proc/self/fd/{fd}')
+            except OSError:
+                continue
+            finally:
+                os.close(fd)
+            if pid == own_pid or not self._in_roots(path):
+                continue
+            if pid not in uids:
+                uids[pid] = self._uid_of(pid)
+            self._record(path, pid, mask, self.FANOTIFY_OPERATIONS, uids[pid])
+    
+    def _uid_of(self, pid: int) -> Optional[int]:
+        """uid de l'accédant: /proc tant qu'il existe, sinon dernier uid connu pour ce pid"""
+        try:
+            uid = os.stat(f'/proc/{pid}').st_uid
+        except OSError:
+            return self._pid_uids.get(pid)
+        self._pid_uids[pid] = uid
+        self._pid_uids.move_to_end(pid)
+        if len(self._pid_uids) > self.PID_UID_CACHE_SIZE:
+            self._pid_uids.popitem(last=False)
+        return uid
+    
+    def _record(self, path: str, pid: Optional[int], mask: int, operations_map: List[Tuple[int, str]],
+                uid: Optional[int] = None):
+        """Coalescence: un FileAccess par (chemin, pid) dans la fenêtre"""
+        key = (path, pid)
+        access = self._pending.get(key)
+        if access is None:
+            access = self._pending[key] = FileAccess(path=path, operations=set(), pid=pid, uid=uid)
+        access.count += 1
+        for bit, operation in operations_map:
+            if mask & bit:
+                access.operations.add(operation)
+    
+    def _in_roots(self, path: str) -> bool:
+        return any(path == root or path.startswith(root + os.sep) for root in self.roots)
+
+@dataclass
+class QueryStatsDelta:
+    """Delta pg_stat_statements d'une requête (rôle, base, queryid) entre deux snapshots"""
+    role: str
+    queryid: int
+    calls: int
+    exec_ms: float
+    rows: int
+    baseline_ms: Optional[float]
+    relations: frozenset
+    is_write: bool
+    
+    @property
+    def mean_ms(self) -> float:
+        return self.exec_ms / self.calls if self.calls else 0.0
+
+class PgStatSnapshotDiffer:
+    """Snapshots pg_stat_statements / pg_stat_activity par rôle, diffés en mémoire
+    
+    Une requête agrégée par intervalle remplace la lecture de chaque statement:
+    pg_stat_statements(false) ne lit pas le fichier des textes de requêtes. Le
+    texte n'est récupéré que pour les queryid nouveaux, puis réduit en cache
+    aux relations qualifiées (schema.table) qu'il référence. Nécessite
+    l'extension pg_stat_statements (PostgreSQL 13+: total_exec_time).
+    """
+    
+    STATEMENTS_QUERY = """
+    SELECT r.rolname, s.dbid, s.queryid, sum(s.calls), sum(s.total_exec_time), sum(s.rows)
+    FROM pg_stat_statements(false) s
+    JOIN pg_roles r ON r.oid = s.userid
+    WHERE r.rolname = ANY(%s) AND s.queryid IS NOT NULL
+    GROUP BY r.rolname, s.dbid, s.queryid
+    """
+    QUERY_TEXT_QUERY = """
+    SELECT DISTINCT ON (queryid) queryid, query
+    FROM pg_stat_statements
+    WHERE queryid = ANY(%s)
+    """
+    ACTIVITY_QUERY = """
+    SELECT usename, pid, query_start, extract(epoch FROM now() - query_start), left(query, 200)
+    FROM pg_stat_activity
+    WHERE state = 'active' AND usename = ANY(%s)
+      AND query_start < now() - make_interval(secs => %s)
+    """
+    # Heuristique: seules les références qualifiées sont attribuables à un schéma
+    RELATION_PATTERN = re.compile(
+        r'\b(?:FROM|JOIN|INTO|UPDATE|TABLE)\s+(?:ONLY\s+)?"?([A-Za-z_][\w$]*)"?\s*\.\s*"?([A-Za-z_][\w$]*)"?',
+        re.IGNORECASE)
+    WRITE_VERBS = {'insert', 'update', 'delete', 'merge', 'truncate', 'alter', 'drop', 'create', 'grant'}
+    SYSTEM_SCHEMAS = {'pg_catalog', 'information_schema', 'pg_toast'}
+    
+    def __init__(self, roles: List[str], long_query_seconds: float = 30.0,
+                 baseline_alpha: float = 0.2, min_baseline_samples: int = 5):
+        self.roles = list(roles)
+        self.long_query_seconds = long_query_seconds
+        self.baseline_alpha = baseline_alpha
+        self.min_baseline_samples = min_baseline_samples
+        self._previous: Optional[Dict[Tuple[str, int, int], Tuple[int, float, int]]] = None
+        self._baselines: Dict[Tuple[str, int, int], List[float]] = {}  # [ewma_ms, échantillons]
+        self._relations: Dict[int, Tuple[frozenset, bool]] = {}
+        self._reported_activity = set()
+        
+    def sample(self, conn) -> Tuple[List[QueryStatsDelta], List[Dict]]:
+        """Snapshot + diff (bloquant): deltas par requête et requêtes longues en cours
+        
+        conn doit être une connexion dédiée en autocommit: aucune transaction
+        implicite ne fige now() ni le snapshot pg_stat_activity.
+        """
+        with conn.cursor() as cursor:
+            cursor.execute(self.STATEMENTS_QUERY, (self.roles,))
+            current = {(role, dbid, queryid): (int(calls), float(exec_ms), int(rows))
+                       for role, dbid, queryid, calls, exec_ms, rows in cursor.fetchall()}
+            
+            unknown = {key[2] for key in current} - self._relations.keys()
+            if unknown:
+                cursor.execute(self.QUERY_TEXT_QUERY, (list(unknown),))
+                for queryid, query in cursor.fetchall():
+                    self._relations[queryid] = self._parse_relations(query)
+            
+            cursor.execute(self.ACTIVITY_QUERY, (self.roles, self.long_query_seconds))
+            long_running = self._new_long_running(cursor.fetchall())
+        
+        deltas = self._diff(current)
+        live_queryids = {key[2] for key in current}
+        self._relations = {queryid: relations for queryid, relations in self._relations.items()
+                           if queryid in live_queryids}
+        return deltas, long_running
+    
+    def _diff(self, current: Dict) -> List[QueryStatsDelta]:
+        """Deltas depuis le snapshot précédent (le premier snapshot sert de référence)"""
+        previous, self._previous = self._previous, current
+        self._baselines = {key: baseline for key, baseline in self._baselines.items() if key in current}
+        if previous is None:
+            return []
+        
+        deltas = []
+        for key, (calls, exec_ms, rows) in current.items():
+            prev_calls, prev_exec_ms, prev_rows = previous.get(key, (0, 0.0, 0))
+            if calls < prev_calls or exec_ms < prev_exec_ms:
+                # pg_stat_statements_reset() ou entrée évincée puis recréée
+                prev_calls, prev_exec_ms, prev_rows = 0, 0.0, 0
+            delta_calls = calls - prev_calls
+            if delta_calls <= 0:
+                continue
+            
+            delta_exec_ms = exec_ms - prev_exec_ms
+            baseline = self._baselines.get(key)
+            relations, is_write = self._relations.get(key[2], (frozenset(), False))
+            deltas.append(QueryStatsDelta(
+                role=key[0],
+                queryid=key[2],
+                calls=delta_calls,
+                exec_ms=delta_exec_ms,
+                rows=max(rows - prev_rows, 0),
+                baseline_ms=baseline[0] if baseline and baseline[1] >= self.min_baseline_samples else None,
+                relations=relations,
+                is_write=is_write
+            ))
+            
+            mean_ms = delta_exec_ms / delta_calls
+            if baseline is None:
+                self._baselines[key] = [mean_ms, 1]
+            else:
+                baseline[0] += self.baseline_alpha * (mean_ms - baseline[0])
+                baseline[1] += 1
+        return deltas
+    
+    def _new_long_running(self, rows: List[Tuple]) -> List[Dict]:
+        """Requêtes longues actives, signalées une seule fois par (pid, query_start)"""
+        current = set()
+        long_running = []
+        for role, pid, query_start, duration, query in rows:
+            current.add((pid, query_start))
+            if (pid, query_start) not in self._reported_activity:
+                long_running.append({'role': role, 'pid': pid, 'query_start': query_start,
+                                     'duration_seconds': float(duration), 'query': query})
+        self._reported_activity = current
+        return long_running
+    
+    @classmethod
+    def _parse_relations(cls, query: str) -> Tuple[frozenset, bool]:
+        """Relations qualifiées (schema.table, minuscules) et nature écriture de la requête"""
+        relations = frozenset(
+            f"{schema.lower()}.{table.lower()}"
+            for schema, table in cls.RELATION_PATTERN.findall(query)
+            if schema.lower() not in cls.SYSTEM_SCHEMAS)
+        verb = query.lstrip().split(None, 1)[0].lower() if query.strip() else ''
+        return relations, verb in cls.WRITE_VERBS
+
+class CidrTrie:
+    """Index CIDR en trie binaire (IPv4/IPv6): plus long préfixe en O(longueur préfixe)"""
+    
+    def __init__(self):
+        self._roots = {4: [None, None, None], 6: [None, None, None]}  # [bit 0, bit 1, label]
+        self._depth = {4: 0, 6: 0}
+        self.size = 0
+        
+    def insert(self, cidr: str, label: str):
+        network = ipaddress.ip_network(cidr.strip(), strict=False)
+        node = self._roots[network.version]
+        bits = int(network.network_address)
+        for position in range(network.max_prefixlen - 1, network.max_prefixlen - 1 - network.prefixlen, -1):
+            bit = (bits >> position) & 1
+            if node[bit] is None:
+                node[bit] = [None, None, None]
+            node = node[bit]
+        node[2] = label
+        self._depth[network.version] = max(self._depth[network.version], network.prefixlen)
+        self.size += 1
+    
+    def lookup(self, address) -> Optional[str]:
+        """Label du plus long préfixe contenant l'adresse (ipaddress.IPv4Address/IPv6Address)"""
+        node = self._roots[address.version]
+        bits = int(address)
+        label = node[2]
+        position = address.max_prefixlen - 1
+        for _ in range(self._depth[address.version]):
+            node = node[(bits >> position) & 1]
+            if node is None:
+                break
+            if node[2] is not None:
+                label = node[2]
+            position -= 1
+        return label
+
+class TTLCache:
+    """Cache LRU borné avec expiration (TTL), compteurs hit/miss exportés"""
+    
+    MISSING = object()
+    
+    def __init__(self, name: str, maxsize: int = 10000, ttl: float = 300.0):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: 'OrderedDict[Any, Tuple[float, Any]]' = OrderedDict()
+        self._counters = None
+        
+    def get(self, key):
+        if self._counters is None:
+            # Séries hit/miss résolues une fois (labels() coûte plus que la lookup)
+            self._counters = (ENRICHMENT_CACHE.labels(cache=self.name, result='hit'),
+                              ENRICHMENT_CACHE.labels(cache=self.name, result='miss'))
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self._entries.move_to_end(key)
+            self._counters[0].inc()
+            return entry[1]
+        if entry is not None:
+            del self._entries[key]
+        self._counters[1].inc()
+        return self.MISSING
+    
+    def put(self, key, value):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+    
+    def clear(self):
+        self._entries.clear()
+
+class NetworkEnricher:
+    """Contexte réseau et client des événements (source_ip, user_agent)
+    
+    Zones CIDR et listes de réputation (fichiers locaux, une IP/CIDR par
+    ligne) indexées en CidrTrie; user agents parsés une fois (produit/version)
+    puis comparés aux empreintes connues de l'agent. Les deux résolutions sont
+    mises en cache (LRU + TTL); les listes sont rechargées quand leur mtime change.
+    """
+    
+    USER_AGENT_PATTERN = re.compile(r'^\s*([^/\s]+)(?:/(\S+))?')
+    
+    def __init__(self, config: Dict):
+        self.zones = config.get('network_zones', DEFAULT_NETWORK_ZONES)
+        self.reputation_files = config.get('reputation_files', {})
+        self.agent_user_agents = {agent_id: {product.lower() for product in products}
+                                  for agent_id, products in config.get('agent_user_agents', {}).items()}
+        self.reload_interval = config.get('reputation_reload_seconds', 60)
+        self.ip_cache = TTLCache('ip', config.get('enrichment_cache_size', 10000),
+                                 config.get('enrichment_cache_ttl', 300))
+        self.user_agent_cache = TTLCache('user_agent', config.get('enrichment_cache_size', 10000),
+                                         config.get('enrichment_cache_ttl', 300))
+        self.zone_trie = CidrTrie()
+        for zone, cidrs in self.zones.items():
+            for cidr in cidrs:
+                self.zone_trie.insert(cidr, zone)
+        self.reputation_trie = CidrTrie()
+        self._reputation_fingerprint = None
+        self._next_reload = 0.0
+        self.refresh()
+        
+    def refresh(self):
+        """Recharge les listes de réputation si leurs fichiers ont changé"""
+        self._next_reload = time.monotonic() + self.reload_interval
+        fingerprint = tuple(
+            (label, os.stat(path).st_mtime_ns if os.path.exists(path) else None)
+            for label, path in sorted(self.reputation_files.items()))
+        if fingerprint == self._reputation_fingerprint:
+            return
+        
+        trie = CidrTrie()
+        for label, path in sorted(self.reputation_files.items()):
+            if not os.path.exists(path):
+                continue
+            with open(path, 'r') as f:
+                for line in f:
+                    entry = line.split('#', 1)[0].strip()
+                    if entry:
+                        try:
+                            trie.insert(entry, label)
+                        except ValueError:
+                            continue
+        self.reputation_trie = trie
+        self._reputation_fingerprint = fingerprint
+        self.ip_cache.clear()
+    
+    def enrich(self, source_ip: str, user_agent: str, agent_id: str) -> Dict[str, Any]:
+        """Contexte réseau + client (résolutions en cache, O(1) en régime établi)"""
+        # Champs JSON absents, null ou non textuels: traités comme vides
+        source_ip = source_ip if isinstance(source_ip, str) else ''
+        user_agent = user_agent if isinstance(user_agent, str) else ''
+        if time.monotonic() >= self._next_reload:
+            self.refresh()
+        
+        network = self.ip_cache.get(source_ip)
+        if network is TTLCache.MISSING:
+            network = self._resolve_ip(source_ip)
+            self.ip_cache.put(source_ip, network)
+        
+        client = self.user_agent_cache.get(user_agent)
+        if client is TTLCache.MISSING:
+            client = self._parse_user_agent(user_agent)
+            self.user_agent_cache.put(user_agent, client)
+        
+        known_products = self.agent_user_agents.get(agent_id)
+        return {
+            **network,
+            **client,
+            'user_agent_known': None if known_products is None else client['client_product'] in known_products
+        }
+    
+    def _resolve_ip(self, source_ip: str) -> Dict[str, Any]:
+        try:
+            address = ipaddress.ip_address(source_ip.strip())
+        except ValueError:
+            return {'ip_version': None, 'network_zone': None, 'reputation': None}
+        if getattr(address, 'ipv4_mapped', None):
+            address = address.ipv4_mapped
+        return {
+            'ip_version': address.version,
+            'network_zone': self.zone_trie.lookup(address) or 'external',
+            'reputation': self.reputation_trie.lookup(address)
+        }
+    
+    def _parse_user_agent(self, user_agent: str) -> Dict[str, Any]:
+        """'bmad-mcp-client/1.4.2 (linux)' -> produit + version"""
+        match = self.USER_AGENT_PATTERN.match(user_agent or '')
+        if not match:
+            return {'client_product': None, 'client_version': None}
+        return {'client_product': match.group(1).lower(), 'client_version': match.group(2)}
+
+class BusinessHoursSchedule:
+    """Heures ouvrées précalculées: bitmap 168 bits (heure de la semaine, fuseau local)
+    
+    Fenêtres `{'days': 'mon-fri', 'hours': '08-19'}` (heures de début incluse /
+    fin exclue, '22-06' passe minuit); les jours fériés sont hors heures ouvrées.
+    """
+    
+    DAYS = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']
+    
+    def __init__(self, timezone_name: str, windows: List[Dict], holidays: List[str] = ()):
+        self.timezone_name = timezone_name
+        self.zone = ZoneInfo(timezone_name)
+        self.holidays = frozenset(date.fromisoformat(day) for day in holidays)
+        self.slots = 0
+        for window in windows:
+            start, end = (int(bound.split(':')[0]) for bound in window['hours'].split('-'))
+            # Fenêtre de nuit: les heures après minuit appartiennent au jour suivant
+            hours = range(start, end if start < end else end + 24)
+            for day in self._parse_days(window['days']):
+                for hour in hours:
+                    self.slots |= 1 << ((day * 24 + hour) % 168)
+                    
+    def is_business_time(self, moment: datetime) -> bool:
+        """O(1): conversion fuseau, test jour férié puis bit heure-de-semaine"""
+        local = moment.astimezone(self.zone)
+        if self.holidays and local.date() in self.holidays:
+            return False
+        return bool(self.slots >> (local.weekday() * 24 + local.hour) & 1)
+    
+    @classmethod
+    def _parse_days(cls, spec) -> List[int]:
+        """'mon-fri,sun' ou ['mon', 'tue'] -> indices weekday()"""
+        parts = spec.split(',') if isinstance(spec, str) else spec
+        days = []
+        for part in parts:
+            first, _, last = part.strip().lower().partition('-')
+            start = cls.DAYS.index(first)
+            end = cls.DAYS.index(last) if last else start
+            days.extend(cls.DAYS[(start + offset) % 7] for offset in range((end - start) % 7 + 1))
+        return sorted({cls.DAYS.index(day) for day in days})
+
+class BusinessHoursRegistry:
+    """Résolution agent -> équipe -> défaut des heures ouvrées (config business_hours)
+    
+    Les schedules sont construits une fois par superposition défaut -> équipe
+    -> agent: une entrée agent hérite du fuseau et des fenêtres de son équipe
+    (à défaut du défaut), les jours fériés des trois niveaux s'additionnent.
+    """
+    
+    EPOCH_MS_THRESHOLD = 1e11  # au-delà: epoch en millisecondes (1e11 s = an 5138)
+    
+    def __init__(self, config: Dict, agent_teams: Dict[str, str]):
+        self.default_config = {**DEFAULT_BUSINESS_HOURS, **config.get('default', {})}
+        self.global_holidays = list(config.get('holidays', []))
+        self.default_timezone = ZoneInfo(self.default_config['timezone'])
+        self.default = self._build(self.default_config)
+        
+        team_configs = config.get('teams', {})
+        teams = {team: self._build(self.default_config, team_config) for team, team_config in team_configs.items()}
+        self._agents = {agent_id: teams[team] for agent_id, team in agent_teams.items() if team in teams}
+        self._agents.update({
+            agent_id: self._build(self.default_config, team_configs.get(agent_teams.get(agent_id), {}),
+                                  agent_config)
+            for agent_id, agent_config in config.get('agents', {}).items()})
+        
+    def schedule_for(self, agent_id: str) -> BusinessHoursSchedule:
+        return self._agents.get(agent_id, self.default)
+    
+    def is_off_hours(self, agent_id: str, moment: datetime) -> bool:
+        return not self.schedule_for(agent_id).is_business_time(moment)
+    
+    def event_time(self, value) -> datetime:
+        """Horodatage de l'événement (ISO 8601, epoch s ou ms); naïf = fuseau par défaut, invalide = maintenant"""
+        if isinstance(value, (int, float)):
+            if abs(value) >= self.EPOCH_MS_THRESHOLD:
+                value = value / 1000
+            try:
+                return datetime.fromtimestamp(value, timezone.utc)
+            except (OverflowError, OSError, ValueError):
+                return datetime.now(timezone.utc)
+        if isinstance(value, str) and value:
+            try:
+                moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+            except ValueError:
+                return datetime.now(timezone.utc)
+            return moment if moment.tzinfo else moment.replace(tzinfo=self.default_timezone)
+        return datetime.now(timezone.utc)
+    
+    def _build(self, *layers: Dict) -> BusinessHoursSchedule:
+        """Superpose les niveaux (le dernier l'emporte); jours fériés cumulés"""
+        merged = {}
+        holidays = list(self.global_holidays)
+        for layer in layers:
+            merged.update(layer)
+            holidays += list(layer.get('holidays', []))
+        return BusinessHoursSchedule(merged['timezone'], merged['windows'], holidays)
+
+class ResourceRingBuffer:
+    """Historique borné d'échantillons ressources (ring buffer NumPy, capacité fixe)"""
+    
+    def __init__(self, capacity: int, columns: List[str]):
+        self.capacity = capacity
+        self.columns = columns
+        self.values = numpy.zeros((capacity, len(columns)), dtype=numpy.float64)
+        self.timestamps = numpy.zeros(capacity, dtype=numpy.float64)
+        self.count = 0
+        self._next = 0
+        
+    def append(self, timestamp: float, row: List[float]):
+        self.values[self._next] = row
+        self.timestamps[self._next] = timestamp
+        self._next = (self._next + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+    
+    def baseline(self, exclude_latest: int = 1) -> Optional[Tuple[Any, Any]]:
+        """Moyenne / écart-type par colonne, hors échantillons les plus récents"""
+        available = self.count - exclude_latest
+        if available < 2:
+            return None
+        # Indices chronologiques des `available` plus anciens échantillons retenus
+        start = (self._next - self.count) % self.capacity
+        indices = (start + numpy.arange(available)) % self.capacity
+        history = self.values[indices]
+        return history.mean(axis=0), history.std(axis=0)
+
+class McpProcessSampler:
+    """Échantillonneur psutil des processus serveurs MCP (CPU, RSS, fds, connexions)
+    
+    Les processus sont découverts par sous-chaîne de cmdline (avec leurs
+    enfants: npx lance node), puis réutilisés entre échantillons pour que
+    cpu_percent soit incrémental; la découverte complète n'est refaite que
+    toutes les `rescan_interval` secondes.
+    """
+    
+    COLUMNS = ['cpu_percent', 'rss_bytes', 'open_fds', 'connections']
+    
+    def __init__(self, server_patterns: Dict[str, str], history_size: int = 720,
+                 rescan_interval: float = 60.0):
+        self.server_patterns = server_patterns
+        self.history_size = history_size
+        self.rescan_interval = rescan_interval
+        self.history = {server: ResourceRingBuffer(history_size, self.COLUMNS) for server in server_patterns}
+        self._processes: Dict[str, Dict[int, Any]] = {server: {} for server in server_patterns}
+        self._next_rescan = 0.0
+        
+    def sample(self) -> Dict[str, List[float]]:
+        """Un échantillon agrégé par serveur (bloquant, lectures /proc)"""
+        now = time.monotonic()
+        if now >= self._next_rescan:
+            self._rescan()
+            self._next_rescan = now + self.rescan_interval
+        
+        samples = {}
+        for server, processes in self._processes.items():
+            totals = [0.0, 0.0, 0.0, 0.0]
+            for pid, process in list(processes.items()):
+                try:
+                    with process.oneshot():
+                        totals[0] += process.cpu_percent(None)
+                        totals[1] += process.memory_info().rss
+                        totals[2] += (process.num_fds() if hasattr(process, 'num_fds')
+                                      else process.num_handles())
+                        totals[3] += len(process.net_connections(kind='inet')
+                                         if hasattr(process, 'net_connections')
+                                         else process.connections(kind='inet'))
+                except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                    processes.pop(pid, None)
+            
+            if processes:
+                self.history[server].append(time.time(), totals)
+                samples[server] = totals
+        return samples
+    
+    def _rescan(self):
+        """Découverte des processus par cmdline; conserve les objets déjà suivis"""
+        found = {server: {} for server in self.server_patterns}
+        for process in psutil.process_iter(['pid', 'cmdline']):
+            cmdline = ' '.join(process.info['cmdline'] or ())
+            for server, pattern in self.server_patterns.items():
+                if pattern in cmdline:
+                    found[server][process.pid] = process
+                    try:
+                        for child in process.children(recursive=True):
+                            found[server].setdefault(child.pid, child)
+                    except (psutil.NoSuchProcess, psutil.AccessDenied):
+                        pass
+                    break
+        
+        for server, processes in found.items():
+            known = self._processes[server]
+            self._processes[server] = {pid: known.get(pid, process) for pid, process in processes.items()}
+
+class AgentActivityWindow:
+    """Requêtes récentes par serveur MCP (deque bornée) pour corréler les pics ressources"""
+    
+    def __init__(self, maxlen: int = 10000):
+        self.maxlen = maxlen
+        self._requests: Dict[str, deque] = defaultdict(lambda: deque(maxlen=self.maxlen))
+        
+    def record(self, server: str, agent_id: str):
+        self._requests[server].append((time.monotonic(), agent_id))
+    
+    def shares(self, server: str, window: float) -> Dict[str, float]:
+        """Part des requêtes de chaque agent sur le serveur dans la fenêtre"""
+        cutoff = time.monotonic() - window
+        counts = defaultdict(int)
+        for timestamp, agent_id in reversed(self._requests.get(server, ())):
+            if timestamp < cutoff:
+                break
+            counts[agent_id] += 1
+        total = sum(counts.values())
+        return {agent_id: count / total for agent_id, count in
+                sorted(counts.items(), key=lambda item: item[1], reverse=True)} if total else {}
+
+class AgentRequestWindow:
+    """Requêtes par agent sur une fenêtre glissante (horodatage de l'événement)
+    
+    Débit (req/min) et taux d'erreur calculés sur l'heure de l'événement et
+    non l'horloge murale: un replay d'audit log donne les mêmes taux qu'en direct.
+    """
+    
+    def __init__(self, window: float = 60.0, maxlen: int = 10000):
+        self.window = window
+        self._requests: Dict[str, deque] = defaultdict(lambda: deque(maxlen=maxlen))
+        
+    def record(self, agent_id: str, moment: float, error: bool):
+        requests = self._requests[agent_id]
+        requests.append((moment, error))
+        while requests and requests[0][0] < moment - self.window:
+            requests.popleft()
+    
+    def rate(self, agent_id: str) -> float:
+        """Requêtes par minute sur la fenêtre"""
+        return len(self._requests.get(agent_id, ())) * 60.0 / self.window
+    
+    def error_rate(self, agent_id: str) -> float:
+        requests = self._requests.get(agent_id)
+        if not requests:
+            return 0.0
+        return sum(1 for _, error in requests if error) / len(requests)
+
+class _NullStage:
+    """Contexte no-op partagé: coût quasi nul quand l'instrumentation est désactivée"""
+    
+    __slots__ = ()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        return False
+
+_NULL_STAGE = _NullStage()
+
+class _StageTimer:
+    __slots__ = ('histogram', 'started')
+    
+    def __init__(self, histogram):
+        self.histogram = histogram
+        
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.started)
+        return False
+
+class SamplingProfiler:
+    """Profiler échantillonné au format folded (flamegraph.pl, speedscope, inferno)
+    
+    Sous Unix, SIGPROF (ITIMER_PROF) interrompt le thread principal, celui de
+    la boucle asyncio, au rythme du temps CPU consommé: la pile relevée est
+    celle réellement en cours, sans biais vers les points où le GIL est
+    relâché (select). Ailleurs, un thread dédié lit sys._current_frames().
+    Sortie `thread;frame;frame count`, une pile par ligne. Un profil à la fois.
+    """
+    
+    def __init__(self, output_dir: str, interval: float = 0.005):
+        self.output_dir = output_dir
+        self.interval = interval
+        self._stacks = None
+        
+    @property
+    def running(self) -> bool:
+        return self._stacks is not None
+    
+    async def profile(self, duration: float) -> Optional[str]:
+        """Échantillonne pendant `duration` s; chemin du profil (None si déjà en cours)"""
+        if self._stacks is not None:
+            return None
+        self._stacks = defaultdict(int)
+        try:
+            if hasattr(signal, 'setitimer') and threading.current_thread() is threading.main_thread():
+                previous_handler = signal.signal(signal.SIGPROF, self._on_sigprof)
+                signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+                try:
+                    await asyncio.sleep(duration)
+                finally:
+                    signal.setitimer(signal.ITIMER_PROF, 0)
+                    signal.signal(signal.SIGPROF, previous_handler)
+            else:
+                await asyncio.to_thread(self._sample_threads, duration)
+            stacks = self._stacks
+        finally:
+            self._stacks = None
+        return await asyncio.to_thread(self._write, stacks)
+    
+    def _on_sigprof(self, signum, frame):
+        if self._stacks is not None:
+            self._stacks[self._fold('MainThread', frame)] += 1
+    
+    def _sample_threads(self, duration: float):
+        own_thread = threading.get_ident()
+        thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+        deadline = time.monotonic() + duration
+        while time.monotonic() < deadline:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id != own_thread:
+                    self._stacks[self._fold(thread_names.get(thread_id, str(thread_id)), frame)] += 1
+            time.sleep(self.interval)
+    
+    def _write(self, stacks: Dict[str, int]) -> str:
+        os.makedirs(self.output_dir, exist_ok=True)
+        output_path = os.path.join(self.output_dir, f"profile-{datetime.now():%Y%m%d-%H%M%S-%f}.folded")
+        with open(output_path, 'w') as f:
+            for stack, count in sorted(stacks.items()):
+                f.write(f"{stack} {count}\n")
+        return output_path
+    
+    @staticmethod
+    def _fold(thread_name: str, frame) -> str:
+        frames = []
+        while frame is not None:
+            code = frame.f_code
+            frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        frames.append(thread_name)
+        return ';'.join(reversed(frames)).replace(' ', '_')
+
+class PipelineInstrumentation:
+    """Instrumentation optionnelle: histogrammes par étape + profiler à la demande
+    
+    Étapes: ingest -> parse -> score -> queue -> dispatch -> store. Désactivée,
+    stage() renvoie un contexte no-op partagé; le profiler ne coûte rien tant
+    qu'il n'est pas déclenché (signal ou HTTP GET /debug/profile?seconds=N).
+    """
+    
+    STAGES = ['ingest', 'parse', 'score', 'queue', 'dispatch', 'store']
+    
+    def __init__(self, config: Dict):
+        self.enabled = config.get('stage_timing', False)
+        self.profiler_enabled = config.get('profiler', False)
+        self.profiler_host = config.get('profiler_host', 'localhost')
+        self.profiler_port = config.get('profiler_port', 9091)
+        self.profile_signal = config.get('profile_signal', 'SIGUSR1')
+        self.profile_seconds = config.get('profile_seconds', 30)
+        self.profiler = SamplingProfiler(config.get('profile_dir', '/var/log/bmad/profiles'),
+                                         config.get('sample_interval_ms', 5) / 1000)
+        self._histograms = ({stage: PIPELINE_STAGE_SECONDS.labels(stage=stage) for stage in self.STAGES}
+                            if self.enabled else {})
+        self._runner = None
+        
+    def stage(self, name: str):
+        if not self.enabled:
+            return _NULL_STAGE
+        return _StageTimer(self._histograms[name])
+    
+    def observe(self, name: str, seconds: float):
+        self._histograms[name].observe(seconds)
+    
+    async def start(self, logger: logging.Logger):
+        """Branche les déclencheurs profiler (signal + endpoint HTTP à côté de Prometheus)"""
+        if not self.profiler_enabled:
+            return
+        loop = asyncio.get_running_loop()
+        signal_number = getattr(signal, self.profile_signal, None)
+        if signal_number is not None:
+            loop.add_signal_handler(signal_number, lambda: asyncio.ensure_future(
+                self.trigger_profile(self.profile_seconds, logger)))
+        
+        app = aiohttp_web.Application()
+        app.router.add_get('/debug/profile', self._handle_profile)
+        self._runner = aiohttp_web.AppRunner(app)
+        await self._runner.setup()
+        await aiohttp_web.TCPSite(self._runner, self.profiler_host, self.profiler_port).start()
+        
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+    
+    async def trigger_profile(self, seconds: float, logger: Optional[logging.Logger] = None) -> Optional[str]:
+        output_path = await self.profiler.profile(seconds)
+        if logger is not None:
+            logger.info(f"🔥 Profil écrit: {output_path}" if output_path else "🔥 Profil déjà en cours")
+        return output_path
+    
+    async def _handle_profile(self, request):
+        try:
+            seconds = float(request.query.get('seconds', self.profile_seconds))
+        except ValueError:
+            seconds = float('nan')
+        if not 0 < seconds < float('inf'):  # NaN inclus
+            return aiohttp_web.Response(status=400, text="seconds: durée positive attendue\n")
+        seconds = min(seconds, 300)
+        output_path = await self.trigger_profile(seconds)
+        if output_path is None:
+            return aiohttp_web.Response(status=409, text="profile already running\n")
+        with open(output_path, 'r') as f:
+            return aiohttp_web.Response(text=f.read(), headers={'X-Profile-Path': output_path})
+
+class StreamSubscription:
+    """Abonné WebSocket: filtre compilé + file bornée (les plus anciens sont écartés)"""
+    
+    def __init__(self, filters: Dict[str, List[str]], queue_size: int):
+        # Filtres compilés une fois: ensembles figés, None = pas de filtre
+        self.agents = frozenset(filters.get('agents') or ()) or None
+        self.severities = frozenset(filters.get('severities') or ()) or None
+        self.event_types = frozenset(filters.get('event_types') or ()) or None
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+        
+    def matches(self, agent_id: str, severity: str, event_type: str) -> bool:
+        return ((self.agents is None or agent_id in self.agents)
+                and (self.severities is None or severity in self.severities)
+                and (self.event_types is None or event_type in self.event_types))
+    
+    def offer(self, payload: str):
+        """Dépose sans bloquer; client lent = les plus anciens messages sautent"""
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(payload)
+
+class SecurityEventStream:
+    """Diffusion WebSocket des SecurityEvent et alertes aux dashboards
+    
+    Le client peut envoyer à la connexion un message JSON de filtrage
+    {"agents": [...], "severities": [...], "event_types": [...]}.
+    Chaque événement est sérialisé une seule fois puis déposé dans la file
+    bornée de chaque abonné concerné: l'ingestion n'attend jamais un client.
+    """
+    
+    SUBSCRIBE_TIMEOUT = 2.0
+    FILTER_KEYS = ('agents', 'severities', 'event_types')
+    
+    def __init__(self, host: str = 'localhost', port: int = 8765, queue_size: int = 256):
+        self.host = host
+        self.port = port
+        self.queue_size = queue_size
+        self.subscriptions = set()
+        self.server = None
+        
+    async def start(self):
+        self.server = await websockets.serve(self._handle_client, self.host, self.port)
+        
+    async def stop(self):
+        for subscription in list(self.subscriptions):
+            subscription.offer(None)  # réveille les envois en attente
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+    
+    def publish_event(self, security_event: SecurityEvent):
+        if not self.subscriptions:
+            return  # aucun abonné: pas de conversion asdict
+        self._publish('security_event', asdict(security_event), security_event.agent_id,
+                      security_event.severity, security_event.event_type)
+        
+    def publish_alert(self, alert: Dict):
+        self._publish('alert', alert, alert.get('agent_id'), alert.get('severity'),
+                      alert.get('event_type'))
+    
+    def _publish(self, kind: str, data: Dict, agent_id: str, severity: str, event_type: str):
+        """Sérialisation unique puis dépôt non bloquant chez les abonnés concernés"""
+        payload = None
+        for subscription in self.subscriptions:
+            if subscription.matches(agent_id, severity, event_type):
+                if payload is None:
+                    payload = json.dumps({'type': kind, 'data': data}, default=str)
+                subscription.offer(payload)
+    
+    async def _handle_client(self, websocket, path=None):
+        """Connexion abonné: lecture filtre initial puis envoi de sa file"""
+        filters = {}
+        try:
+            filters = json.loads(await asyncio.wait_for(websocket.recv(), self.SUBSCRIBE_TIMEOUT))
+        except asyncio.TimeoutError:
+            pass
+        except (json.JSONDecodeError, TypeError):
+            filters = None
+        
+        if not self._valid_filters(filters):
+            await websocket.send(json.dumps({
+                'type': 'error',
+                'message': f"filtre invalide: objet JSON attendu, clés {list(self.FILTER_KEYS)} "
+                           f"en listes de chaînes"}))
+            await websocket.close(code=1003, reason='invalid filter')
+            return
+        
+        subscription = StreamSubscription(filters, self.queue_size)
+        self.subscriptions.add(subscription)
+        try:
+            while True:
+                payload = await subscription.queue.get()
+                if payload is None:
+                    break
+                if subscription.dropped:
+                    # Messages écartés signalés au client (coalescés en un seul avis)
+                    await websocket.send(json.dumps({'type': 'dropped', 'count': subscription.dropped}))
+                    subscription.dropped = 0
+                await websocket.send(payload)
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
+            self.subscriptions.discard(subscription)
+    
+    @classmethod
+    def _valid_filters(cls, filters) -> bool:
+        """Objet JSON dont les clés connues sont des listes de chaînes (ou null)"""
+        return isinstance(filters, dict) and all(
+            filters.get(key) is None
+            or (isinstance(filters[key], list) and all(isinstance(item, str) for item in filters[key]))
+            for key in cls.FILTER_KEYS)
+
+class ViolationStore:
+    """Stockage SQLite indexé des violations compliance
+    
+    Déduplication par (policy, agent, hash evidence): une violation déjà
+    ouverte n'incrémente que son compteur d'occurrences. Taille bornée par
+    max_rows (les plus anciennes violations résolues partent en premier).
+    """
+    
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS violations (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        dedup_key TEXT NOT NULL UNIQUE,
+        violation_id TEXT NOT NULL,
+        agent_id TEXT NOT NULL,
+        policy_violated TEXT NOT NULL,
+        severity TEXT NOT NULL,
+        description TEXT NOT NULL,
+        evidence TEXT NOT NULL,
+        remediation_required INTEGER NOT NULL,
+        escalation_level INTEGER NOT NULL,
+        first_seen TEXT NOT NULL,
+        last_seen TEXT NOT NULL,
+        occurrences INTEGER NOT NULL DEFAULT 1,
+        status TEXT NOT NULL DEFAULT 'open'
+    );
+    CREATE INDEX IF NOT EXISTS idx_violations_agent ON violations(agent_id);
+    CREATE INDEX IF NOT EXISTS idx_violations_policy ON violations(policy_violated);
+    CREATE INDEX IF NOT EXISTS idx_violations_severity ON violations(severity);
+    CREATE INDEX IF NOT EXISTS idx_violations_last_seen ON violations(last_seen);
+    CREATE INDEX IF NOT EXISTS idx_violations_open ON violations(status, severity, agent_id);
+    """
+    
+    def __init__(self, db_path: str = '/var/log/bmad/compliance-violations.db',
+                 max_rows: int = 100000):
+        self.db_path = db_path
+        self.max_rows = max_rows
+        self.conn = sqlite3.connect(db_path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(self.SCHEMA)
+        
+    def add_many(self, violations: List[ComplianceViolation]) -> List[ComplianceViolation]:
+        """Insertion par lot; retourne les violations nouvellement ouvertes"""
+        if not violations:
+            return []
+        
+        keyed = {self.dedup_key(violation): violation for violation in violations}
+        keys = list(keyed)
+        already_open = set()
+        for start in range(0, len(keys), 500):  # limite variables SQLite
+            chunk = keys[start:start + 500]
+            already_open.update(row['dedup_key'] for row in self.conn.execute(
+                f"SELECT dedup_key FROM violations WHERE status = 'open' "
+                f"AND dedup_key IN ({','.join('?' * len(chunk))})", chunk))
+        
+        with self.conn:
+            self.conn.executemany("""
+                INSERT INTO violations (dedup_key, violation_id, agent_id, policy_violated,
+                    severity, description, evidence, remediation_required, escalation_level,
+                    first_seen, last_seen)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(dedup_key) DO UPDATE SET
+                    last_seen = excluded.last_seen,
+                    severity = excluded.severity,
+                    occurrences = occurrences + 1,
+                    status = 'open'
+                """, [
+                    (key, v.violation_id, v.agent_id, v.policy_violated, v.severity,
+                     v.description, json.dumps(v.evidence, sort_keys=True, default=str),
+                     int(v.remediation_required), v.escalation_level,
+                     v.timestamp.isoformat(), v.timestamp.isoformat())
+                    for key, v in keyed.items()
+                ])
+            self._prune()
+        
+        return [violation for key, violation in keyed.items() if key not in already_open]
+    
+    def query(self, agent_id: Optional[str] = None, policy: Optional[str] = None,
+              severity: Optional[str] = None, status: Optional[str] = 'open',
+              since: Optional[datetime] = None, limit: int = 100,
+              before_id: Optional[int] = None) -> Tuple[List[Dict], Optional[int]]:
+        """Requête paginée (keyset sur id décroissant)
+        
+        Retourne (violations, curseur); passer le curseur en before_id pour
+        obtenir la page suivante, None quand il n'y a plus de résultats.
+        """
+        clauses, params = [], []
+        for column, value in (('agent_id', agent_id), ('policy_violated', policy),
+                              ('severity', severity), ('status', status)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            clauses.append("last_seen >= ?")
+            params.append(since.isoformat())
+        if before_id is not None:
+            clauses.append("id < ?")
+            params.append(before_id)
+        
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self.conn.execute(
+            f"SELECT * FROM violations {where} ORDER BY id DESC LIMIT ?",
+            params + [limit]).fetchall()
+        
+        violations = [dict(row, evidence=json.loads(row['evidence'])) for row in rows]
+        next_cursor = violations[-1]['id'] if len(violations) == limit else None
+        return violations, next_cursor
+    
+    def resolve(self, violation_id: str) -> int:
+        """Marque une violation résolue (une récurrence la rouvrira)"""
+        with self.conn:
+            return self.conn.execute(
+                "UPDATE violations SET status = 'resolved' WHERE violation_id = ?",
+                (violation_id,)).rowcount
+    
+    def resolve_passed(self, results: Dict[str, List[ComplianceViolation]]) -> int:
+        """Résout les violations ouvertes d'une policy contrôlée que le dernier passage n'a plus relevées
+        
+        results: violations par policy pour les contrôles exécutés; une policy
+        sans violation (contrôle passé) voit toutes ses violations résolues,
+        sinon seules celles des agents/évidences disparus.
+        """
+        resolved_keys = []
+        for policy, violations in results.items():
+            current = {self.dedup_key(violation) for violation in violations}
+            resolved_keys.extend(row['dedup_key'] for row in self.conn.execute(
+                "SELECT dedup_key FROM violations WHERE status = 'open' AND policy_violated = ?",
+                (policy,)) if row['dedup_key'] not in current)
+        
+        with self.conn:
+            for start in range(0, len(resolved_keys), 500):  # limite variables SQLite
+                chunk = resolved_keys[start:start + 500]
+                self.conn.execute(
+                    f"UPDATE violations SET status = 'resolved' "
+                    f"WHERE dedup_key IN ({','.join('?' * len(chunk))})", chunk)
+        return len(resolved_keys)
+    
+    def _prune(self):
+        """Borne la taille: supprime d'abord les plus anciennes résolues"""
+        excess = self.conn.execute("SELECT COUNT(*) FROM violations").fetchone()[0] - self.max_rows
+        if excess > 0:
+            self.conn.execute("""
+                DELETE FROM violations WHERE id IN (
+                    SELECT id FROM violations
+                    ORDER BY status = 'open', last_seen
+                    LIMIT ?)
+                """, (excess,))
+    
+    @staticmethod
+    def dedup_key(violation: ComplianceViolation) -> str:
+        """Empreinte (policy, agent, evidence): identique sur tous les réplicas"""
+        evidence_hash = hashlib.sha256(
+            json.dumps(violation.evidence, sort_keys=True, default=str).encode()).hexdigest()
+        return hashlib.sha256(
+            f"{violation.policy_violated}|{violation.agent_id}|{evidence_hash}".encode()).hexdigest()
+
+@dataclass
+class ComplianceInput:
+    """Entrée d'un contrôle compliance: empreinte bon marché + chargement complet"""
+    name: str
+    fingerprint: Callable[[], Awaitable[Any]]
+    load: Callable[[], Awaitable[Any]]
+
+@dataclass
+class ComplianceCheck:
+    """Contrôle compliance déclaratif (entrées nommées, timeout, âge max)"""
+    name: str
+    inputs: List[str]
+    run: Callable[..., Awaitable[Any]]
+    timeout: float = 60.0
+    max_age: Optional[float] = None  # relance forcée (s) même sans changement
+
+class ComplianceEngine:
+    """Exécution concurrente et incrémentale des contrôles compliance
+    
+    À chaque cycle, les empreintes de toutes les entrées sont calculées en
+    parallèle; seules les entrées modifiées sont rechargées et seuls les
+    contrôles dont une entrée a changé (ou trop anciens) sont relancés,
+    en parallèle et sous timeout. Le nom d'un contrôle est celui de la
+    policy de ses violations (policy_violated).
+    """
+    
+    def __init__(self, logger: logging.Logger, input_timeout: float = 30.0):
+        self.logger = logger
+        self.input_timeout = input_timeout
+        self.inputs: Dict[str, ComplianceInput] = {}
+        self.checks: Dict[str, ComplianceCheck] = {}
+        self._input_fingerprints: Dict[str, Any] = {}
+        self._snapshots: Dict[str, Any] = {}
+        self._check_state: Dict[str, Tuple[Tuple, float]] = {}
+        
+    def register_input(self, compliance_input: ComplianceInput):
+        self.inputs[compliance_input.name] = compliance_input
+        
+    def register_check(self, check: ComplianceCheck):
+        self.checks[check.name] = check
+    
+    async def run(self) -> Dict[str, List['ComplianceViolation']]:
+        """Cycle compliance: violations par contrôle relancé et terminé ([] = passé)"""
+        fingerprints = await self._gather_with_timeout(
+            {name: source.fingerprint() for name, source in self.inputs.items()},
+            self.input_timeout)
+        
+        now = time.monotonic()
+        due_checks = []
+        for check in self.checks.values():
+            if any(fingerprints.get(name) is None for name in check.inputs):
+                self.logger.warning(f"Contrôle {check.name} ignoré: entrée indisponible")
+                continue
+            key = tuple(fingerprints[name] for name in check.inputs)
+            previous = self._check_state.get(check.name)
+            expired = (previous is not None and check.max_age is not None
+                       and now - previous[1] > check.max_age)
+            if previous is None or previous[0] != key or expired:
+                due_checks.append((check, key))
+        
+        # Rechargement des seules entrées modifiées nécessaires aux contrôles dus
+        stale_inputs = {
+            name for check, _ in due_checks for name in check.inputs
+            if name not in self._snapshots or self._input_fingerprints.get(name) != fingerprints[name]
+        }
+        loaded = await self._gather_with_timeout(
+            {name: self.inputs[name].load() for name in stale_inputs},
+            self.input_timeout)
+        for name in stale_inputs:
+            if loaded.get(name) is not None:
+                self._snapshots[name] = loaded[name]
+                self._input_fingerprints[name] = fingerprints[name]
+        
+        runnable = [(check, key) for check, key in due_checks
+                    if all(self._input_fingerprints.get(name) == fingerprints[name]
+                           for name in check.inputs)]
+        results = await self._gather_with_timeout({
+            check.name: asyncio.wait_for(
+                check.run(**{name: self._snapshots[name] for name in check.inputs}),
+                timeout=check.timeout)
+            for check, _ in runnable
+        }, timeout=None)
+        
+        violations = {}
+        for check, key in runnable:
+            if check.name not in results:
+                continue  # échec/timeout: relancé au prochain cycle
+            self._check_state[check.name] = (key, now)
+            result = results[check.name]
+            if isinstance(result, list):
+                violations[check.name] = result
+            else:
+                violations[check.name] = [result] if result is not None else []
+        return violations
+    
+    async def _gather_with_timeout(self, coroutines: Dict[str, Awaitable],
+                                   timeout: Optional[float]) -> Dict[str, Any]:
+        """Exécute en parallèle; les échecs sont journalisés et omis du résultat"""
+        names = list(coroutines)
+        outcomes = await asyncio.gather(
+            *(asyncio.wait_for(coroutines[name], timeout=timeout) for name in names),
+            return_exceptions=True)
+        
+        results = {}
+        for name, outcome in zip(names, outcomes):
+            if isinstance(outcome, BaseException):
+                self.logger.error(f"Erreur compliance {name}: {outcome!r}")
+            else:
+                results[name] = outcome
+        return results
+
+class ShardCoordinator:
+    """Propriété des shards d'agents par baux Redis (réplicas HA du monitor)
+    
+    Les agents sont répartis en `shards` shards (crc32, stable entre
+    processus). À chaque tick: heartbeat du réplica et purge des réplicas
+    expirés (script Lua, horloge Redis), propriétaire désiré de chaque shard
+    par rendezvous hashing sur les réplicas vivants (perte/ajout d'un réplica
+    ne déplace que ses shards), puis un second script renouvelle, libère ou
+    prend tous les baux en un aller-retour. Un réplica n'agit sur un agent que
+    tant que son bail local est valide: coupé de Redis, il s'arrête avant
+    qu'un autre réplica ne puisse reprendre le shard (pas de split brain).
+    """
+    
+    HEARTBEAT_SCRIPT = """
+    local now = redis.call('TIME')
+    now = tonumber(now[1]) * 1000 + math.floor(tonumber(now[2]) / 1000)
+    redis.call('ZADD', KEYS[1], now + tonumber(ARGV[2]), ARGV[1])
+    redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+    return redis.call('ZRANGE', KEYS[1], 0, -1)
+    """
+    CLAIM_SCRIPT = """
+    local held = {}
+    for i, key in ipairs(KEYS) do
+        local owner = redis.call('GET', key)
+        if ARGV[i + 2] == '1' then
+            if owner == ARGV[1] then
+                redis.call('PEXPIRE', key, ARGV[2])
+                table.insert(held, i - 1)
+            elseif not owner then
+                redis.call('SET', key, ARGV[1], 'PX', ARGV[2])
+                table.insert(held, i - 1)
+            end
+        elseif owner == ARGV[1] then
+            redis.call('DEL', key)
+        end
+    end
+    return held
+    """
+    RELEASE_SCRIPT = """
+    for i = 1, #KEYS - 1 do
+        if redis.call('GET', KEYS[i]) == ARGV[1] then
+            redis.call('DEL', KEYS[i])
+        end
+    end
+    redis.call('ZREM', KEYS[#KEYS], ARGV[1])
+    return 1
+    """
+    # Incréments par agent, appliqués seulement si le réplica possède encore le shard
+    INCREMENT_SCRIPT = """
+    local totals = {}
+    for i = 0, #KEYS / 3 - 1 do
+        if redis.call('GET', KEYS[i * 3 + 1]) == ARGV[1] then
+            totals[i + 1] = redis.call('HINCRBY', KEYS[i * 3 + 2], ARGV[i * 3 + 3], ARGV[i * 3 + 4])
+            redis.call('PEXPIRE', KEYS[i * 3 + 2], ARGV[2])
+            redis.call('SADD', KEYS[i * 3 + 3], ARGV[i * 3 + 5])
+            redis.call('PEXPIRE', KEYS[i * 3 + 3], ARGV[2])
+        else
+            totals[i + 1] = false
+        end
+    end
+    return totals
+    """
+    
+    def __init__(self, redis_client, replica_id: str, shards: int = 64, lease_ttl: float = 15.0,
+                 renew_interval: float = 5.0, key_prefix: str = 'bmad:coord'):
+        self.redis = redis_client
+        self.replica_id = replica_id
+        self.shards = shards
+        self.lease_ttl = lease_ttl
+        self.renew_interval = renew_interval
+        self.key_prefix = key_prefix
+        self.held: set = set()
+        self.live_replicas: List[str] = []
+        self._valid_until = 0.0
+        self._shard_keys = [self.shard_key(shard) for shard in range(shards)]
+        self._heartbeat = redis_client.register_script(self.HEARTBEAT_SCRIPT)
+        self._claim = redis_client.register_script(self.CLAIM_SCRIPT)
+        self._release = redis_client.register_script(self.RELEASE_SCRIPT)
+        self.increment_script = redis_client.register_script(self.INCREMENT_SCRIPT)
+        
+    def shard_of(self, agent_id: str) -> int:
+        return zlib.crc32(agent_id.encode()) % self.shards
+    
+    def shard_key(self, shard: int) -> str:
+        return f"{self.key_prefix}:shard:{shard}"
+    
+    def key(self, *parts) -> str:
+        return ':'.join([self.key_prefix, *map(str, parts)])
+    
+    def owns(self, agent_id: str) -> bool:
+        return time.monotonic() < self._valid_until and self.shard_of(agent_id) in self.held
+    
+    def renew(self) -> Tuple[set, set]:
+        """Tick de coordination (bloquant): shards (acquis, perdus) depuis le tick précédent"""
+        started = time.monotonic()
+        ttl_ms = int(self.lease_ttl * 1000)
+        self.live_replicas = sorted(
+            _text(replica) for replica in self._heartbeat(keys=[self.key('replicas')], args=[self.replica_id, ttl_ms]))
+        desired = ['1' if self.desired_owner(shard) == self.replica_id else '0' for shard in range(self.shards)]
+        held = {int(shard) for shard in self._claim(keys=self._shard_keys, args=[self.replica_id, ttl_ms] + desired)}
+        
+        # Bail local expiré entre deux ticks: l'état local n'est plus fiable, tout est rechargé
+        previous = self.held if started < self._valid_until else set()
+        acquired, lost = held - previous, self.held - held
+        self.held = held
+        # Marge 10%: le bail Redis court depuis un instant >= started
+        self._valid_until = started + self.lease_ttl * 0.9
+        return acquired, lost
+    
+    def desired_owner(self, shard: int) -> Optional[str]:
+        """Rendezvous hashing: réplica vivant au score crc32(réplica:shard) maximal"""
+        return max(self.live_replicas, key=lambda replica: zlib.crc32(f"{replica}:{shard}".encode()),
+                   default=None)
+    
+    def release(self):
+        """Départ propre: libère baux et heartbeat (rééquilibrage immédiat)"""
+        self._release(keys=self._shard_keys + [self.key('replicas')], args=[self.replica_id])
+        self.held = set()
+        self._valid_until = 0.0
+    
+    def claim_once(self, name: str, ttl: float) -> bool:
+        """Action unique sur le cluster pendant `ttl` s (lockout, cooldown d'alerte)"""
+        return bool(self.redis.set(self.key('once', name), self.replica_id, nx=True, px=max(int(ttl * 1000), 1)))
+    
+    @property
+    def lease_valid(self) -> bool:
+        return time.monotonic() < self._valid_until
+    
+    def status(self) -> Dict[str, Any]:
+        """Réplicas vivants et propriétaires des shards (diagnostic)"""
+        owners = self.redis.mget(self._shard_keys)
+        replicas = self.redis.zrange(self.key('replicas'), 0, -1, withscores=True)
+        shards_by_owner = defaultdict(list)
+        for shard, owner in enumerate(owners):
+            shards_by_owner[_text(owner) if owner else None].append(shard)
+        return {'replicas': {_text(replica): expires_ms for replica, expires_ms in replicas},
+                'shards': dict(shards_by_owner)}
+
+class AgentStateSync:
+    """État par agent partagé entre réplicas: compteurs et baselines synchronisés par lots
+    
+    Les incréments sont cumulés localement puis appliqués en un script Lua par
+    flush (refusés pour les shards qui ne sont plus possédés); les baselines
+    sont poussées par pipeline (RPUSH + LTRIM). À l'acquisition d'un shard,
+    l'état de ses agents est rechargé. Sans coordinateur, état purement local.
+    """
+    
+    def __init__(self, coordinator: Optional[ShardCoordinator], state_ttl: float = 48 * 3600,
+                 baseline_size: int = 30 * 24):
+        self.coordinator = coordinator
+        self.state_ttl = state_ttl
+        self.baseline_size = baseline_size
+        self._totals: Dict[Tuple[str, str], int] = {}
+        self._pending: Dict[Tuple[str, str], int] = defaultdict(int)
+        self._pending_baselines: Dict[str, List[str]] = defaultdict(list)
+        self._once: Dict[str, float] = {}
+        
+    def increment(self, agent_id: str, field: str, amount: int = 1) -> int:
+        """Incrémente et renvoie le total estimé (dernier total synchronisé + delta local)"""
+        key = (agent_id, field)
+        if self.coordinator is None:
+            self._totals[key] = self._totals.get(key, 0) + amount
+            return self._totals[key]
+        self._pending[key] += amount
+        return self._totals.get(key, 0) + self._pending[key]
+    
+    def push_baseline(self, agent_id: str, sample: Dict):
+        if self.coordinator is not None:
+            self._pending_baselines[agent_id].append(json.dumps(sample, default=str))
+    
+    def claim_once(self, name: str, ttl: float) -> bool:
+        """Action unique pendant `ttl` s (cluster-wide avec coordinateur)"""
+        if self.coordinator is not None:
+            return self.coordinator.claim_once(name, ttl)
+        now = time.monotonic()
+        if self._once.get(name, 0.0) > now:
+            return False
+        self._once = {key: expiry for key, expiry in self._once.items() if expiry > now}
+        self._once[name] = now + ttl
+        return True
+    
+    def drop_fields(self, keep: Callable[[str], bool]):
+        """Oublie localement les champs rejetés par `keep(field)` (ex. compteurs de la veille)"""
+        self._totals = {key: total for key, total in self._totals.items() if keep(key[1])}
+    
+    def forget_shards(self, shards: set):
+        """Shards perdus: l'état local de leurs agents n'est plus autoritaire"""
+        owned_elsewhere = lambda agent_id: self.coordinator.shard_of(agent_id) in shards
+        self._totals = {key: total for key, total in self._totals.items() if not owned_elsewhere(key[0])}
+        self._pending = defaultdict(int, {key: delta for key, delta in self._pending.items()
+                                          if not owned_elsewhere(key[0])})
+        for agent_id in [agent_id for agent_id in self._pending_baselines if owned_elsewhere(agent_id)]:
+            del self._pending_baselines[agent_id]
+    
+    def flush(self):
+        """Envoie les incréments (1 script Lua) et les baselines (1 pipeline) en attente"""
+        if self.coordinator is None:
+            return
+        coordinator = self.coordinator
+        
+        if self._pending:
+            pending, self._pending = self._pending, defaultdict(int)
+            keys, args = [], [coordinator.replica_id, int(self.state_ttl * 1000)]
+            for (agent_id, field), delta in pending.items():
+                shard = coordinator.shard_of(agent_id)
+                keys += [coordinator.shard_key(shard), coordinator.key('state', agent_id),
+                         coordinator.key('shard_agents', shard)]
+                args += [field, delta, agent_id]
+            totals = coordinator.increment_script(keys=keys, args=args)
+            for key, total in zip(pending, totals):
+                if total is None:
+                    self._totals.pop(key, None)  # shard repris par un autre réplica
+                else:
+                    self._totals[key] = int(total)
+        
+        if self._pending_baselines:
+            pending_baselines, self._pending_baselines = self._pending_baselines, defaultdict(list)
+            pipeline = coordinator.redis.pipeline(transaction=False)
+            for agent_id, samples in pending_baselines.items():
+                baseline_key = coordinator.key('baseline', agent_id)
+                pipeline.rpush(baseline_key, *samples)
+                pipeline.ltrim(baseline_key, -self.baseline_size, -1)
+                pipeline.sadd(coordinator.key('shard_agents', coordinator.shard_of(agent_id)), agent_id)
+            pipeline.execute()
+    
+    def claim_escalations(self, fingerprints: Dict[str, List[str]]) -> Set[str]:
+        """Empreintes (par policy) pas encore escaladées sur le cluster, marquées au passage
+        
+        Registre Redis par policy (HSETNX): un changement de propriétaire du
+        shard 'system' ne ré-escalade pas les violations déjà escaladées.
+        Sans coordinateur, le ViolationStore local suffit (tout est accepté).
+        """
+        if self.coordinator is None:
+            return {fingerprint for values in fingerprints.values() for fingerprint in values}
+        coordinator = self.coordinator
+        ordered = [(policy, fingerprint) for policy, values in fingerprints.items() for fingerprint in values]
+        if not ordered:
+            return set()
+        pipeline = coordinator.redis.pipeline(transaction=False)
+        for policy, fingerprint in ordered:
+            pipeline.hsetnx(coordinator.key('escalated', policy), fingerprint, coordinator.replica_id)
+        return {fingerprint for (_, fingerprint), created in zip(ordered, pipeline.execute()) if created}
+    
+    def settle_escalations(self, current: Dict[str, Set[str]]):
+        """Policies contrôlées: oublie les empreintes disparues (une récurrence sera ré-escaladée)"""
+        if self.coordinator is None or not current:
+            return
+        coordinator = self.coordinator
+        policies = list(current)
+        pipeline = coordinator.redis.pipeline(transaction=False)
+        for policy in policies:
+            pipeline.hkeys(coordinator.key('escalated', policy))
+        stale = {policy: [fingerprint for fingerprint in map(_text, escalated)
+                          if fingerprint not in current[policy]]
+                 for policy, escalated in zip(policies, pipeline.execute())}
+        pipeline = coordinator.redis.pipeline(transaction=False)
+        for policy, fingerprints in stale.items():
+            if fingerprints:
+                pipeline.hdel(coordinator.key('escalated', policy), *fingerprints)
+        pipeline.execute()
+    
+    def load_shards(self, shards: set) -> Dict[str, List[Dict]]:
+        """Recharge compteurs et baselines des agents des shards acquis (2 pipelines)"""
+        coordinator = self.coordinator
+        pipeline = coordinator.redis.pipeline(transaction=False)
+        for shard in sorted(shards):
+            pipeline.smembers(coordinator.key('shard_agents', shard))
+        agent_ids = sorted({_text(agent_id) for members in pipeline.execute() for agent_id in members})
+        if not agent_ids:
+            return {}
+        
+        pipeline = coordinator.redis.pipeline(transaction=False)
+        for agent_id in agent_ids:
+            pipeline.hgetall(coordinator.key('state', agent_id))
+            pipeline.lrange(coordinator.key('baseline', agent_id), 0, -1)
+        results = pipeline.execute()
+        
+        baselines = {}
+        for index, agent_id in enumerate(agent_ids):
+            state, baseline = results[index * 2], results[index * 2 + 1]
+            for field, total in state.items():
+                self._totals[(agent_id, _text(field))] = int(total)
+            baselines[agent_id] = [json.loads(sample) for sample in baseline]
+        return baselines
+
+class EventForwarder:
+    """Relais vers le réplica propriétaire des événements de sources locales à l'hôte
+    
+    Audit log MCP, watcher filesystem et sampler ressources ne voient que
+    l'activité de leur hôte: un réplica non propriétaire de l'agent publie
+    l'événement dans le stream Redis du shard (XADD borné) au lieu de
+    l'écarter. Le propriétaire lit les streams de ses shards depuis un
+    curseur persisté, repris tel quel par le réplica suivant si le shard
+    change de main. Envois et curseurs par pipeline, une fois par lot.
+    
+    Une même observation (audit log partagé, fichier vu par plusieurs hôtes)
+    peut être relayée par chaque réplica: elle porte un source_id, revendiqué
+    par le propriétaire (SET NX EX) avant traitement.
+    """
+    
+    def __init__(self, coordinator: ShardCoordinator, stream_maxlen: int = 10000,
+                 outbox_size: int = 10000):
+        self.coordinator = coordinator
+        self.stream_maxlen = stream_maxlen
+        self.dropped = 0
+        self._outbox: deque = deque(maxlen=outbox_size)
+        self._cursors: Dict[int, str] = {}
+        self._dirty_cursors: Dict[int, str] = {}
+        
+    def forward(self, agent_id: str, kind: str, payload: Dict):
+        """Dépose sans bloquer (envoyé au prochain flush); outbox pleine = plus anciens perdus"""
+        if len(self._outbox) == self._outbox.maxlen:
+            self.dropped += 1
+        self._outbox.append((self.coordinator.shard_of(agent_id), kind, json.dumps(payload, default=str)))
+    
+    @property
+    def has_streams(self) -> bool:
+        return bool(self._cursors)
+    
+    def flush(self):
+        """XADD des événements en attente + persistance des curseurs lus (1 pipeline)"""
+        outbox = []
+        while self._outbox:
+            outbox.append(self._outbox.popleft())
+        cursors, self._dirty_cursors = self._dirty_cursors, {}
+        if not outbox and not cursors:
+            return
+        
+        coordinator = self.coordinator
+        pipeline = coordinator.redis.pipeline(transaction=False)
+        for shard, kind, payload in outbox:
+            pipeline.xadd(coordinator.key('forward', shard),
+                          {'kind': kind, 'payload': payload, 'origin': coordinator.replica_id},
+                          maxlen=self.stream_maxlen, approximate=True)
+        for shard, cursor in cursors.items():
+            pipeline.set(coordinator.key('forward_cursor', shard), cursor)
+        try:
+            pipeline.execute()
+        except Exception:
+            # Redis indisponible: réessayé au flush suivant (outbox bornée)
+            self._outbox.extendleft(reversed(outbox))
+            self._dirty_cursors = {**cursors, **self._dirty_cursors}
+            raise
+    
+    def load_cursors(self, shards: set):
+        """Shards acquis: reprise au curseur de l'ancien propriétaire (début du stream sinon)"""
+        ordered = sorted(shards)
+        if not ordered:
+            return
+        cursors = self.coordinator.redis.mget([self.coordinator.key('forward_cursor', shard) for shard in ordered])
+        for shard, cursor in zip(ordered, cursors):
+            self._cursors[shard] = _text(cursor) if cursor else '0-0'
+    
+    def forget_shards(self, shards: set):
+        for shard in shards:
+            self._cursors.pop(shard, None)
+            self._dirty_cursors.pop(shard, None)
+    
+    def read(self, block_ms: int = 1000, count: int = 500) -> List[Tuple[str, Dict]]:
+        """Événements relayés vers les shards possédés (bloquant au plus block_ms)"""
+        cursors = dict(self._cursors)
+        if not cursors or not self.coordinator.lease_valid:
+            return []
+        response = self.coordinator.redis.xread(
+            {self.coordinator.key('forward', shard): cursor for shard, cursor in cursors.items()},
+            count=count, block=block_ms)
+        
+        messages = []
+        for stream, entries in response or []:
+            shard = int(_text(stream).rsplit(':', 1)[1])
+            for entry_id, fields in entries:
+                fields = {_text(name): _text(value) for name, value in fields.items()}
+                messages.append((fields['kind'], json.loads(fields['payload'])))
+            if entries and shard in self._cursors:
+                self._cursors[shard] = self._dirty_cursors[shard] = _text(entries[-1][0])
+        return messages
+
 class SecurityEventProcessor:
     """Processeur événements sécurité en temps réel"""
     
     def __init__(self, config: Dict):
         self.config = config
-        self.event_queue = asyncio.Queue(maxsize=10000)
-        self.redis_client = redis.Redis(**config['redis'])
+        self.event_queue = SeverityPriorityQueue(config.get('event_queue_capacity'))
+        
+        # Instrumentation pipeline (désactivée par défaut)
+        self.instrumentation = PipelineInstrumentation(config.get('instrumentation', {}))
+        if self.instrumentation.enabled:
+            self.event_queue.wait_observer = functools.partial(self.instrumentation.observe, 'queue')
+        self._redis_client = None
         self.postgres_conn = None
+        self._postgres_readonly_conn = None
+        self._postgres_readonly_lock = threading.Lock()
         self.alert_channels = []
         self.setup_logging()
         
@@ -83,18 +2159,80 @@ class SecurityEventProcessor:
         }
         
         # Compliance tracking
+        self.permissions_matrix_path = config.get('permissions_matrix_path', DEFAULT_PERMISSIONS_MATRIX)
         self.compliance_policies = self._load_compliance_policies()
-        self.violation_history = deque(maxlen=1000)
+        self.access_matrix = self._load_access_matrix()
+        self.violation_store = ViolationStore(
+            config.get('violation_db_path', '/var/log/bmad/compliance-violations.db'))
+        self.compliance_interval = config.get('compliance_interval', 300)  # 5 min
+        self.compliance_engine = self._build_compliance_engine()
+        
+        # Flux temps réel WebSocket (dashboards), activé explicitement
+        stream_config = config.get('event_stream', {})
+        self.event_stream = SecurityEventStream(
+            stream_config.get('host', 'localhost'), stream_config.get('port', 8765),
+            stream_config.get('queue_size', 256)) if stream_config.get('enabled', False) else None
+        
+        # Enrichissement réseau/client (CIDR, réputation, empreintes user agent)
+        self.network_enricher = NetworkEnricher(config)
+        
+        # Ressources processus MCP corrélées à l'activité agents
+        self.agent_activity = AgentActivityWindow()
+        # Débit et taux d'erreur par agent (fenêtre 1 min, heure de l'événement)
+        self.agent_requests = AgentRequestWindow(config.get('request_rate_window', 60.0))
         
+        # Heures ouvrées par agent/équipe (évaluées sur l'horodatage de l'événement)
+        self.business_hours = BusinessHoursRegistry(
+            config.get('business_hours', {}), self._load_agent_teams())
+        
+        # Coordination réplicas HA (shards d'agents par baux Redis), désactivée par défaut
+        coordination_config = config.get('coordination', {})
+        self.coordinator = ShardCoordinator(
+            self.redis_client,
+            coordination_config.get('replica_id', f"{socket.gethostname()}-{os.getpid()}"),
+            shards=coordination_config.get('shards', 64),
+            lease_ttl=coordination_config.get('lease_ttl', 15.0),
+            renew_interval=coordination_config.get('renew_interval', 5.0),
+            key_prefix=coordination_config.get('key_prefix', 'bmad:coord')
+        ) if coordination_config.get('enabled', False) else None
+        self.agent_state = AgentStateSync(self.coordinator)
+        self.event_forwarder = EventForwarder(
+            self.coordinator, coordination_config.get('forward_stream_maxlen', 10000)
+        ) if self.coordinator is not None else None
+        # Sources locales lues par plusieurs réplicas (même hôte/volume): identité -> traitement unique
+        self.event_dedup_ttl = coordination_config.get('event_dedup_ttl', 300)
+        
+    @property
+    def redis_client(self):
+        """Client Redis créé au premier usage"""
+        if self._redis_client is None:
+            self._redis_client = redis.Redis(**self.config['redis'])
+        return self._redis_client
+    
+    @property
+    def postgres_readonly_conn(self):
+        """Connexion Postgres des lectures en thread (grants, pg_stat), créée au premier usage
+        
+        Autocommit + lecture seule: aucune transaction ouverte, donc rien à
+        annuler sur postgres_conn, qui porte les écritures (security_events).
+        """
+        with self._postgres_readonly_lock:
+            if self._postgres_readonly_conn is None or self._postgres_readonly_conn.closed:
+                conn = psycopg2.connect(**self.config['postgres'])
+                conn.set_session(readonly=True, autocommit=True)
+                self._postgres_readonly_conn = conn
+            return self._postgres_readonly_conn
+    
     def setup_logging(self):
-        """Configuration logging sécurisé"""
+        """Configuration logging sécurisé (log_path None: console uniquement)"""
+        log_path = self.config.get('log_path', '/var/log/bmad/security-monitoring.log')
+        handlers = [logging.StreamHandler()]
+        if log_path:
+            handlers.insert(0, logging.FileHandler(log_path))
         logging.basicConfig(
             level=logging.INFO,
             format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.FileHandler('/var/log/bmad/security-monitoring.log'),
-                logging.StreamHandler()
-            ]
+            handlers=handlers
         )
         self.logger = logging.getLogger(__name__)
 
@@ -106,9 +2244,24 @@ class SecurityEventProcessor:
         await self._setup_database_connection()
         
         # Démarrage serveur métriques Prometheus
-        start_http_server(9090)
+        prometheus_client.start_http_server(9090)
         self.logger.info("📊 Serveur métriques Prometheus démarré sur port 9090")
         
+        if self.event_stream is not None:
+            await self.event_stream.start()
+            self.logger.info(f"📡 Flux WebSocket événements sur port {self.event_stream.port}")
+        
+        if self.instrumentation.profiler_enabled:
+            await self.instrumentation.start(self.logger)
+            self.logger.info(f"🔥 Profiler à la demande: {self.instrumentation.profile_signal} ou "
+                             f"http://{self.instrumentation.profiler_host}:{self.instrumentation.profiler_port}/debug/profile")
+        
+        # Coordination: premier tick avant tout traitement (shards possédés connus)
+        if self.coordinator is not None:
+            await self._renew_coordination()
+            self.logger.info(f"🤝 Réplica {self.coordinator.replica_id}: "
+                             f"{len(self.coordinator.held)}/{self.coordinator.shards} shards")
+        
         # Lancement tâches monitoring
         tasks = [
             asyncio.create_task(self._monitor_mcp_interactions()),
@@ -119,10 +2272,18 @@ class SecurityEventProcessor:
             asyncio.create_task(self._process_security_events()),
             asyncio.create_task(self._detect_anomalies()),
             asyncio.create_task(self._compliance_monitoring()),
-            asyncio.create_task(self._generate_real_time_alerts())
+            asyncio.create_task(self._generate_real_time_alerts()),
+            asyncio.create_task(self._sample_mcp_process_resources())
         ]
+        if self.coordinator is not None:
+            tasks.append(asyncio.create_task(self._coordinate_replicas()))
+            tasks.append(asyncio.create_task(self._relay_forwarded_events()))
         
-        await asyncio.gather(*tasks)
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            if self.coordinator is not None:
+                await asyncio.to_thread(self.coordinator.release)
 
     async def _monitor_mcp_interactions(self):
         """Surveillance interactions MCP en temps réel"""
@@ -132,17 +2293,23 @@ class SecurityEventProcessor:
             try:
                 # Lecture logs MCP en temps réel
                 async with aiofiles.open('/var/log/bmad/audit/mcp-audit.log', 'r') as f:
-                    await f.seek(0, 2)  # Fin du fichier
+                    offset = await f.seek(0, 2)  # Fin du fichier
                     
                     while True:
+                        read_started = time.perf_counter()
                         line = await f.readline()
                         if not line:
                             await asyncio.sleep(0.1)
                             continue
+                        line_offset, offset = offset, offset + len(line.encode())
+                        # Ingestion mesurée sur les seules lectures productives (pas les polls vides)
+                        if self.instrumentation.enabled:
+                            self.instrumentation.observe('ingest', time.perf_counter() - read_started)
                             
                         try:
-                            event_data = json.loads(line.strip())
-                            await self._process_mcp_event(event_data)
+                            with self.instrumentation.stage('parse'):
+                                event_data = json.loads(line.strip())
+                            await self._process_mcp_event(event_data, self._audit_line_id(line_offset, line))
                         except json.JSONDecodeError:
                             continue
                             
@@ -150,18 +2317,37 @@ class SecurityEventProcessor:
                 self.logger.error(f"Erreur monitoring MCP: {e}")
                 await asyncio.sleep(5)
 
-    async def _process_mcp_event(self, event_data: Dict):
-        """Traite événement MCP individuel"""
+    async def _process_mcp_event(self, event_data: Dict, source_id: Optional[str] = None):
+        """Traite événement MCP individuel
+        
+        source_id: identité de la ligne d'audit (offset + contenu), relayée
+        avec l'événement; le propriétaire ne traite qu'une fois une ligne lue
+        par plusieurs réplicas (audit log partagé) ou relayée plusieurs fois.
+        """
         agent_id = event_data.get('agent_id', 'unknown')
         method = event_data.get('method', 'unknown')
         server_name = event_data.get('server_name', 'unknown')
         response_time = event_data.get('duration_ms', 0) / 1000
         
+        # Réplicas HA: audit log local à l'hôte, l'événement est relayé au propriétaire du shard
+        if not self._owns(agent_id):
+            self.event_forwarder.forward(agent_id, 'mcp_event', {'source_id': source_id, 'event': event_data})
+            return
+        if source_id is not None and not await self._claim_source_event(source_id):
+            return
+        
         # Métriques Prometheus
         RESPONSE_TIME.labels(server=server_name, method=method).observe(response_time)
+        self.agent_activity.record(server_name, agent_id)
+        self.agent_requests.record(
+            agent_id, self.business_hours.event_time(event_data.get('timestamp')).timestamp(),
+            self._is_error_response(event_data))
         
-        # Détection patterns suspects
-        risk_indicators = self._analyze_mcp_event_risk(event_data)
+        # Contexte réseau/client (en cache) puis détection patterns suspects
+        with self.instrumentation.stage('score'):
+            network_context = self.network_enricher.enrich(
+                event_data.get('source_ip') or '', event_data.get('user_agent') or '', agent_id)
+            risk_indicators = self._analyze_mcp_event_risk(event_data, network_context)
         
         if risk_indicators:
             security_event = SecurityEvent(
@@ -171,16 +2357,16 @@ class SecurityEventProcessor:
                 severity=self._calculate_severity(risk_indicators),
                 resource=server_name,
                 action=method,
-                source_ip=event_data.get('source_ip', ''),
-                user_agent=event_data.get('user_agent', ''),
-                details=event_data,
+                source_ip=event_data.get('source_ip') or '',
+                user_agent=event_data.get('user_agent') or '',
+                details={**event_data, 'network_context': network_context},
                 risk_score=sum(indicator['score'] for indicator in risk_indicators),
                 compliance_flags=[]
             )
             
             await self.event_queue.put(security_event)
 
-    def _analyze_mcp_event_risk(self, event_data: Dict) -> List[Dict]:
+    def _analyze_mcp_event_risk(self, event_data: Dict, network_context: Optional[Dict] = None) -> List[Dict]:
         """Analyse risques événement MCP"""
         risk_indicators = []
         
@@ -196,13 +2382,36 @@ class SecurityEventProcessor:
                 'description': f'Agent {agent_id} accès non autorisé {server_name}:{method}'
             })
         
-        # Détection patterns temporels suspects
-        hour = datetime.now().hour
-        if hour < 6 or hour > 22:  # Accès hors heures
+        # Contexte réseau: source listée en réputation, hors zones connues, client inconnu
+        if network_context:
+            if network_context['reputation']:
+                risk_indicators.append({
+                    'type': 'bad_reputation_source',
+                    'score': 7.0,
+                    'description': f"Source {event_data.get('source_ip')} listée ({network_context['reputation']})"
+                })
+            elif network_context['network_zone'] == 'external':
+                risk_indicators.append({
+                    'type': 'external_source',
+                    'score': 4.0,
+                    'description': f"Source {event_data.get('source_ip')} hors zones réseau connues"
+                })
+            if network_context['user_agent_known'] is False:
+                risk_indicators.append({
+                    'type': 'unknown_user_agent',
+                    'score': 3.0,
+                    'description': f"Client {network_context['client_product']} inattendu pour {agent_id}"
+                })
+        
+        # Détection patterns temporels suspects (horodatage de l'événement, fuseau de l'agent)
+        event_time = self.business_hours.event_time(event_data.get('timestamp'))
+        if self.business_hours.is_off_hours(agent_id, event_time):  # Accès hors heures
+            schedule = self.business_hours.schedule_for(agent_id)
             risk_indicators.append({
                 'type': 'off_hours_access', 
                 'score': 3.0,
-                'description': 'Accès hors heures ouverture'
+                'description': f"Accès hors heures ouverture "
+                               f"({event_time.astimezone(schedule.zone):%a %H:%M} {schedule.timezone_name})"
             })
         
         # Détection volume anormal requêtes
@@ -225,12 +2434,54 @@ class SecurityEventProcessor:
             
         return risk_indicators
 
+    def _load_compliance_policies(self) -> Dict:
+        """security_policies de la matrice enterprise (chiffrement, rétention, ...)"""
+        return self._load_json_file(self.permissions_matrix_path).get('security_policies', {})
+    
+    def _load_access_matrix(self) -> Dict[str, Dict[str, Set[str]]]:
+        """Agent -> serveur MCP -> permissions accordées (matrice enterprise)"""
+        enterprise = self._load_json_file(self.permissions_matrix_path)
+        return {agent_id: {server: set(server_config.get('permissions', []))
+                           for server, server_config in agent.get('mcp_servers', {}).items()}
+                for agent_id, agent in enterprise.get('permissions_matrix', {}).items()}
+    
+    def _is_access_authorized(self, agent_id: str, server_name: str, method: str) -> bool:
+        """Le serveur est déclaré pour l'agent avec la permission requise par la méthode"""
+        granted = self.access_matrix.get(agent_id, {}).get(server_name)
+        if granted is None:
+            return False
+        method = (method or '').lower()
+        required = next((permission for permission, patterns in METHOD_PERMISSIONS
+                         if any(pattern in method for pattern in patterns)), 'read')
+        return required in granted or 'admin' in granted
+    
+    @staticmethod
+    def _is_error_response(event_data: Dict) -> bool:
+        """response_status en erreur (code >= 400 ou statut textuel d'échec)"""
+        status = event_data.get('response_status')
+        if isinstance(status, (int, float)):
+            return status >= 400
+        if isinstance(status, str):
+            return status.isdigit() and int(status) >= 400 or status.lower() in ('error', 'failed', 'denied')
+        return bool(event_data.get('error'))
+    
+    def _get_agent_request_rate(self, agent_id: str) -> float:
+        return self.agent_requests.rate(agent_id)
+    
+    def _get_agent_error_rate(self, agent_id: str) -> float:
+        return self.agent_requests.error_rate(agent_id)
+    
+    @staticmethod
+    def _calculate_severity(risk_indicators: List[Dict]) -> str:
+        """Sévérité selon le score de risque cumulé (SEVERITY_THRESHOLDS)"""
+        score = sum(indicator['score'] for indicator in risk_indicators)
+        return next((severity for threshold, severity in SEVERITY_THRESHOLDS if score >= threshold), 'LOW')
+
     async def _monitor_authentication_events(self):
         """Surveillance événements authentification"""
         self.logger.info("🔐 Monitoring authentification actif")
         
-        auth_failures = defaultdict(int)
-        lockout_tracking = {}
+        lockout_ttl = self.config.get('lockout_ttl', 3600)
         
         while True:
             try:
@@ -241,21 +2492,26 @@ class SecurityEventProcessor:
                     event_data = json.loads(event_json)
                     agent_id = event_data['agent_id']
                     success = event_data['success']
+                    if not self._owns(agent_id):
+                        continue
                     
                     # Métriques
                     status = 'success' if success else 'failure'
                     AUTHENTICATION_ATTEMPTS.labels(agent=agent_id, status=status).inc()
                     
                     if not success:
-                        auth_failures[agent_id] += 1
+                        # Compteur du jour partagé entre réplicas (reset quotidien par nom de champ)
+                        failures = self.agent_state.increment(agent_id, f"auth_failures:{date.today()}")
                         
-                        # Détection brute force
-                        if auth_failures[agent_id] >= 5:
+                        # Détection brute force (un seul lockout par agent sur le cluster)
+                        if failures >= 5 and await asyncio.to_thread(
+                                self.agent_state.claim_once, f"lockout:{agent_id}", lockout_ttl):
                             await self._trigger_security_lockout(agent_id, 'brute_force_attempt')
                             
                 # Nettoyage compteurs (reset quotidien)
-                if datetime.now().hour == 0 and datetime.now().minute == 0:
-                    auth_failures.clear()
+                today_field = f"auth_failures:{date.today()}"
+                self.agent_state.drop_fields(
+                    lambda field: not field.startswith('auth_failures:') or field == today_field)
                     
                 await asyncio.sleep(1)
                 
@@ -277,7 +2533,7 @@ class SecurityEventProcessor:
                 ORDER BY timestamp DESC
                 """
                 
-                cursor = self.postgres_conn.cursor(cursor_factory=RealDictCursor)
+                cursor = self.postgres_conn.cursor(cursor_factory=psycopg2_extras.RealDictCursor)
                 cursor.execute(query)
                 decisions = cursor.fetchall()
                 
@@ -285,6 +2541,8 @@ class SecurityEventProcessor:
                     agent_id = decision['agent_id']
                     resource = decision['resource']
                     decision_result = decision['decision']
+                    if not self._owns(agent_id):
+                        continue
                     
                     # Métriques
                     AUTHORIZATION_DECISIONS.labels(
@@ -320,6 +2578,381 @@ class SecurityEventProcessor:
                 self.logger.error(f"Erreur monitoring authz: {e}")
                 await asyncio.sleep(5)
 
+    async def _monitor_file_system_access(self):
+        """Surveillance accès filesystem hors périmètre agent
+        
+        Attribution par uid de l'accédant (fanotify). Un accès non attribué
+        (mode inotify, ou accédant terminé avant résolution de son uid) est
+        compté et journalisé; s'il sort du périmètre de tous les agents, il
+        produit un événement sous l'agent synthétique 'unknown'.
+        """
+        self.logger.info("📁 Monitoring accès filesystem actif")
+        
+        while True:
+            watcher = None
+            try:
+                watcher = FileSystemWatcher(
+                    self.config.get('fs_monitor_paths', DEFAULT_FS_MONITOR_PATHS),
+                    debounce=self.config.get('fs_debounce_seconds', 0.5))
+                scopes = {agent_id: self._compile_path_scopes(agent_scopes)
+                          for agent_id, agent_scopes in self._load_isolation_scopes('filesystem').items()}
+                await watcher.start()
+                self.logger.info(f"📁 Watcher {watcher.mode} sur {len(watcher.roots)} racines")
+                if watcher.mode == 'inotify':
+                    self.logger.warning("⚠️ Watcher inotify: modifications seulement, sans attribution "
+                                        "agent (fanotify requis, exécution privilégiée)")
+                
+                while True:
+                    unattributed = []
+                    for access in await watcher.next_batch():
+                        agent_id = self._resolve_file_access_agent(access, scopes)
+                        if agent_id is None:
+                            if access.uid is None:
+                                unattributed.append(access)
+                            continue
+                        # Source locale à l'hôte: pas de filtre de shard (relais au dispatch)
+                        if not self._path_in_scopes(access.path, scopes[agent_id]):
+                            await self.event_queue.put(self._file_access_event(agent_id, access, watcher.mode))
+                    
+                    for access in unattributed:
+                        FS_UNATTRIBUTED_ACCESSES.labels(mode=watcher.mode).inc()
+                        if not any(self._path_in_scopes(access.path, agent_scopes)
+                                   for agent_scopes in scopes.values()):
+                            await self.event_queue.put(self._file_access_event('unknown', access, watcher.mode))
+                    if unattributed and watcher.mode == 'fanotify':
+                        self.logger.warning(
+                            f"⚠️ {len(unattributed)} accès fichier non attribués (uid introuvable, "
+                            f"processus terminé), ex. {unattributed[0].path} pid={unattributed[0].pid}")
+                        
+            except ImportError as e:
+                # Hors Linux (pas d'inotify): surveillance désactivée, le reste du monitoring continue
+                self.logger.warning(f"⚠️ Surveillance filesystem désactivée ({e})")
+                return
+            except Exception as e:
+                self.logger.error(f"Erreur monitoring filesystem: {e}")
+                await asyncio.sleep(5)
+            finally:
+                if watcher is not None:
+                    watcher.stop()
+    
+    def _file_access_event(self, agent_id: str, access: FileAccess, watcher_mode: str) -> SecurityEvent:
+        """Accès fichier hors périmètre (écriture HIGH, lecture MEDIUM)"""
+        is_write = bool(access.operations - {'read'})
+        return SecurityEvent(
+            timestamp=datetime.now(),
+            agent_id=agent_id,
+            event_type='unauthorized_file_access' if agent_id != 'unknown' else 'unattributed_file_access',
+            severity='HIGH' if is_write else 'MEDIUM',
+            resource=access.path,
+            action=','.join(sorted(access.operations)),
+            source_ip='',
+            user_agent='',
+            details={'pid': access.pid, 'occurrences': access.count, 'watcher_mode': watcher_mode,
+                     'source_id': self._host_event_id(
+                         'fs', access.path, access.pid, sorted(access.operations),
+                         int(time.time() // HOST_EVENT_DEDUP_WINDOW))},
+            risk_score=8.0 if is_write else 5.0,
+            compliance_flags=['ISO27001', 'SOC2']
+        )
+    
+    def _load_isolation_scopes(self, server: str) -> Dict[str, List[str]]:
+        """isolation_scope par agent pour un serveur MCP (tous agents connus)
+        
+        Combine la matrice détaillée (isolation_scope) et la matrice enterprise
+        (filesystem: allowed_paths, postgres: tables en `*.table`). Un agent
+        sans entrée pour ce serveur a un périmètre vide.
+        """
+        scopes = {}
+        detailed = self._load_json_file(self.config.get('detailed_matrix_path', DEFAULT_DETAILED_MATRIX))
+        for agents in detailed.get('detailed_permissions_matrix', {}).values():
+            for agent_id, servers in agents.items():
+                agent_scopes = scopes.setdefault(agent_id, [])
+                entry = servers.get(server)
+                if isinstance(entry, dict) and entry.get('isolation_scope'):
+                    agent_scopes.extend(
+                        scope.strip() for scope in entry['isolation_scope'].split(','))
+        
+        enterprise = self._load_json_file(self.permissions_matrix_path)
+        for agent_id, agent in enterprise.get('permissions_matrix', {}).items():
+            agent_scopes = scopes.setdefault(agent_id, [])
+            restrictions = agent.get('mcp_servers', {}).get(server, {}).get('restrictions', {})
+            if server == 'filesystem':
+                agent_scopes.extend(restrictions.get('allowed_paths', []))
+            elif server == 'postgres':
+                agent_scopes.extend(f"*.{table}" for table in restrictions.get('tables', []))
+        return scopes
+    
+    def _load_agent_teams(self) -> Dict[str, str]:
+        """Agent -> équipe (groupes de la matrice détaillée, ex. contains-testing-agents)"""
+        detailed = self._load_json_file(self.config.get('detailed_matrix_path', DEFAULT_DETAILED_MATRIX))
+        return {agent_id: team
+                for team, agents in detailed.get('detailed_permissions_matrix', {}).items()
+                for agent_id in agents}
+    
+    @staticmethod
+    def _compile_path_scopes(patterns: List[str]) -> Tuple[str, ...]:
+        """'/workspace/security/*' -> préfixe '/workspace/security'"""
+        return tuple(os.path.normpath(pattern.rstrip('*').rstrip('/') or '/') for pattern in patterns)
+    
+    @staticmethod
+    def _path_in_scopes(path: str, prefixes: Tuple[str, ...]) -> bool:
+        return any(path == prefix or path.startswith(prefix.rstrip('/') + '/') for prefix in prefixes)
+    
+    def _resolve_file_access_agent(self, access: FileAccess, known_agents: Dict) -> Optional[str]:
+        """Agent accédant: uid du processus relevé par le watcher (fanotify), None si non attribué"""
+        if access.uid is None:
+            return None
+        username = _username_for_uid(access.uid)
+        agent_id = self.config.get('agent_users', {}).get(username, username)
+        return agent_id if agent_id in known_agents else None
+
+    async def _monitor_database_interactions(self):
+        """Surveillance Postgres par diff de snapshots pg_stat_statements/pg_stat_activity"""
+        self.logger.info("🗄️ Monitoring interactions base de données actif")
+        
+        interval = self.config.get('db_monitor_interval', 60)
+        spike_factor = self.config.get('db_latency_spike_factor', 3.0)
+        spike_min_ms = self.config.get('db_latency_spike_min_ms', 50.0)
+        differ = None
+        
+        while True:
+            try:
+                if differ is None:
+                    scopes = {agent_id: self._compile_table_scopes(agent_scopes)
+                              for agent_id, agent_scopes in self._load_isolation_scopes('postgres').items()}
+                    # Rôle Postgres -> agent (par défaut le rôle porte le nom de l'agent)
+                    role_agents = {agent_id: agent_id for agent_id in scopes}
+                    role_agents.update({role: agent_id for role, agent_id
+                                        in self.config.get('agent_db_roles', {}).items() if agent_id in scopes})
+                    differ = PgStatSnapshotDiffer(
+                        list(role_agents),
+                        long_query_seconds=self.config.get('db_long_query_seconds', 30))
+                
+                deltas, long_running = await asyncio.to_thread(
+                    lambda: differ.sample(self.postgres_readonly_conn))
+                
+                for delta in deltas:
+                    agent_id = role_agents[delta.role]
+                    if not self._owns(agent_id):
+                        continue
+                    DB_QUERIES.labels(agent=agent_id).inc(delta.calls)
+                    DB_QUERY_TIME.labels(agent=agent_id).inc(delta.exec_ms / 1000)
+                    DB_ROWS.labels(agent=agent_id).inc(delta.rows)
+                    
+                    crossed = sorted(relation for relation in delta.relations
+                                     if not scopes[agent_id].match(relation))
+                    if crossed:
+                        await self.event_queue.put(self._database_event(
+                            agent_id, 'db_schema_boundary_crossing', 'HIGH' if delta.is_write else 'MEDIUM',
+                            ','.join(crossed), 'write' if delta.is_write else 'read',
+                            8.0 if delta.is_write else 6.0, delta))
+                    
+                    if (delta.baseline_ms is not None and delta.mean_ms >= spike_min_ms
+                            and delta.mean_ms > spike_factor * delta.baseline_ms):
+                        await self.event_queue.put(self._database_event(
+                            agent_id, 'db_latency_spike', 'MEDIUM', f"queryid:{delta.queryid}",
+                            'query', 4.0, delta))
+                
+                for activity in long_running:
+                    agent_id = role_agents[activity['role']]
+                    if not self._owns(agent_id):
+                        continue
+                    await self.event_queue.put(SecurityEvent(
+                        timestamp=datetime.now(),
+                        agent_id=agent_id,
+                        event_type='db_long_running_query',
+                        severity='MEDIUM',
+                        resource=f"pid:{activity['pid']}",
+                        action='query',
+                        source_ip='',
+                        user_agent='',
+                        details=activity,
+                        risk_score=4.0,
+                        compliance_flags=['MONITORING']
+                    ))
+                
+                await asyncio.sleep(interval)
+                
+            except Exception as e:
+                self.logger.error(f"Erreur monitoring base de données: {e}")
+                await asyncio.sleep(interval)
+    
+    @staticmethod
+    def _compile_table_scopes(patterns: List[str]) -> re.Pattern:
+        """'bmad_coordination.orchestrator_*' -> regex unique sur 'schema.table'"""
+        if not patterns:
+            return re.compile(r'(?!)')
+        return re.compile('|'.join(fnmatch.translate(pattern.lower()) for pattern in patterns))
+    
+    def _database_event(self, agent_id: str, event_type: str, severity: str, resource: str,
+                        action: str, risk_score: float, delta: QueryStatsDelta) -> SecurityEvent:
+        return SecurityEvent(
+            timestamp=datetime.now(),
+            agent_id=agent_id,
+            event_type=event_type,
+            severity=severity,
+            resource=resource,
+            action=action,
+            source_ip='',
+            user_agent='',
+            details={'role': delta.role, 'queryid': delta.queryid, 'calls': delta.calls,
+                     'mean_ms': round(delta.mean_ms, 3), 'baseline_ms': delta.baseline_ms,
+                     'rows': delta.rows},
+            risk_score=risk_score,
+            compliance_flags=['ISO27001', 'SOC2']
+        )
+
+    async def _sample_mcp_process_resources(self):
+        """Échantillonnage ressources processus MCP + détection d'épuisement corrélée aux agents"""
+        self.logger.info("🖥️ Échantillonnage ressources processus MCP actif")
+        
+        interval = self.config.get('resource_sample_interval', 5)
+        sigma = self.config.get('resource_spike_sigma', 4.0)
+        min_samples = self.config.get('resource_min_samples', 30)
+        cooldown = self.config.get('resource_alert_cooldown', 300)
+        correlation_window = self.config.get('resource_correlation_window', 60)
+        last_alert = {}
+        gauges = [MCP_PROCESS_CPU, MCP_PROCESS_RSS, MCP_PROCESS_FDS, MCP_PROCESS_CONNECTIONS]
+        sampler = None
+        
+        while True:
+            try:
+                if sampler is None:
+                    sampler = McpProcessSampler(
+                        self.config.get('mcp_server_processes', DEFAULT_MCP_SERVER_PROCESSES),
+                        history_size=self.config.get('resource_history_size', 720))
+                    # Plancher absolu par métrique: un écart-type quasi nul ne suffit pas à lever un pic
+                    floors = numpy.array(self.config.get('resource_spike_floors', [25.0, 64 * 1024 ** 2, 64, 16]))
+                
+                samples = await asyncio.to_thread(sampler.sample)
+                
+                for server, values in samples.items():
+                    for gauge, value in zip(gauges, values):
+                        gauge.labels(server=server).set(value)
+                    
+                    history = sampler.history[server]
+                    baseline = history.baseline() if history.count > min_samples else None
+                    if baseline is None:
+                        continue
+                    mean, std = baseline
+                    spikes = numpy.flatnonzero((numpy.asarray(values) > mean + sigma * std)
+                                               & (numpy.asarray(values) - mean > floors))
+                    
+                    for column in spikes:
+                        metric = McpProcessSampler.COLUMNS[column]
+                        now = time.monotonic()
+                        if now - last_alert.get((server, metric), -cooldown) < cooldown:
+                            continue
+                        last_alert[(server, metric)] = now
+                        await self.event_queue.put(self._resource_spike_event(
+                            server, metric, values[column], mean[column], std[column],
+                            self.agent_activity.shares(server, correlation_window), cooldown))
+                
+                await asyncio.sleep(interval)
+                
+            except ImportError as e:
+                # psutil/numpy absents: échantillonnage désactivé, le reste du monitoring continue
+                self.logger.warning(f"⚠️ Échantillonnage ressources désactivé (dépendance manquante: {e.name})")
+                return
+            except Exception as e:
+                self.logger.error(f"Erreur échantillonnage ressources: {e}")
+                await asyncio.sleep(interval * 6)
+    
+    def _resource_spike_event(self, server: str, metric: str, value: float, mean: float,
+                              std: float, agent_shares: Dict[str, float], cooldown: float) -> SecurityEvent:
+        """Pic ressource attribué à l'agent dominant sur le serveur (si majoritaire)"""
+        top_agent, top_share = next(iter(agent_shares.items()), ('unknown', 0.0))
+        attributed = top_share >= 0.5
+        return SecurityEvent(
+            timestamp=datetime.now(),
+            agent_id=top_agent if attributed else 'unknown',
+            event_type='resource_exhaustion',
+            severity='HIGH' if attributed else 'MEDIUM',
+            resource=server,
+            action=metric,
+            source_ip='',
+            user_agent='',
+            details={'value': float(value), 'baseline_mean': float(mean), 'baseline_std': float(std),
+                     'agent_shares': {agent_id: round(share, 3) for agent_id, share in agent_shares.items()},
+                     'source_id': self._host_event_id(
+                         'resource', socket.gethostname(), server, metric, int(time.time() // cooldown))},
+            risk_score=7.0 if attributed else 4.0,
+            compliance_flags=['MONITORING']
+        )
+
+    def _owns(self, agent_id: str) -> bool:
+        """Ce réplica traite-t-il cet agent (toujours vrai sans coordination)"""
+        return self.coordinator is None or self.coordinator.owns(agent_id)
+    
+    async def _claim_source_event(self, source_id: str) -> bool:
+        """Observation locale vue par plusieurs réplicas: traitée une seule fois sur le cluster"""
+        if self.coordinator is None:
+            return True
+        return await asyncio.to_thread(self.agent_state.claim_once, f"event:{source_id}", self.event_dedup_ttl)
+    
+    @staticmethod
+    def _audit_line_id(offset: int, line: str) -> str:
+        """Identité d'une ligne d'audit, identique pour tous les réplicas lisant le même fichier"""
+        return hashlib.sha256(f"{offset}:{line}".encode()).hexdigest()
+    
+    @staticmethod
+    def _host_event_id(*parts) -> str:
+        """Identité d'une observation locale (watcher, sampler) par fenêtre de temps"""
+        return hashlib.sha256('|'.join(map(str, parts)).encode()).hexdigest()
+    
+    async def _claim_alert_cooldown(self, rule: Dict, agent_id: str) -> bool:
+        """Cooldown de règle d'alerte par agent, partagé entre réplicas"""
+        if not rule.get('cooldown'):
+            return True
+        return await asyncio.to_thread(
+            self.agent_state.claim_once, f"alert:{rule['name']}:{agent_id}", rule['cooldown'])
+    
+    async def _coordinate_replicas(self):
+        """Renouvellement des baux + synchronisation par lots de l'état agents"""
+        while True:
+            await asyncio.sleep(self.coordinator.renew_interval)
+            try:
+                await self._renew_coordination()
+                await asyncio.to_thread(self.agent_state.flush)
+            except Exception as e:
+                self.logger.error(f"Erreur coordination réplicas: {e}")
+    
+    async def _renew_coordination(self):
+        """Un tick de baux; rééquilibrage: état local des shards perdus oublié, acquis rechargé"""
+        acquired, lost = await asyncio.to_thread(self.coordinator.renew)
+        if lost:
+            self.agent_state.forget_shards(lost)
+            self.event_forwarder.forget_shards(lost)
+            for agent_id in [agent_id for agent_id in self.baseline_metrics
+                             if self.coordinator.shard_of(agent_id) in lost]:
+                del self.baseline_metrics[agent_id]
+        if acquired:
+            await asyncio.to_thread(self.event_forwarder.load_cursors, acquired)
+            baselines = await asyncio.to_thread(self.agent_state.load_shards, acquired)
+            for agent_id, samples in baselines.items():
+                self.baseline_metrics[agent_id] = deque(samples)
+        if acquired or lost:
+            self.logger.info(f"🤝 Rééquilibrage: +{len(acquired)} / -{len(lost)} shards "
+                             f"({len(self.coordinator.live_replicas)} réplicas)")
+    
+    async def _relay_forwarded_events(self):
+        """Relais sources locales: envoi aux propriétaires + traitement des événements reçus"""
+        while True:
+            try:
+                await asyncio.to_thread(self.event_forwarder.flush)
+                if not self.event_forwarder.has_streams:
+                    await asyncio.sleep(1)
+                    continue
+                for kind, payload in await asyncio.to_thread(self.event_forwarder.read, 1000):
+                    if kind == 'mcp_event':
+                        await self._process_mcp_event(payload['event'], payload['source_id'])
+                    else:
+                        payload['timestamp'] = datetime.fromisoformat(payload['timestamp'])
+                        await self.event_queue.put(SecurityEvent(**payload))
+            except Exception as e:
+                self.logger.error(f"Erreur relais événements réplicas: {e}")
+                await asyncio.sleep(5)
+    
     async def _detect_anomalies(self):
         """Détection anomalies comportementales"""
         self.logger.info("🔍 Détection anomalies active")
@@ -330,9 +2963,13 @@ class SecurityEventProcessor:
                 metrics = await self._collect_agent_metrics()
                 
                 for agent_id, agent_metrics in metrics.items():
-                    # Mise à jour baseline (30 jours glissants)
+                    if not self._owns(agent_id):
+                        continue
+                    
+                    # Mise à jour baseline (30 jours glissants), répliquée pour reprise du shard
                     baseline = self.baseline_metrics[agent_id]
                     baseline.append(agent_metrics)
+                    self.agent_state.push_baseline(agent_id, agent_metrics)
                     
                     if len(baseline) > 30 * 24:  # 30 jours * 24 heures
                         baseline.popleft()
@@ -370,41 +3007,208 @@ class SecurityEventProcessor:
         
         while True:
             try:
-                # Vérification policies compliance
-                violations = []
+                # Réplicas HA: contrôles système exécutés par le seul propriétaire du shard 'system'
+                if not self._owns('system'):
+                    await asyncio.sleep(self.compliance_interval)
+                    continue
                 
-                # Politique: rétention logs audit
-                retention_violation = await self._check_audit_retention_policy()
-                if retention_violation:
-                    violations.append(retention_violation)
+                # Contrôles concurrents, relancés seulement si leurs entrées ont changé
+                results = await self.compliance_engine.run()
                 
-                # Politique: chiffrement obligatoire
-                encryption_violation = await self._check_encryption_policy()
-                if encryption_violation:
-                    violations.append(encryption_violation)
+                # Persistance par lot; seules les nouvelles violations sont escaladées
+                violations = [violation for violations in results.values() for violation in violations]
+                new_violations = self.violation_store.add_many(violations)
+                resolved = self.violation_store.resolve_passed(results)
+                if resolved:
+                    self.logger.info(f"✅ {resolved} violation(s) compliance résolue(s)")
                 
-                # Politique: accès least privilege
-                privilege_violations = await self._check_least_privilege_policy()
-                violations.extend(privilege_violations)
+                # Réplicas: "nouvelle" = jamais escaladée sur le cluster (registre Redis par
+                # empreinte), le store SQLite du réplica ne connaît que ses propres passages
+                candidates = violations if self.coordinator is not None else new_violations
+                escalatable = [violation for violation in candidates if violation.severity in ['HIGH', 'CRITICAL']]
+                fingerprints = defaultdict(list)
+                for violation in escalatable:
+                    fingerprints[violation.policy_violated].append(ViolationStore.dedup_key(violation))
+                claimed = await asyncio.to_thread(self.agent_state.claim_escalations, fingerprints)
+                await asyncio.to_thread(self.agent_state.settle_escalations, {
+                    policy: {ViolationStore.dedup_key(violation) for violation in policy_violations}
+                    for policy, policy_violations in results.items()})
                 
-                # Politique: ségrégation duties
-                segregation_violations = await self._check_segregation_policy()
-                violations.extend(segregation_violations)
-                
-                # Traitement violations détectées
-                for violation in violations:
-                    self.violation_history.append(violation)
-                    
+                for violation in escalatable:
                     # Escalade selon sévérité
-                    if violation.severity in ['HIGH', 'CRITICAL']:
+                    if ViolationStore.dedup_key(violation) in claimed:
                         await self._escalate_compliance_violation(violation)
                 
-                await asyncio.sleep(1800)  # Vérification 30min
+                await asyncio.sleep(self.compliance_interval)
                 
             except Exception as e:
                 self.logger.error(f"Erreur monitoring compliance: {e}")
                 await asyncio.sleep(300)
 
+    def _build_compliance_engine(self) -> ComplianceEngine:
+        """Enregistre entrées et contrôles compliance (relancés sur changement)"""
+        engine = ComplianceEngine(self.logger)
+        
+        engine.register_input(ComplianceInput(
+            'permissions_matrix',
+            fingerprint=lambda: asyncio.to_thread(self._stat_fingerprint, self.permissions_matrix_path),
+            load=lambda: asyncio.to_thread(self._load_json_file, self.permissions_matrix_path)))
+        engine.register_input(ComplianceInput(
+            'audit_files',
+            # mtime répertoire: change à chaque création/suppression/rotation
+            fingerprint=lambda: asyncio.to_thread(self._stat_fingerprint, AUDIT_LOG_DIR),
+            load=lambda: asyncio.to_thread(self._list_audit_files)))
+        engine.register_input(ComplianceInput(
+            'db_grants',
+            fingerprint=lambda: asyncio.to_thread(self._query_db_grants, True),
+            load=lambda: asyncio.to_thread(self._query_db_grants, False)))
+        
+        engine.register_check(ComplianceCheck(
+            'audit_retention', ['audit_files'], self._check_audit_retention_policy,
+            max_age=24 * 3600))
+        engine.register_check(ComplianceCheck(
+            'encryption', ['permissions_matrix'], self._check_encryption_policy))
+        engine.register_check(ComplianceCheck(
+            'least_privilege', ['permissions_matrix', 'db_grants'],
+            self._check_least_privilege_policy))
+        engine.register_check(ComplianceCheck(
+            'segregation_of_duties', ['permissions_matrix'], self._check_segregation_policy))
+        return engine
+    
+    @staticmethod
+    def _stat_fingerprint(path: str) -> Tuple[int, int]:
+        """Empreinte bon marché fichier/répertoire (mtime, taille)"""
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+    
+    @staticmethod
+    def _load_json_file(path: str) -> Dict:
+        with open(path, 'r') as f:
+            return json.load(f)
+    
+    @staticmethod
+    def _list_audit_files() -> List[Dict]:
+        """Listing des segments audit log (nom, taille, mtime)"""
+        with os.scandir(AUDIT_LOG_DIR) as entries:
+            return sorted(
+                ({'name': entry.name, 'size': entry.stat().st_size,
+                  'mtime': entry.stat().st_mtime} for entry in entries if entry.is_file()),
+                key=lambda entry: entry['name'])
+    
+    def _query_db_grants(self, fingerprint_only: bool):
+        """Grants tables par rôle; empreinte calculée côté Postgres (md5 agrégé)
+        
+        Connexion de lecture dédiée (autocommit): chaque requête voit un
+        snapshot frais sans toucher aux transactions de postgres_conn.
+        """
+        grants_query = """
+        SELECT grantee, table_schema, table_name, privilege_type
+        FROM information_schema.role_table_grants
+        WHERE table_schema NOT IN ('pg_catalog', 'information_schema')
+        """
+        with self.postgres_readonly_conn.cursor() as cursor:
+            if fingerprint_only:
+                cursor.execute(f"""
+                SELECT md5(coalesce(string_agg(
+                    grantee || '|' || table_schema || '|' || table_name || '|' || privilege_type,
+                    ',' ORDER BY grantee, table_schema, table_name, privilege_type), ''))
+                FROM ({grants_query}) grants
+                """)
+                return cursor.fetchone()[0]
+            cursor.execute(grants_query)
+            return [
+                {'grantee': grantee, 'schema': schema, 'table': table, 'privilege': privilege}
+                for grantee, schema, table, privilege in cursor.fetchall()
+            ]
+    
+    def _build_compliance_violation(self, policy: str, severity: str, description: str,
+                                    evidence: Dict[str, Any], agent_id: str = 'system') -> ComplianceViolation:
+        """Construit une violation avec identifiant stable (policy, agent, evidence)"""
+        evidence_hash = hashlib.sha256(
+            json.dumps(evidence, sort_keys=True, default=str).encode()).hexdigest()
+        return ComplianceViolation(
+            violation_id=f"{policy}-{agent_id}-{evidence_hash[:12]}",
+            timestamp=datetime.now(),
+            agent_id=agent_id,
+            policy_violated=policy,
+            severity=severity,
+            description=description,
+            evidence=evidence,
+            remediation_required=severity in ['HIGH', 'CRITICAL'],
+            escalation_level={'LOW': 0, 'MEDIUM': 1, 'HIGH': 2, 'CRITICAL': 3}[severity]
+        )
+    
+    async def _check_audit_retention_policy(self, audit_files: List[Dict]) -> Optional[ComplianceViolation]:
+        """Politique: audit log présent et segments rotés contigus (aucune purge)"""
+        names = {entry['name'] for entry in audit_files}
+        if AUDIT_LOG_NAME not in names:
+            return self._build_compliance_violation(
+                'audit_retention', 'CRITICAL', "Audit log MCP absent",
+                {'audit_dir': AUDIT_LOG_DIR, 'files': sorted(names)})
+        
+        indexes = sorted(
+            int(match.group(1)) for match in
+            (re.match(rf'{re.escape(AUDIT_LOG_NAME)}\.(\d+)(\.gz)?$', name) for name in names)
+            if match)
+        missing = sorted(set(range(1, (indexes[-1] if indexes else 0) + 1)) - set(indexes))
+        if missing:
+            return self._build_compliance_violation(
+                'audit_retention', 'CRITICAL',
+                f"Segments audit supprimés avant rétention: {missing}",
+                {'audit_dir': AUDIT_LOG_DIR, 'missing_segments': missing})
+        return None
+    
+    async def _check_encryption_policy(self, permissions_matrix: Dict) -> Optional[ComplianceViolation]:
+        """Politique: chiffrement repos/transit avec algorithmes approuvés"""
+        data_protection = permissions_matrix.get('security_policies', {}).get('data_protection', {})
+        at_rest = data_protection.get('encryption_at_rest')
+        in_transit = data_protection.get('encryption_in_transit')
+        if at_rest not in APPROVED_ENCRYPTION_AT_REST or in_transit != 'TLS-1.3':
+            return self._build_compliance_violation(
+                'encryption', 'CRITICAL', "Chiffrement non conforme",
+                {'encryption_at_rest': at_rest, 'encryption_in_transit': in_transit})
+        return None
+    
+    async def _check_least_privilege_policy(self, permissions_matrix: Dict,
+                                            db_grants: List[Dict]) -> List[ComplianceViolation]:
+        """Politique: grants Postgres limités aux tables déclarées par agent"""
+        allowed_tables = {}
+        for agent_id, agent in permissions_matrix.get('permissions_matrix', {}).items():
+            postgres = agent.get('mcp_servers', {}).get('postgres')
+            if postgres:
+                role = agent_id.replace('-', '_')
+                allowed_tables[role] = (agent_id, set(postgres.get('restrictions', {}).get('tables', [])))
+        
+        excess = defaultdict(set)
+        for grant in db_grants:
+            if grant['grantee'] in allowed_tables:
+                agent_id, tables = allowed_tables[grant['grantee']]
+                if grant['table'] not in tables:
+                    excess[agent_id].add(f"{grant['schema']}.{grant['table']}:{grant['privilege']}")
+        
+        return [
+            self._build_compliance_violation(
+                'least_privilege', 'HIGH',
+                f"Agent {agent_id} dispose de grants hors périmètre",
+                {'excess_grants': sorted(grants)}, agent_id=agent_id)
+            for agent_id, grants in excess.items()
+        ]
+    
+    async def _check_segregation_policy(self, permissions_matrix: Dict) -> List[ComplianceViolation]:
+        """Politique: pas de permissions incompatibles sur un même serveur MCP"""
+        violations = []
+        for agent_id, agent in permissions_matrix.get('permissions_matrix', {}).items():
+            for server, server_config in agent.get('mcp_servers', {}).items():
+                permissions = set(server_config.get('permissions', []))
+                for conflict in SEGREGATION_CONFLICTS:
+                    if conflict <= permissions:
+                        violations.append(self._build_compliance_violation(
+                            'segregation_of_duties', 'HIGH',
+                            f"Agent {agent_id} cumule {sorted(conflict)} sur {server}",
+                            {'server': server, 'permissions': sorted(permissions)},
+                            agent_id=agent_id))
+        return violations
+
     async def _generate_real_time_alerts(self):
         """Génération alertes temps réel"""
         self.logger.info("🚨 Générateur alertes temps réel actif")
@@ -413,25 +3217,58 @@ class SecurityEventProcessor:
         
         while True:
             try:
-                # Traitement événements en attente
-                while not self.event_queue.empty():
-                    security_event = await self.event_queue.get()
+                # Réveil immédiat sur événement, le plus sévère d'abord
+                security_event = await self.event_queue.get()
+                if security_event.agent_id not in SYNTHETIC_AGENT_IDS and not self._owns(security_event.agent_id):
+                    # Source locale (filesystem, ressources) ou shard déplacé pendant l'attente: relais
+                    self.event_forwarder.forward(security_event.agent_id, 'security_event', asdict(security_event))
+                    continue
+                source_id = security_event.details.get('source_id')
+                if source_id is not None and not await self._claim_source_event(source_id):
+                    continue  # même observation déjà traitée par un autre réplica de l'hôte
+                
+                with self.instrumentation.stage('dispatch'):
+                    if self.event_stream is not None:
+                        self.event_stream.publish_event(security_event)
                     
                     # Évaluation règles alerte
                     for rule in alert_rules:
-                        if self._event_matches_rule(security_event, rule):
+                        if self._event_matches_rule(security_event, rule) and await self._claim_alert_cooldown(
+                                rule, security_event.agent_id):
                             alert = self._create_alert(security_event, rule)
                             await self._send_alert(alert)
-                    
-                    # Persistence événement
-                    await self._store_security_event(security_event)
                 
-                await asyncio.sleep(1)
+                # Persistence événement
+                with self.instrumentation.stage('store'):
+                    await self._store_security_event(security_event)
                 
             except Exception as e:
                 self.logger.error(f"Erreur génération alertes: {e}")
                 await asyncio.sleep(5)
 
+    async def _store_security_event(self, security_event: SecurityEvent):
+        """Persistance Postgres de l'événement (ignorée sans connexion)"""
+        if self.postgres_conn is None:
+            return
+        await asyncio.to_thread(self._insert_security_event, security_event)
+    
+    def _insert_security_event(self, security_event: SecurityEvent):
+        try:
+            with self.postgres_conn.cursor() as cursor:
+                cursor.execute("""
+                INSERT INTO security_events
+                    (timestamp, agent_id, event_type, severity, resource, action,
+                     source_ip, risk_score, details)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+                """, (security_event.timestamp, security_event.agent_id, security_event.event_type,
+                      security_event.severity, security_event.resource, security_event.action,
+                      security_event.source_ip, security_event.risk_score,
+                      json.dumps(security_event.details, default=str)))
+            self.postgres_conn.commit()
+        except Exception:
+            self.postgres_conn.rollback()
+            raise
+
     def _load_alert_rules(self) -> List[Dict]:
         """Charge règles alertes sécurité"""
         return [
@@ -481,6 +3318,9 @@ class SecurityEventProcessor:
         
         self.logger.warning(f"🚨 ALERTE SÉCURITÉ: {alert_id}")
         
+        if self.event_stream is not None:
+            self.event_stream.publish_alert(alert)
+        
         for channel in channels:
             try:
                 if channel == 'email':
@@ -521,66 +3361,145 @@ class SecurityEventProcessor:
         async with aiohttp.ClientSession() as session:
             await session.post(webhook_url, json=message)
 
-def create_security_monitoring_dashboard():
-    """Crée dashboard monitoring sécurité"""
-    dashboard_config = {
-        "dashboard": {
-            "title": "BMAD MCP Security Monitoring",
-            "panels": [
-                {
-                    "title": "Security Events by Severity",
-                    "type": "graph",
-                    "targets": [
-                        {
-                            "expr": 'rate(bmad_security_events_total[5m])',
-                            "legend": "{{severity}} - {{event_type}}"
-                        }
-                    ]
-                },
-                {
-                    "title": "Authentication Success Rate",
-                    "type": "singlestat",
-                    "targets": [
-                        {
-                            "expr": 'rate(bmad_auth_attempts_total{status="success"}[5m]) / rate(bmad_auth_attempts_total[5m])',
-                            "legend": "Success Rate"
-                        }
-                    ]
-                },
-                {
-                    "title": "Authorization Decisions",
-                    "type": "piechart",
-                    "targets": [
-                        {
-                            "expr": 'bmad_authz_decisions_total',
-                            "legend": "{{decision}}"
-                        }
-                    ]
-                },
-                {
-                    "title": "MCP Response Times",
-                    "type": "graph",
-                    "targets": [
-                        {
-                            "expr": 'histogram_quantile(0.95, rate(bmad_mcp_response_time_seconds_bucket[5m]))',
-                            "legend": "95th percentile"
-                        }
-                    ]
-                }
-            ]
+class SecurityDashboardGenerator:
+    """Dashboard Grafana + recording rules Prometheus dérivés des métriques déclarées
+    
+    Quantiles d'histogrammes, taux de compteurs et ratios sont précalculés
+    par des recording rules (agrégés hors labels à forte cardinalité); les
+    panels n'interrogent que ces séries enregistrées et les gauges brutes.
+    """
+    
+    HIGH_CARDINALITY_LABELS = {'resource', 'method'}
+    QUANTILES = [0.5, 0.95, 0.99]
+    # (métrique, label, valeur au numérateur, labels conservés)
+    RATIOS = [
+        ('bmad_auth_attempts_total', 'status', 'success', ['agent']),
+        ('bmad_authz_decisions_total', 'decision', 'DENIED', ['agent']),
+        ('bmad_enrichment_cache_total', 'result', 'hit', ['cache']),
+    ]
+    
+    def __init__(self, metrics: List[LazyMetric], interval: str = '5m'):
+        self.metrics = sorted(metrics, key=lambda metric: metric.name)
+        self.interval = interval
+        
+    def recording_rules(self) -> Dict:
+        rules = []
+        for metric in self.metrics:
+            labels = self._kept_labels(metric.labelnames)
+            if metric.kind == 'Counter':
+                rules.append({'record': self._record_name(labels, metric.name, f"rate{self.interval}"),
+                              'expr': f"sum{self._by(labels)} (rate({metric.name}[{self.interval}]))"})
+            elif metric.kind == 'Histogram':
+                for quantile in self.QUANTILES:
+                    rules.append({
+                        'record': self._record_name(labels, metric.name, f"p{int(quantile * 100)}_{self.interval}"),
+                        'expr': f"histogram_quantile({quantile}, sum{self._by(['le'] + labels)} "
+                                f"(rate({metric.name}_bucket[{self.interval}])))"})
+        
+        declared = {metric.name for metric in self.metrics}
+        for name, label, value, labels in self.RATIOS:
+            if name in declared:
+                numerator = f'rate({name}{{{label}="{value}"}}[{self.interval}])'
+                denominator = f"rate({name}[{self.interval}])"
+                rules.append({
+                    'record': self._record_name(labels, name, f"{label}_{value.lower()}_ratio_{self.interval}"),
+                    'expr': f"sum{self._by(labels)} ({numerator}) / sum{self._by(labels)} ({denominator})"})
+        return {'groups': [{'name': 'bmad_security_recording_rules', 'interval': '1m', 'rules': rules}]}
+    
+    def dashboard(self) -> Dict:
+        panels = []
+        for metric in self.metrics:
+            labels = self._kept_labels(metric.labelnames)
+            legend = ' - '.join(f"{{{{{label}}}}}" for label in labels) or metric.name
+            if metric.kind == 'Counter':
+                targets = [{'expr': self._record_name(labels, metric.name, f"rate{self.interval}"),
+                            'legendFormat': legend}]
+            elif metric.kind == 'Histogram':
+                targets = [{'expr': self._record_name(labels, metric.name, f"p{int(quantile * 100)}_{self.interval}"),
+                            'legendFormat': f"p{int(quantile * 100)} {legend}"} for quantile in self.QUANTILES]
+            else:
+                targets = [{'expr': metric.name, 'legendFormat': legend}]
+            panels.append(self._panel(metric.documentation, 'timeseries', targets, len(panels)))
+        
+        declared = {metric.name for metric in self.metrics}
+        for name, label, value, labels in self.RATIOS:
+            if name in declared:
+                record = self._record_name(labels, name, f"{label}_{value.lower()}_ratio_{self.interval}")
+                panels.append(self._panel(
+                    f"{name} {label}={value} ratio", 'stat',
+                    [{'expr': record, 'legendFormat': ' - '.join(f"{{{{{label}}}}}" for label in labels)}],
+                    len(panels)))
+        
+        return {
+            "dashboard": {
+                "uid": "bmad-mcp-security",
+                "title": "BMAD MCP Security Monitoring",
+                "refresh": "30s",
+                "time": {"from": "now-6h", "to": "now"},
+                "panels": panels
+            }
         }
-    }
     
-    with open('/var/log/bmad/security-dashboard.json', 'w') as f:
-        json.dump(dashboard_config, f, indent=2)
+    def _kept_labels(self, labelnames: List[str]) -> List[str]:
+        return [label for label in labelnames if label not in self.HIGH_CARDINALITY_LABELS]
+    
+    @staticmethod
+    def _by(labels: List[str]) -> str:
+        return f" by ({', '.join(labels)})" if labels else ''
+    
+    @staticmethod
+    def _record_name(labels: List[str], name: str, operation: str) -> str:
+        """Convention Prometheus niveau:métrique:opérations (sans suffixe _total)"""
+        if name.endswith('_total'):
+            name = name[:-len('_total')]
+        return f"{'_'.join(labels) or 'job'}:{name}:{operation}"
+    
+    @staticmethod
+    def _panel(title: str, panel_type: str, targets: List[Dict], index: int) -> Dict:
+        return {
+            "id": index + 1,
+            "title": title,
+            "type": panel_type,
+            "gridPos": {"h": 8, "w": 12, "x": (index % 2) * 12, "y": (index // 2) * 8},
+            "datasource": {"type": "prometheus"},
+            "targets": targets
+        }
 
-async def main():
-    """Point d'entrée monitoring sécurité"""
-    print("🔒 BMAD MCP ENTERPRISE SECURITY MONITORING")
-    print("=" * 50)
+def _write_if_changed(path: str, content: str) -> bool:
+    """Écrit seulement si le hash du contenu change (remplacement atomique)"""
+    if os.path.exists(path) and not os.path.isfile(path):
+        # Cible spéciale (/dev/null, fifo): écriture directe
+        with open(path, 'w') as f:
+            f.write(content)
+        return True
     
-    # Configuration
-    config = {
+    new_hash = hashlib.sha256(content.encode()).hexdigest()
+    if os.path.isfile(path):
+        with open(path, 'rb') as f:
+            if hashlib.sha256(f.read()).hexdigest() == new_hash:
+                return False
+    
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w') as f:
+        f.write(content)
+    os.replace(temp_path, path)
+    return True
+
+def create_security_monitoring_dashboard(output_path: str = '/var/log/bmad/security-dashboard.json',
+                                         rules_path: Optional[str] = None) -> Dict[str, bool]:
+    """Génère dashboard + recording rules depuis les métriques déclarées (écrits si modifiés)"""
+    rules_path = rules_path or os.path.join(os.path.dirname(output_path), 'security-recording-rules.yml')
+    generator = SecurityDashboardGenerator(LazyMetric.registry)
+    
+    # Fichier de règles en JSON: sous-ensemble YAML accepté par Prometheus
+    return {
+        output_path: _write_if_changed(output_path, json.dumps(generator.dashboard(), indent=2) + '\n'),
+        rules_path: _write_if_changed(rules_path, json.dumps(generator.recording_rules(), indent=2) + '\n')
+    }
+
+def default_monitoring_config() -> Dict:
+    """Configuration monitoring par défaut"""
+    return {
         'redis': {
             'host': 'localhost',
             'port': 6379,
@@ -592,8 +3511,64 @@ async def main():
             'user': 'security_monitor',
             'password': 'secure_password'
         },
-        'slack_webhook_url': 'https://hooks.slack.com/services/YOUR/WEBHOOK/URL'
+        'slack_webhook_url': 'https://hooks.slack.com/services/YOUR/WEBHOOK/URL',
+        'event_stream': {
+            'enabled': False,  # flux WebSocket dashboards (non authentifié): activer explicitement
+            'host': 'localhost',
+            'port': 8765
+        },
+        'coordination': {
+            'enabled': False,  # réplicas HA: activer sur chaque instance (même Redis)
+            'shards': 64,
+            'lease_ttl': 15.0,
+            'renew_interval': 5.0,
+            'event_dedup_ttl': 300  # s: fenêtre de dédoublonnage des observations relayées
+        }
     }
+
+def coordination_status(config: Optional[Dict] = None) -> Dict[str, Any]:
+    """Réplicas vivants et répartition des shards (lecture seule)"""
+    config = config or default_monitoring_config()
+    coordination_config = config.get('coordination', {})
+    coordinator = ShardCoordinator(
+        redis.Redis(**config['redis']), 'status',
+        shards=coordination_config.get('shards', 64),
+        key_prefix=coordination_config.get('key_prefix', 'bmad:coord'))
+    return coordinator.status()
+
+async def replay_audit_log(log_path: str, config: Optional[Dict] = None) -> Dict[str, int]:
+    """Rejoue un audit log MCP dans le pipeline d'analyse (hors ligne)
+    
+    Sans config explicite: pas de fichier de log, violations en mémoire et
+    flux WebSocket désactivé (aucun effet de bord sur l'instance de production).
+    """
+    if config is None:
+        config = {**default_monitoring_config(), 'log_path': None,
+                  'violation_db_path': ':memory:', 'event_stream': {'enabled': False}}
+    processor = SecurityEventProcessor(config)
+    severity_counts = defaultdict(int)
+    
+    with open(log_path, 'r') as f:
+        for line in f:
+            try:
+                event_data = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            await processor._process_mcp_event(event_data)
+            
+            while not processor.event_queue.empty():
+                security_event = processor.event_queue.get_nowait()
+                severity_counts[security_event.severity] += 1
+    
+    return dict(severity_counts)
+
+async def main(config: Optional[Dict] = None):
+    """Point d'entrée monitoring sécurité"""
+    print("🔒 BMAD MCP ENTERPRISE SECURITY MONITORING")
+    print("=" * 50)
+    
+    # Configuration
+    config = config or default_monitoring_config()
     
     # Démarrage monitoring
     processor = SecurityEventProcessor(config)
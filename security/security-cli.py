@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+🛡️ BMAD MCP SECURITY CLI
+Agent: contains-test-analyzer + bmad-qa
+Focus: Point d'entrée unique monitoring + tests sécurité
+Sous-commandes: monitor, shards, dashboard, test <classe>, replay, bench
+Les modules sécurité et leurs backends ne sont chargés que par la
+sous-commande qui en a besoin (appels courts depuis les hooks).
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from lazy_imports import MONITORING_MODULE, TESTING_LOGS_DIR, TESTS_MODULE, load_security_module
+
+# Invocations courtes mesurées par `bench` (démarrage seul)
+BENCH_INVOCATIONS = [
+    ['--help'],
+    ['dashboard', '--help'],
+    ['test', '--help'],
+    ['replay', '--help'],
+    ['dashboard', '--output', os.devnull, '--rules-output', os.devnull],
+]
+
+def cmd_monitor(args):
+    """Lance le monitoring sécurité temps réel (réplica HA si --replica-id)"""
+    import asyncio
+    monitoring = load_security_module(MONITORING_MODULE)
+    config = monitoring.default_monitoring_config()
+    if args.replica_id:
+        config['coordination'].update({'enabled': True, 'replica_id': args.replica_id})
+    asyncio.run(monitoring.main(config))
+
+def cmd_shards(args):
+    """Affiche réplicas vivants et répartition des shards"""
+    monitoring = load_security_module(MONITORING_MODULE)
+    status = monitoring.coordination_status()
+    
+    print(f"🤝 Réplicas vivants: {len(status['replicas'])}")
+    for replica, shards in sorted(status['shards'].items(), key=lambda item: str(item[0])):
+        print(f"- {replica or 'sans propriétaire'}: {len(shards)} shards")
+
+def cmd_dashboard(args):
+    """Génère le dashboard monitoring sécurité et les recording rules"""
+    monitoring = load_security_module(MONITORING_MODULE)
+    written = monitoring.create_security_monitoring_dashboard(args.output, args.rules_output)
+    for path, changed in written.items():
+        print(f"📊 {'Écrit' if changed else 'Inchangé'}: {path}")
+
+def cmd_test(args):
+    """Exécute la suite de tests sécurité, ou une seule classe"""
+    tests = load_security_module(TESTS_MODULE)
+    test_classes = None
+    if args.test_class:
+        available = {cls.__name__: cls for cls in tests.SECURITY_TEST_CLASSES}
+        if args.test_class not in available:
+            sys.exit(f"Classe inconnue {args.test_class} (disponibles: {', '.join(available)})")
+        test_classes = [available[args.test_class]]
+
+    result = tests.run_security_test_suite(test_classes)
+    sys.exit(0 if result.wasSuccessful() else 1)
+
+def cmd_replay(args):
+    """Rejoue un audit log MCP dans le pipeline d'analyse"""
+    import asyncio
+    monitoring = load_security_module(MONITORING_MODULE)
+    severity_counts = asyncio.run(monitoring.replay_audit_log(args.log_path))
+
+    print(f"🔁 Replay {args.log_path}")
+    for severity, count in sorted(severity_counts.items()):
+        print(f"- {severity}: {count}")
+
+def cmd_bench(args):
+    """Benchmark démarrage CLI (wall-clock + -X importtime)"""
+    results = []
+    for invocation in BENCH_INVOCATIONS:
+        command = [sys.executable, '-X', 'importtime', str(Path(__file__).resolve())] + invocation
+        durations = []
+        import_times = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            completed = subprocess.run(command, capture_output=True, text=True)
+            durations.append(time.perf_counter() - started)
+            import_times = parse_importtime(completed.stderr)
+
+        results.append({
+            'invocation': ' '.join(invocation),
+            'wall_median_ms': round(statistics.median(durations) * 1000, 2),
+            'wall_max_ms': round(max(durations) * 1000, 2),
+            'imports_cumulative_ms': round(sum(
+                entry['cumulative_us'] for entry in import_times if entry['depth'] == 0) / 1000, 2),
+            'slowest_imports': sorted(
+                import_times, key=lambda entry: entry['cumulative_us'], reverse=True)[:args.top]
+        })
+
+    print("⏱️ DÉMARRAGE CLI SÉCURITÉ")
+    print("=" * 50)
+    for result in results:
+        print(f"- {result['invocation']}: médiane {result['wall_median_ms']} ms, "
+              f"imports {result['imports_cumulative_ms']} ms")
+        for entry in result['slowest_imports'][:3]:
+            print(f"    {entry['module']}: {entry['cumulative_us'] / 1000:.2f} ms")
+
+    TESTING_LOGS_DIR.mkdir(parents=True, exist_ok=True)
+    report_path = TESTING_LOGS_DIR / 'security-cli-startup-benchmark.json'
+    with open(report_path, 'w') as f:
+        json.dump({'repeat': args.repeat, 'python': sys.version.split()[0],
+                   'results': results}, f, indent=2)
+    print(f"\nRapport: {report_path}")
+
+IMPORTTIME_PATTERN = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)')
+
+def parse_importtime(stderr: str) -> List[Dict]:
+    """Parse la sortie `-X importtime` (self, cumulatif, profondeur, module)"""
+    entries = []
+    for line in stderr.splitlines():
+        match = IMPORTTIME_PATTERN.match(line)
+        if match:
+            entries.append({
+                'module': match.group(4),
+                'self_us': int(match.group(1)),
+                'cumulative_us': int(match.group(2)),
+                'depth': (len(match.group(3)) - 1) // 2
+            })
+    return entries
+
+class TestClassHelpFormatter(argparse.HelpFormatter):
+    """Aide `test`: classes lues dans SECURITY_TEST_CLASSES (suite chargée pour --help seulement)"""
+    
+    def _get_help_string(self, action):
+        if action.dest == 'test_class':
+            tests = load_security_module(TESTS_MODULE)
+            return ', '.join(cls.__name__ for cls in tests.SECURITY_TEST_CLASSES)
+        return super()._get_help_string(action)
+
+def build_parser() -> argparse.ArgumentParser:
+    """Parser CLI avec sous-commandes"""
+    parser = argparse.ArgumentParser(description="BMAD MCP security CLI")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    monitor_parser = subparsers.add_parser('monitor', help="Monitoring sécurité temps réel")
+    monitor_parser.add_argument('--replica-id', help="Active la coordination HA (baux Redis) sous cet identifiant")
+    monitor_parser.set_defaults(handler=cmd_monitor)
+    
+    shards_parser = subparsers.add_parser('shards', help="Répartition des shards entre réplicas HA")
+    shards_parser.set_defaults(handler=cmd_shards)
+
+    dashboard_parser = subparsers.add_parser('dashboard', help="Génère le dashboard Grafana + recording rules")
+    dashboard_parser.add_argument('--output', default='/var/log/bmad/security-dashboard.json')
+    dashboard_parser.add_argument('--rules-output', default=None,
+                                  help="Recording rules Prometheus (défaut: à côté du dashboard)")
+    dashboard_parser.set_defaults(handler=cmd_dashboard)
+
+    test_parser = subparsers.add_parser('test', help="Tests sécurité (suite complète ou une classe)",
+                                        formatter_class=TestClassHelpFormatter)
+    test_parser.add_argument('test_class', nargs='?', help="Classe de SECURITY_TEST_CLASSES")
+    test_parser.set_defaults(handler=cmd_test)
+
+    replay_parser = subparsers.add_parser('replay', help="Rejoue un audit log MCP")
+    replay_parser.add_argument('log_path')
+    replay_parser.set_defaults(handler=cmd_replay)
+
+    bench_parser = subparsers.add_parser('bench', help="Benchmark démarrage CLI (-X importtime)")
+    bench_parser.add_argument('--repeat', type=int, default=5)
+    bench_parser.add_argument('--top', type=int, default=10)
+    bench_parser.set_defaults(handler=cmd_bench)
+
+    return parser
+
+def main(argv=None):
+    """Point d'entrée CLI sécurité"""
+    args = build_parser().parse_args(argv)
+    args.handler(args)
+
+if __name__ == "__main__":
+    main()
@@ -6,23 +6,41 @@ Focus: Isolation ressources + TLS/Auth validation
 Compliance: SOC2, ISO27001, NIST Cybersecurity Framework
 """
 
+import abc
+import argparse
 import asyncio
+import gzip
+import math
+import mmap
+import multiprocessing
+import os
+import re
+import shlex
+import sqlite3
 import ssl
+import subprocess
+import tempfile
+import time
+import uuid
 import socket
 import json
 import hashlib
 import logging
 import unittest
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
 from pathlib import Path
-import psutil
-import docker
-import redis
-import psycopg2
-from cryptography import x509
-from cryptography.hazmat.primitives import hashes
-from cryptography.x509.oid import NameOID
+from lazy_imports import MONITORING_MODULE, TESTING_LOGS_DIR, LazyModule, load_security_module
+
+# Backends chargés au premier usage (démarrage rapide, dépendances optionnelles)
+psutil = LazyModule('psutil')
+docker = LazyModule('docker')
+redis = LazyModule('redis')
+psycopg2 = LazyModule('psycopg2')
+x509 = LazyModule('cryptography.x509')
+websockets = LazyModule('websockets')
 
 class MCPSecurityTestSuite:
     """Suite complète de tests sécurité MCP Enterprise"""
@@ -44,13 +62,561 @@ class MCPSecurityTestSuite:
         )
         self.logger = logging.getLogger(__name__)
 
+@dataclass
+class AuditVerificationResult:
+    """Résultat vérification incrémentale audit log"""
+    integrity_valid: bool = True
+    chain_valid: bool = True
+    bytes_verified: int = 0
+    lines_verified: int = 0
+    errors: List[str] = field(default_factory=list)
+
+class AuditLogVerifier:
+    """Vérification streaming et incrémentale de l'audit trail MCP
+    
+    Chaque ligne JSON porte un champ `prev_hash` égal au SHA-256 de la ligne
+    précédente. Le fichier est parcouru par fenêtres mmap et hashé via
+    memoryview (zéro copie). L'offset vérifié et le dernier maillon de la
+    chaîne sont persistés: l'exécution suivante ne vérifie que les octets
+    ajoutés, y compris à travers les rotations (.1, .2.gz, ...).
+    
+    Le contenu déjà vérifié est protégé par des empreintes de blocs
+    (CHUNK_SIZE): le bloc de queue est recontrôlé à chaque passage et
+    RECHECK_CHUNKS blocs complets en tourniquet, de sorte qu'une réécriture
+    en place est détectée en quelques passages; une vérification complète
+    (prédécesseurs rotés compris) est refaite toutes les FULL_VERIFY_INTERVAL.
+    """
+    
+    WINDOW_SIZE = 64 * 1024 * 1024
+    ANCHOR_SIZE = 4096
+    CHUNK_SIZE = 1024 * 1024
+    RECHECK_CHUNKS = 64
+    FULL_VERIFY_INTERVAL = timedelta(hours=24)
+    MAX_ROTATIONS = 10  # backup_count audit-logging-config.yaml
+    PREV_HASH_PATTERN = re.compile(rb'"prev_hash"\s*:\s*"([0-9a-f]{64})"')
+    
+    def __init__(self, log_path: str, state_path: Optional[str] = None):
+        self.log_path = log_path
+        self.state_path = state_path or '/var/log/bmad/audit-integrity-state.json'
+        
+    def verify(self, full: bool = False) -> AuditVerificationResult:
+        """Vérifie les octets ajoutés depuis le dernier passage (tout si full ou échéance)"""
+        result = AuditVerificationResult()
+        state = self._load_state()
+        if state and not full:
+            full_verified_at = datetime.fromisoformat(state.get('full_verified_at', '1970-01-01T00:00:00'))
+            full = datetime.now() - full_verified_at >= self.FULL_VERIFY_INTERVAL
+        stat = os.stat(self.log_path)
+        
+        last_hash, start, chunks, cursor = None, 0, [], 0
+        if full or not state:
+            # Toute la chaîne: prédécesseurs rotés (du plus ancien) puis fichier actif
+            last_hash = self._verify_all_predecessors(result)
+            if not (result.integrity_valid and result.chain_valid):
+                return result
+            full = True
+        elif self._is_verified_segment(self.log_path, stat, state):
+            if not self._recheck_chunks(self.log_path, state, result):
+                return result
+            last_hash, start = state['last_hash'], state['offset']
+            chunks, cursor = state.get('chunks', []), state.get('recheck_cursor', 0)
+        elif stat.st_ino == state['inode'] and not self._rotated_copy_exists(state):
+            # Même inode sans copie rotée portant l'ancre: réécriture en place, pas une rotation
+            self._report_tampering(self.log_path, stat, state, result)
+            return result
+        else:
+            # Rotation depuis le dernier passage: finir les prédécesseurs
+            last_hash = self._verify_predecessors(state, result)
+            if last_hash is None:
+                return result
+        
+        offset, last_hash = self._verify_file(self.log_path, start, last_hash,
+                                              state if start else None, result)
+        if result.integrity_valid and result.chain_valid:
+            chunks, tail_digest = self._chunk_digests(self.log_path, chunks, offset)
+            self._save_state({
+                'inode': stat.st_ino,
+                'offset': offset,
+                'last_hash': last_hash,
+                'anchor': self._file_anchor(self.log_path, offset),
+                'chunks': chunks,
+                'tail_digest': tail_digest,
+                'recheck_cursor': cursor,
+                'verified_at': datetime.now().isoformat(),
+                'full_verified_at': (datetime.now().isoformat() if full
+                                     else state.get('full_verified_at', datetime.now().isoformat()))
+            })
+        return result
+    
+    def _recheck_chunks(self, path: str, state: Dict, result: AuditVerificationResult,
+                        count: Optional[int] = None) -> bool:
+        """Recontrôle du contenu déjà vérifié: bloc de queue + RECHECK_CHUNKS blocs en tourniquet"""
+        chunks = state.get('chunks', [])
+        count = self.RECHECK_CHUNKS if count is None else count
+        tail_start = len(chunks) * self.CHUNK_SIZE
+        with open(path, 'rb') as f:
+            f.seek(tail_start)
+            if hashlib.sha256(f.read(state['offset'] - tail_start)).hexdigest() != state.get('tail_digest'):
+                result.integrity_valid = False
+                result.errors.append(f"Contenu déjà vérifié modifié après l'offset {tail_start}")
+                return False
+            
+            cursor = state.get('recheck_cursor', 0)
+            for step in range(min(count, len(chunks))):
+                index = (cursor + step) % len(chunks)
+                f.seek(index * self.CHUNK_SIZE)
+                if hashlib.sha256(f.read(self.CHUNK_SIZE)).hexdigest() != chunks[index]:
+                    result.integrity_valid = False
+                    result.errors.append(
+                        f"Contenu déjà vérifié modifié (bloc à l'offset {index * self.CHUNK_SIZE})")
+                    return False
+            if chunks:
+                state['recheck_cursor'] = (cursor + count) % len(chunks)
+        return True
+    
+    def _chunk_digests(self, path: str, chunks: List[str], offset: int) -> Tuple[List[str], str]:
+        """Complète les empreintes des blocs entièrement vérifiés + empreinte de la queue"""
+        chunks = list(chunks)
+        with open(path, 'rb') as f:
+            f.seek(len(chunks) * self.CHUNK_SIZE)
+            while (len(chunks) + 1) * self.CHUNK_SIZE <= offset:
+                chunks.append(hashlib.sha256(f.read(self.CHUNK_SIZE)).hexdigest())
+            tail_digest = hashlib.sha256(f.read(offset - len(chunks) * self.CHUNK_SIZE)).hexdigest()
+        return chunks, tail_digest
+    
+    def _predecessor_candidates(self) -> List[str]:
+        """Fichiers rotés existants, du plus récent (.1) au plus ancien"""
+        candidates = []
+        for index in range(1, self.MAX_ROTATIONS + 1):
+            for suffix in (f'.{index}', f'.{index}.gz'):
+                path = self.log_path + suffix
+                if os.path.exists(path):
+                    candidates.append(path)
+                    break
+        return candidates
+    
+    def _verify_all_predecessors(self, result: AuditVerificationResult) -> Optional[str]:
+        """Vérification complète des segments rotés, chaînés du plus ancien au plus récent"""
+        last_hash = None
+        for path in reversed(self._predecessor_candidates()):
+            last_hash = self._verify_segment(path, 0, last_hash, None, result)
+            if not (result.integrity_valid and result.chain_valid):
+                return None
+        return last_hash
+    
+    def _verify_segment(self, path: str, start: int, last_hash: Optional[str],
+                        state: Optional[Dict], result: AuditVerificationResult) -> Optional[str]:
+        """Segment roté (gzip ou non): doit se terminer par une ligne complète"""
+        if path.endswith('.gz'):
+            _, last_hash = self._verify_gzip(path, start, last_hash, result)
+            return last_hash
+        offset, last_hash = self._verify_file(path, start, last_hash, state, result)
+        if result.integrity_valid and result.chain_valid and offset < os.path.getsize(path):
+            result.integrity_valid = False
+            result.errors.append(f"Ligne incomplète en fin de segment roté {path}")
+        return last_hash
+    
+    def _rotated_copy_exists(self, state: Dict) -> bool:
+        """Un prédécesseur gzip porte-t-il l'ancre vérifiée (inode du fichier actif réutilisé)"""
+        return any(self._gzip_anchor(path, state['offset']) == state['anchor']
+                   for path in self._predecessor_candidates() if path.endswith('.gz'))
+    
+    def _report_tampering(self, path: str, stat: os.stat_result, state: Dict,
+                          result: AuditVerificationResult):
+        """Contenu déjà vérifié divergent sur l'inode vérifié: échec d'intégrité localisé"""
+        result.integrity_valid = False
+        result.chain_valid = False
+        if stat.st_size < state['offset']:
+            result.errors.append(
+                f"Audit log {path} tronqué sous l'offset vérifié {state['offset']} "
+                f"(taille {stat.st_size})")
+        elif self._recheck_all_chunks(path, state, result):
+            result.errors.append(
+                f"Chaîne hachage altérée: contenu déjà vérifié de {path} modifié "
+                f"avant l'offset {state['offset']}")
+    
+    def _recheck_all_chunks(self, path: str, state: Dict, result: AuditVerificationResult) -> bool:
+        """Recontrôle de toutes les empreintes de blocs (localisation d'une altération)"""
+        return self._recheck_chunks(path, dict(state, recheck_cursor=0),
+                                    result, len(state.get('chunks', [])))
+    
+    def _is_verified_segment(self, path: str, stat: os.stat_result, state: Dict) -> bool:
+        """Le fichier est-il celui vérifié précédemment (inode, taille, ancre)"""
+        return (stat.st_ino == state['inode']
+                and stat.st_size >= state['offset']
+                and self._file_anchor(path, state['offset']) == state['anchor'])
+    
+    def _verify_predecessors(self, state: Dict, result: AuditVerificationResult) -> Optional[str]:
+        """Reprend la vérification dans les fichiers rotés, du plus ancien au plus récent"""
+        candidates = self._predecessor_candidates()
+        
+        # Localise le segment contenant l'offset vérifié (inode ou ancre)
+        resume_index = None
+        for index, path in enumerate(candidates):
+            if path.endswith('.gz'):
+                if self._gzip_anchor(path, state['offset']) == state['anchor']:
+                    resume_index = index
+                    break
+            else:
+                stat = os.stat(path)
+                if self._is_verified_segment(path, stat, state):
+                    resume_index = index
+                    break
+                if stat.st_ino == state['inode']:
+                    # Segment vérifié retrouvé par inode mais altéré depuis la rotation
+                    self._report_tampering(path, stat, state, result)
+                    return None
+        
+        if resume_index is None:
+            result.integrity_valid = False
+            result.errors.append(
+                "Segment audit vérifié introuvable (rotation expirée, troncature ou réécriture)")
+            return None
+        
+        last_hash = state['last_hash']
+        for index in range(resume_index, -1, -1):
+            path = candidates[index]
+            resume_state = state if index == resume_index else None
+            start = state['offset'] if resume_state else 0
+            if resume_state and not path.endswith('.gz') and not self._recheck_chunks(path, state, result):
+                return None
+            last_hash = self._verify_segment(path, start, last_hash, resume_state, result)
+            if not (result.integrity_valid and result.chain_valid):
+                return None
+        return last_hash
+    
+    def _verify_file(self, path: str, start: int, last_hash: Optional[str],
+                     state: Optional[Dict], result: AuditVerificationResult) -> Tuple[int, Optional[str]]:
+        """Vérifie un fichier non compressé par fenêtres mmap à partir de start"""
+        size = os.path.getsize(path)
+        if state and self._file_anchor(path, start) != state['anchor']:
+            result.integrity_valid = False
+            result.errors.append(f"Contenu déjà vérifié modifié avant l'offset {start}")
+            return start, last_hash
+        if size <= start:
+            return start, last_hash
+        
+        granularity = mmap.ALLOCATIONGRANULARITY
+        window_size = self.WINDOW_SIZE
+        offset = start
+        with open(path, 'rb') as f:
+            while offset < size:
+                window_start = offset - (offset % granularity)
+                length = min(max(window_size, offset - window_start + granularity),
+                             size - window_start)
+                with mmap.mmap(f.fileno(), length, access=mmap.ACCESS_READ,
+                               offset=window_start) as window:
+                    view = memoryview(window)
+                    try:
+                        consumed, last_hash = self._verify_lines(
+                            view, offset - window_start, last_hash, result,
+                            window_start)
+                    finally:
+                        view.release()
+                
+                if not (result.integrity_valid and result.chain_valid):
+                    break
+                if consumed == offset - window_start:
+                    # Aucune ligne complète: agrandir la fenêtre ou ligne partielle finale
+                    if window_start + length >= size:
+                        break
+                    window_size *= 2
+                    continue
+                offset = window_start + consumed
+        return offset, last_hash
+    
+    def _verify_gzip(self, path: str, start: int, last_hash: Optional[str],
+                     result: AuditVerificationResult) -> Tuple[int, Optional[str]]:
+        """Vérifie un prédécesseur gzip en streaming (décompression par blocs)"""
+        offset = 0
+        pending = bytearray()
+        with gzip.open(path, 'rb') as f:
+            if start:
+                f.seek(start)
+                offset = start
+            while True:
+                chunk = f.read(self.WINDOW_SIZE)
+                if not chunk:
+                    break
+                pending += chunk
+                view = memoryview(pending)
+                try:
+                    consumed, last_hash = self._verify_lines(view, 0, last_hash, result, offset)
+                finally:
+                    view.release()
+                if not (result.integrity_valid and result.chain_valid):
+                    break
+                del pending[:consumed]
+                offset += consumed
+        if pending:
+            result.integrity_valid = False
+            result.errors.append(f"Ligne incomplète en fin de segment roté {path}")
+        return offset, last_hash
+    
+    def _verify_lines(self, view: memoryview, pos: int, last_hash: Optional[str],
+                      result: AuditVerificationResult, base_offset: int) -> Tuple[int, Optional[str]]:
+        """Vérifie les lignes complètes de view[pos:], retourne la position consommée"""
+        end = len(view)
+        obj = view.obj
+        while pos < end:
+            newline = obj.find(b'\n', pos, end)
+            if newline == -1:
+                break
+            if newline > pos:
+                match = self.PREV_HASH_PATTERN.search(view, pos, newline)
+                if last_hash is not None and (match is None or match.group(1).decode() != last_hash):
+                    result.chain_valid = False
+                    result.errors.append(
+                        f"Chaîne hachage rompue à l'offset {base_offset + pos}")
+                    return pos, last_hash
+                last_hash = hashlib.sha256(view[pos:newline]).hexdigest()
+                result.lines_verified += 1
+            result.bytes_verified += newline + 1 - pos
+            pos = newline + 1
+        return pos, last_hash
+    
+    def _file_anchor(self, path: str, offset: int) -> str:
+        """Empreinte des derniers octets vérifiés (détection réécriture/identité)"""
+        with open(path, 'rb') as f:
+            f.seek(max(0, offset - self.ANCHOR_SIZE))
+            return hashlib.sha256(f.read(min(offset, self.ANCHOR_SIZE))).hexdigest()
+    
+    def _gzip_anchor(self, path: str, offset: int) -> Optional[str]:
+        """Empreinte des octets précédant offset dans un fichier gzip"""
+        try:
+            with gzip.open(path, 'rb') as f:
+                f.seek(max(0, offset - self.ANCHOR_SIZE))
+                data = f.read(min(offset, self.ANCHOR_SIZE))
+        except (OSError, EOFError):
+            return None
+        if len(data) != min(offset, self.ANCHOR_SIZE):
+            return None
+        return hashlib.sha256(data).hexdigest()
+    
+    def _load_state(self) -> Optional[Dict]:
+        """Charge l'état de vérification persisté"""
+        try:
+            with open(self.state_path, 'r') as f:
+                state = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        return state if state.get('log_path') == self.log_path else None
+    
+    def _save_state(self, state: Dict):
+        """Persiste l'état de manière atomique"""
+        state['log_path'] = self.log_path
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+class AgentSandbox(abc.ABC):
+    """Sandbox agent pré-configurée exécutant des sondes d'accès par lot"""
+    
+    PERMISSION_TESTS = {'read': '-r', 'write': '-w', 'execute': '-x'}
+    
+    def __init__(self, agent: str, workspace_path: str):
+        self.agent = agent
+        self.workspace_path = workspace_path
+        
+    def probe(self, checks: List[Tuple[str, str]], stat_paths: Tuple[str, ...] = ()
+              ) -> Tuple[Dict[Tuple[str, str], bool], Dict[str, List[str]]]:
+        """Exécute toutes les sondes (chemin, permission) en un seul appel
+        
+        Les chemins stat_paths sont examinés dans le même exec (mode,
+        propriétaire, identité de la sandbox): retourne aussi, par chemin,
+        les permissions que la sandbox ne doit pas obtenir.
+        """
+        lines = [f"test {self.PERMISSION_TESTS[perm]} {shlex.quote(path)} && echo 1 || echo 0"
+                 for path, perm in checks]
+        if stat_paths:
+            lines += ['id -u', "id -G | tr ' ' ,"]
+            lines += [f"stat -c %a:%u:%g {shlex.quote(path)} 2>/dev/null || echo -"
+                      for path in stat_paths]
+        output = self._run_script('\n'.join(lines)).split()
+        if len(output) != len(lines):
+            raise RuntimeError(f"Sandbox {self.agent}: sortie sondes incomplète")
+        results = {check: value == '1' for check, value in zip(checks, output)}
+        
+        denied = {}
+        if stat_paths:
+            uid, gids = output[len(checks)], output[len(checks) + 1].split(',')
+            for path, entry in zip(stat_paths, output[len(checks) + 2:]):
+                denied[path] = self._denied_permissions(entry, uid, gids)
+        return results, denied
+    
+    @classmethod
+    def _denied_permissions(cls, entry: str, uid: str, gids: List[str]) -> List[str]:
+        """Permissions refusées vues depuis la sandbox (sortie stat %a:%u:%g)
+        
+        Écriture toujours refusée; lecture/traversée refusées sauf si la
+        classe (propriétaire, groupe ou autres) de la sandbox les accorde.
+        """
+        if entry == '-':
+            return list(cls.PERMISSION_TESTS)
+        mode, owner, group = entry.split(':')
+        shift = 6 if owner == uid else 3 if group in gids else 0
+        bits = int(mode, 8) >> shift
+        denied = ['write']
+        if not bits & 0o4:
+            denied.append('read')
+        if not bits & 0o1:
+            denied.append('execute')
+        return denied
+    
+    @abc.abstractmethod
+    def _run_script(self, script: str) -> str:
+        """Exécute le script shell de sondes dans la sandbox, retourne stdout"""
+    
+class DockerAgentSandbox(AgentSandbox):
+    """Sandbox conteneur: rootfs lecture seule, aucune capability, sans réseau"""
+    
+    def __init__(self, agent: str, container):
+        super().__init__(agent, '/workspace')
+        self.container = container
+        
+    def _run_script(self, script: str) -> str:
+        exit_code, output = self.container.exec_run(['sh', '-c', script])
+        if exit_code != 0:
+            raise RuntimeError(f"Sandbox {self.agent}: exec échoué ({exit_code})")
+        return output.decode()
+
+class LocalAgentSandbox(AgentSandbox):
+    """Sandbox subprocess (fallback sans Docker), privilèges abaissés à nobody"""
+    
+    def __init__(self, agent: str, workspace_path: str, run_as: Optional[Tuple[int, int]]):
+        super().__init__(agent, workspace_path)
+        self.run_as = run_as
+        
+    def _run_script(self, script: str) -> str:
+        return subprocess.run(
+            ['sh', '-c', script], capture_output=True, text=True, check=True,
+            timeout=30, preexec_fn=self._drop_privileges if self.run_as else None
+        ).stdout
+    
+    def _drop_privileges(self):
+        uid, gid = self.run_as
+        os.setgroups([])
+        os.setgid(gid)
+        os.setuid(uid)
+
+class AgentSandboxPool:
+    """Pool de sandboxes agents chaudes, une par profil de permissions
+    
+    Les conteneurs sont étiquetés par profil et réutilisés entre tests et
+    entre exécutions de la suite; ils expirent seuls après SANDBOX_TTL.
+    Sans Docker, repli sur des sandboxes subprocess locales.
+    """
+    
+    SANDBOX_IMAGE = 'alpine:3.20'
+    SANDBOX_TTL = 900  # 15 minutes de chauffe
+    MIN_REMAINING_LIFETIME = 120  # marge avant réutilisation d'un conteneur
+    PROFILE_LABEL = 'bmad.sandbox.profile'
+    PERMISSIONS_LABEL = 'bmad.sandbox.permissions'
+    PERMISSION_MODES = {'read': 0o400, 'write': 0o200, 'execute': 0o100}
+    
+    def __init__(self, workspace_root: str = '/tmp/bmad-sandboxes'):
+        self.workspace_root = Path(workspace_root)
+        self.sandboxes = {}
+        self.docker_client = self._connect_docker()
+        
+    def acquire(self, agent: str, permissions: List[str]) -> AgentSandbox:
+        """Retourne la sandbox chaude du profil, la crée au premier usage"""
+        profile = (agent, tuple(sorted(permissions)))
+        sandbox = self.sandboxes.get(profile)
+        if isinstance(sandbox, DockerAgentSandbox) and not self._has_lifetime(sandbox.container):
+            # Conteneur proche de son expiration (sleep SANDBOX_TTL): le remplacer
+            sandbox = None
+        if sandbox is None:
+            workspace = self._prepare_workspace(agent, permissions)
+            if self.docker_client is not None:
+                sandbox = DockerAgentSandbox(agent, self._warm_container(agent, permissions, workspace))
+            else:
+                sandbox = LocalAgentSandbox(agent, str(workspace), self._unprivileged_ids())
+            self.sandboxes[profile] = sandbox
+        return sandbox
+    
+    def _connect_docker(self):
+        """Client Docker si le démon répond, sinon None (fallback local)"""
+        try:
+            client = docker.from_env()
+            client.ping()
+            return client
+        except Exception:
+            return None
+    
+    def _prepare_workspace(self, agent: str, permissions: List[str]) -> Path:
+        """Workspace agent dont les bits propriétaire reflètent ses permissions"""
+        workspace = self.workspace_root / agent
+        workspace.mkdir(parents=True, exist_ok=True)
+        ids = self._unprivileged_ids()
+        if ids:
+            os.chown(workspace, *ids)
+        workspace.chmod(sum(self.PERMISSION_MODES[perm] for perm in permissions))
+        return workspace
+    
+    def _warm_container(self, agent: str, permissions: List[str], workspace: Path):
+        """Réutilise un conteneur du profil encore actif, sinon en démarre un"""
+        permissions_label = ','.join(sorted(permissions))
+        running = self.docker_client.containers.list(filters={
+            'label': [f'{self.PROFILE_LABEL}={agent}',
+                      f'{self.PERMISSIONS_LABEL}={permissions_label}'],
+            'status': 'running'
+        })
+        for container in running:
+            if self._has_lifetime(container):
+                return container
+            container.stop(timeout=1)  # auto_remove: supprimé à l'arrêt
+        
+        return self.docker_client.containers.run(
+            self.SANDBOX_IMAGE,
+            ['sleep', str(self.SANDBOX_TTL)],
+            detach=True,
+            auto_remove=True,
+            # Même uid que le propriétaire du workspace (nobody si root): seuls ses bits comptent
+            user='{}:{}'.format(*(self._unprivileged_ids() or (os.getuid(), os.getgid()))),
+            read_only=True,
+            network_disabled=True,
+            cap_drop=['ALL'],
+            security_opt=['no-new-privileges'],
+            labels={self.PROFILE_LABEL: agent, self.PERMISSIONS_LABEL: permissions_label},
+            volumes={str(workspace): {
+                'bind': '/workspace',
+                'mode': 'rw' if 'write' in permissions else 'ro'
+            }}
+        )
+    
+    def _has_lifetime(self, container) -> bool:
+        """Le conteneur vivra-t-il encore au moins MIN_REMAINING_LIFETIME secondes"""
+        try:
+            container.reload()
+            state = container.attrs['State']
+            started_at = datetime.fromisoformat(state['StartedAt'][:19]).replace(tzinfo=timezone.utc)
+        except Exception:
+            return False  # supprimé entre-temps (auto_remove) ou état illisible
+        elapsed = (datetime.now(timezone.utc) - started_at).total_seconds()
+        return state.get('Running', False) and self.SANDBOX_TTL - elapsed > self.MIN_REMAINING_LIFETIME
+    
+    @staticmethod
+    def _unprivileged_ids() -> Optional[Tuple[int, int]]:
+        """(uid, gid) de nobody si exécuté en root, None sinon"""
+        if os.geteuid() != 0:
+            return None
+        import pwd  # POSIX uniquement: chargé à la demande
+        nobody = pwd.getpwnam('nobody')
+        return nobody.pw_uid, nobody.pw_gid
+
 class ResourceIsolationTests(unittest.TestCase):
     """Tests isolation des ressources entre agents"""
     
+    @classmethod
+    def setUpClass(cls):
+        """Pool sandboxes chaudes partagé par les tests de la classe"""
+        cls.sandbox_pool = AgentSandboxPool()
+    
     def setUp(self):
         """Setup environnement test isolation"""
-        self.test_containers = []
-        self.docker_client = docker.from_env()
+        self.docker_client = self.sandbox_pool.docker_client
         
     def test_filesystem_isolation(self):
         """Valide isolation filesystem entre agents"""
@@ -61,25 +627,33 @@ class ResourceIsolationTests(unittest.TestCase):
         }
         
         try:
-            # Test 1: Vérifier isolation des chemins autorisés
-            authorized_paths = ['/workspace', '/projects']
             unauthorized_paths = ['/etc', '/var', '/root', '/home']
-            
-            for path in unauthorized_paths:
-                isolation_valid = self._test_path_access_denied(path)
-                self.assertTrue(isolation_valid, 
-                    f"SECURITY VIOLATION: Agent accès non autorisé {path}")
-                
-            # Test 2: Vérifier permissions granulaires
             agent_permissions = {
                 'contains-test-analyzer': ['read'],
                 'contains-eng-devops': ['read', 'write', 'execute'],
                 'bmad-orchestrator': ['read', 'write']
             }
             
+            # Toutes les sondes d'un agent s'exécutent en un lot dans sa sandbox
             for agent, perms in agent_permissions.items():
-                for perm in perms:
-                    self._validate_agent_permission(agent, perm)
+                sandbox = self.sandbox_pool.acquire(agent, perms)
+                workspace = sandbox.workspace_path
+                
+                # Test 1: chemins système inaccessibles à l'agent (toutes permissions)
+                checks = [(path, perm) for path in unauthorized_paths
+                          for perm in AgentSandbox.PERMISSION_TESTS]
+                # Test 2: permissions granulaires accordées (et seulement elles)
+                checks += [(workspace, perm) for perm in AgentSandbox.PERMISSION_TESTS]
+                # Attendu calculé dans la sandbox (rootfs et uid du conteneur, pas de l'hôte)
+                results, denied = sandbox.probe(checks, stat_paths=tuple(unauthorized_paths))
+                
+                for path in unauthorized_paths:
+                    granted = [perm for perm in denied[path] if results[(path, perm)]]
+                    self.assertFalse(granted,
+                        f"SECURITY VIOLATION: Agent {agent} accès non autorisé {path} ({granted})")
+                for perm in AgentSandbox.PERMISSION_TESTS:
+                    self.assertEqual(results[(workspace, perm)], perm in perms,
+                        f"Permission {perm} incorrecte pour agent {agent}")
                     
             test_results['status'] = 'passed'
             test_results['details'] = 'Isolation filesystem validée'
@@ -116,20 +690,30 @@ class ResourceIsolationTests(unittest.TestCase):
                 'contains_eng_devops': ['deployment_logs', 'infrastructure']
             }
             
-            for agent, schemas in agent_schemas.items():
-                for schema in schemas:
-                    access_valid = self._test_schema_access(conn, agent, schema)
-                    self.assertTrue(access_valid, 
-                        f"Agent {agent} ne peut pas accéder schema {schema}")
-                
-                # Test accès refusé autres schemas
-                forbidden_schemas = [s for schemas_list in agent_schemas.values() 
-                                   for s in schemas_list if s not in schemas]
-                for forbidden in forbidden_schemas:
-                    access_denied = self._test_schema_access_denied(conn, agent, forbidden)
-                    self.assertTrue(access_denied,
-                        f"VIOLATION: Agent {agent} accès non autorisé {forbidden}")
-                        
+            # Audit ensembliste: une seule requête pour toute la matrice
+            # agents × schemas, comparée en mémoire aux accès déclarés
+            declared_access = {
+                (agent, schema)
+                for agent, schemas in agent_schemas.items()
+                for schema in schemas
+            }
+            all_schemas = {schema for _, schema in declared_access}
+            actual_access = self._fetch_schema_privileges(
+                conn, list(agent_schemas), sorted(all_schemas))
+            
+            missing_access = declared_access - actual_access
+            self.assertFalse(missing_access,
+                f"Agents sans accès à leurs schemas: {sorted(missing_access)}")
+            
+            unauthorized_access = actual_access - declared_access
+            self.assertFalse(unauthorized_access,
+                f"VIOLATION: accès non autorisés détectés: {sorted(unauthorized_access)}")
+            
+            test_results['details'] = {
+                'agents_audited': len(agent_schemas),
+                'schemas_audited': len(all_schemas),
+                'queries_executed': 1
+            }
             test_results['status'] = 'passed'
             conn.close()
             
@@ -142,6 +726,25 @@ class ResourceIsolationTests(unittest.TestCase):
             test_results['end_time'] = datetime.now().isoformat()
             self._record_test_result(test_results)
     
+    def _fetch_schema_privileges(self, conn, roles: List[str],
+                                 schemas: List[str]) -> Set[Tuple[str, str]]:
+        """Récupère en une requête les couples (rôle, schema) accessibles
+        
+        has_schema_privilege résout les appartenances de rôles (INHERIT),
+        ce qui couvre les droits hérités via des rôles de groupe.
+        """
+        query = """
+        SELECT r.rolname, n.nspname
+        FROM pg_roles r
+        CROSS JOIN pg_namespace n
+        WHERE r.rolname = ANY(%s)
+          AND n.nspname = ANY(%s)
+          AND has_schema_privilege(r.oid, n.oid, 'USAGE')
+        """
+        with conn.cursor() as cursor:
+            cursor.execute(query, (roles, schemas))
+            return {(rolname, nspname) for rolname, nspname in cursor.fetchall()}
+
     def test_redis_namespace_isolation(self):
         """Valide isolation namespaces Redis"""
         test_results = {
@@ -357,6 +960,21 @@ class SecurityComplianceTests(unittest.TestCase):
         with open(config_path, 'r') as f:
             return json.load(f)
     
+    def _verify_log_integrity(self, log_path: str) -> bool:
+        """Valide intégrité audit log (append-only, contenu vérifié inchangé)"""
+        return self._audit_verification(log_path).integrity_valid
+    
+    def _verify_hash_chain(self, log_path: str) -> bool:
+        """Valide chaîne de hachage audit log"""
+        return self._audit_verification(log_path).chain_valid
+    
+    def _audit_verification(self, log_path: str) -> AuditVerificationResult:
+        """Passe unique de vérification partagée entre intégrité et chaîne"""
+        cache = self.__dict__.setdefault('_audit_results', {})
+        if log_path not in cache:
+            cache[log_path] = AuditLogVerifier(log_path).verify()
+        return cache[log_path]
+    
     def _validate_tls_connection(self, host: str, port: int) -> bool:
         """Valide connexion TLS sécurisée"""
         context = ssl.create_default_context()
@@ -404,8 +1022,509 @@ class SecurityComplianceTests(unittest.TestCase):
         with open(results_file, 'w') as f:
             json.dump(results, f, indent=2)
 
-def run_security_test_suite():
-    """Exécute suite complète tests sécurité"""
+class TimedTestResult(unittest.TextTestResult):
+    """TestResult qui mesure durée et statut de chaque test"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.test_timings = []
+        self._test_started = {}
+        self._test_outcomes = {}
+        
+    def startTest(self, test):
+        self._test_started[test.id()] = time.perf_counter()
+        super().startTest(test)
+        
+    def stopTest(self, test):
+        super().stopTest(test)
+        started = self._test_started.pop(test.id(), None)
+        if started is not None:
+            self.test_timings.append({
+                'test_id': test.id(),
+                'duration_s': time.perf_counter() - started,
+                'outcome': self._outcome_of(test)
+            })
+    
+    def addExpectedFailure(self, test, err):
+        super().addExpectedFailure(test, err)
+        self._test_outcomes[test.id()] = 'expected_failure'
+        
+    def addUnexpectedSuccess(self, test):
+        super().addUnexpectedSuccess(test)
+        self._test_outcomes[test.id()] = 'unexpected_success'
+    
+    def _outcome_of(self, test) -> str:
+        """Statut final du test (dernier enregistré par unittest)"""
+        if test.id() in self._test_outcomes:
+            return self._test_outcomes.pop(test.id())
+        for outcome, records in (('error', self.errors), ('failure', self.failures),
+                                 ('skipped', self.skipped)):
+            if any(recorded is test for recorded, _ in records):
+                return outcome
+        return 'passed'
+
+class SecurityTestHistory:
+    """Historique durées/statuts des tests sécurité (SQLite) et détection régressions"""
+    
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS test_runs (
+        run_id TEXT PRIMARY KEY,
+        git_revision TEXT NOT NULL,
+        started_at TEXT NOT NULL,
+        tests_run INTEGER NOT NULL,
+        success_rate REAL NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS test_durations (
+        run_id TEXT NOT NULL REFERENCES test_runs(run_id),
+        test_id TEXT NOT NULL,
+        duration_s REAL NOT NULL,
+        outcome TEXT NOT NULL,
+        PRIMARY KEY (run_id, test_id)
+    );
+    CREATE INDEX IF NOT EXISTS idx_test_durations_test ON test_durations(test_id);
+    """
+    OUTCOMES = ('passed', 'failure', 'error', 'skipped', 'expected_failure', 'unexpected_success')
+    
+    def __init__(self, db_path: Optional[Path] = None):
+        self.db_path = Path(db_path or TESTING_LOGS_DIR / 'security-test-history.db')
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.db_path))
+        self.conn.executescript(self.SCHEMA)
+        
+    def record_run(self, timings: List[Dict], success_rate: float) -> str:
+        """Enregistre un run complet, retourne son run_id"""
+        run_id = uuid.uuid4().hex
+        unknown = {t['outcome'] for t in timings} - set(self.OUTCOMES)
+        if unknown:
+            raise ValueError(f"Statuts de test inconnus: {sorted(unknown)}")
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO test_runs VALUES (?, ?, ?, ?, ?)",
+                (run_id, self._git_revision(), datetime.now().isoformat(),
+                 len(timings), success_rate))
+            self.conn.executemany(
+                "INSERT INTO test_durations VALUES (?, ?, ?, ?)",
+                [(run_id, t['test_id'], t['duration_s'], t['outcome']) for t in timings])
+        return run_id
+    
+    def regression_report(self, threshold: float = 0.25, window: int = 30,
+                          min_samples: int = 5) -> Dict:
+        """Percentiles par test et régressions du dernier run vs historique
+        
+        Un test régresse si sa durée au dernier run dépasse la médiane des
+        `window` runs précédents de plus de `threshold` (ratio).
+        """
+        runs = self.conn.execute(
+            "SELECT run_id, git_revision, started_at FROM test_runs "
+            "ORDER BY started_at DESC LIMIT ?", (window + 1,)).fetchall()
+        if not runs:
+            return {'latest_run': None, 'tests': {}, 'regressions': []}
+        
+        latest_run_id, latest_revision, latest_started = runs[0]
+        placeholders = ','.join('?' * len(runs))
+        rows = self.conn.execute(
+            f"SELECT run_id, test_id, duration_s, outcome FROM test_durations "
+            f"WHERE run_id IN ({placeholders})", [run[0] for run in runs]).fetchall()
+        
+        history = defaultdict(list)
+        latest = {}
+        for run_id, test_id, duration, outcome in rows:
+            if run_id == latest_run_id:
+                latest[test_id] = (duration, outcome)
+            else:
+                history[test_id].append(duration)
+        
+        tests, regressions = {}, []
+        for test_id in sorted(set(history) | set(latest)):
+            durations = sorted(history[test_id])
+            stats = {
+                'samples': len(durations),
+                'p50_s': self._percentile(durations, 50),
+                'p90_s': self._percentile(durations, 90),
+                'p99_s': self._percentile(durations, 99),
+            }
+            if test_id in latest:
+                stats['latest_s'], stats['latest_outcome'] = latest[test_id]
+                if len(durations) >= min_samples and stats['p50_s'] > 0:
+                    ratio = stats['latest_s'] / stats['p50_s']
+                    stats['ratio_vs_p50'] = round(ratio, 3)
+                    if ratio > 1 + threshold:
+                        regressions.append({'test_id': test_id, **stats})
+            tests[test_id] = stats
+        
+        return {
+            'generated_at': datetime.now().isoformat(),
+            'latest_run': {'run_id': latest_run_id, 'git_revision': latest_revision,
+                           'started_at': latest_started},
+            'baseline_runs': len(runs) - 1,
+            'threshold': threshold,
+            'tests': tests,
+            'regressions': regressions
+        }
+    
+    def write_report(self, report: Dict) -> Path:
+        """Écrit le rapport tendances à côté des rapports JSON existants"""
+        report_path = self.db_path.parent / 'security-test-trends.json'
+        with open(report_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        return report_path
+    
+    @staticmethod
+    def _percentile(sorted_values: List[float], percentile: float) -> Optional[float]:
+        """Percentile nearest-rank sur liste triée"""
+        if not sorted_values:
+            return None
+        rank = max(1, math.ceil(percentile / 100 * len(sorted_values)))
+        return sorted_values[rank - 1]
+    
+    @staticmethod
+    def _git_revision() -> str:
+        """Révision git courante du dépôt (ou 'unknown')"""
+        try:
+            return subprocess.check_output(
+                ['git', 'rev-parse', 'HEAD'], cwd=Path(__file__).resolve().parent,
+                stderr=subprocess.DEVNULL, text=True).strip()
+        except (OSError, subprocess.CalledProcessError):
+            return 'unknown'
+
+class MonitoringReplayTests(unittest.TestCase):
+    """Smoke test du replay d'audit log dans le pipeline d'analyse"""
+    
+    @classmethod
+    def setUpClass(cls):
+        cls.monitoring = load_security_module(MONITORING_MODULE)
+    
+    def test_replay_audit_log(self):
+        """Rejoue un petit audit log: sévérités attendues, heure de l'événement respectée"""
+        events = [
+            # Accès déclaré, heures ouvrées: aucun événement sécurité
+            {'timestamp': '2026-03-02T10:00:00Z', 'agent_id': 'bmad-qa', 'server_name': 'github',
+             'method': 'read_file', 'response_status': 200, 'duration_ms': 12},
+            # Agent inconnu de la matrice, requête refusée: non autorisé + taux d'erreur
+            {'timestamp': '2026-03-02T10:00:01Z', 'agent_id': 'rogue-agent', 'server_name': 'postgres',
+             'method': 'drop_table', 'response_status': 403, 'duration_ms': 3},
+            # Accès déclaré mais à 03h UTC (hors fenêtre par défaut 06h-23h)
+            {'timestamp': '2026-03-02T03:00:00Z', 'agent_id': 'bmad-qa', 'server_name': 'github',
+             'method': 'read_file', 'response_status': 200, 'duration_ms': 8,
+             'source_ip': None, 'user_agent': None},
+        ]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            log_path = os.path.join(tmp_dir, 'mcp-audit.log')
+            with open(log_path, 'w') as f:
+                f.write('\n'.join(json.dumps(event) for event in events[:2]))
+                f.write('\n{ligne tronquée\n')
+                f.write(json.dumps(events[2]) + '\n')
+            
+            severity_counts = asyncio.run(self.monitoring.replay_audit_log(log_path))
+        
+        self.assertEqual(severity_counts, {'CRITICAL': 1, 'LOW': 1})
+
+class SeverityQueueTests(unittest.TestCase):
+    """Délestage de la file par sévérité: LOW d'abord, CRITICAL/HIGH sans perte"""
+    
+    @classmethod
+    def setUpClass(cls):
+        cls.monitoring = load_security_module(MONITORING_MODULE)
+    
+    def _event(self, severity: str, agent_id: str = 'bmad-qa'):
+        return self.monitoring.SecurityEvent(
+            timestamp=datetime.now(), agent_id=agent_id, event_type=f'{severity.lower()}_event',
+            severity=severity, resource='github', action='read_file', source_ip='', user_agent='',
+            details={}, risk_score=1.0, compliance_flags=[])
+    
+    def test_low_shed_before_medium_eviction(self):
+        """MEDIUM plein: les LOW en file sont repliés avant toute éviction MEDIUM"""
+        queue = self.monitoring.SeverityPriorityQueue(
+            {'CRITICAL': 10, 'HIGH': 10, 'MEDIUM': 2, 'LOW': 3})
+        for _ in range(3):
+            queue.put_nowait(self._event('LOW'))
+        for _ in range(5):
+            queue.put_nowait(self._event('MEDIUM'))
+        
+        self.assertEqual(queue.shed_counts.get(('MEDIUM', 'evicted'), 0), 0)
+        self.assertEqual(queue.shed_counts[('LOW', 'aggregated')], 3)
+        self.assertEqual(len(queue.levels['LOW']), 0)
+        self.assertEqual(len(queue.levels['MEDIUM']), 5)
+        
+        # Plus aucun LOW en file: le MEDIUM le plus ancien est évincé
+        queue.put_nowait(self._event('MEDIUM'))
+        self.assertEqual(queue.shed_counts[('MEDIUM', 'evicted')], 1)
+        
+        served = [queue.get_nowait() for _ in range(6)]
+        self.assertEqual([event.severity for event in served], ['MEDIUM'] * 5 + ['LOW'])
+        self.assertEqual(served[-1].event_type, 'aggregated_low_events')
+        self.assertTrue(queue.empty())
+    
+    def test_lossless_levels_wait(self):
+        """HIGH plein: refus (le producteur attend) sans éviction ni perte de LOW"""
+        queue = self.monitoring.SeverityPriorityQueue(
+            {'CRITICAL': 1, 'HIGH': 1, 'MEDIUM': 1, 'LOW': 10})
+        queue.put_nowait(self._event('LOW'))
+        queue.put_nowait(self._event('HIGH'))
+        with self.assertRaises(asyncio.QueueFull):
+            queue.put_nowait(self._event('HIGH'))
+        self.assertEqual(len(queue.levels['LOW']), 1)
+        self.assertFalse(queue.shed_counts)
+
+class FileSystemWatcherTests(unittest.TestCase):
+    """Watcher filesystem en mode inotify sur une arborescence temporaire"""
+    
+    DEBOUNCE = 0.2
+    
+    @classmethod
+    def setUpClass(cls):
+        cls.monitoring = load_security_module(MONITORING_MODULE)
+    
+    def test_batches_coalesced_and_scoped(self):
+        """Écritures coalescées par fichier, hors racines ignoré, sous-répertoire créé suivi"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            watched, outside = os.path.join(tmp_dir, 'watched'), os.path.join(tmp_dir, 'outside')
+            os.makedirs(watched)
+            os.makedirs(outside)
+            try:
+                watcher = self.monitoring.FileSystemWatcher(
+                    [watched], debounce=self.DEBOUNCE, use_fanotify=False)
+            except ImportError as e:
+                self.skipTest(str(e))
+            
+            async def scenario():
+                await watcher.start()
+                try:
+                    for index in range(3):
+                        with open(os.path.join(watched, 'report.json'), 'w') as f:
+                            f.write(str(index))
+                    with open(os.path.join(outside, 'secret.txt'), 'w') as f:
+                        f.write('hors racine')
+                    first = await asyncio.wait_for(watcher.next_batch(), 5)
+                    
+                    os.makedirs(os.path.join(watched, 'sub'))
+                    with open(os.path.join(watched, 'sub', 'nested.txt'), 'w') as f:
+                        f.write('nouveau répertoire')
+                    later = {}
+                    while os.path.join(watched, 'sub', 'nested.txt') not in later:
+                        for access in await asyncio.wait_for(watcher.next_batch(), 5):
+                            later.setdefault(access.path, set()).update(access.operations)
+                    return first, later
+                finally:
+                    watcher.stop()
+            
+            first, later = asyncio.run(scenario())
+        
+        self.assertEqual([access.path for access in first], [os.path.join(watched, 'report.json')])
+        report = first[0]
+        self.assertEqual(report.operations, {'create', 'write'})
+        # Un seul FileAccess pour le lot (le noyau fusionne déjà les événements identiques consécutifs)
+        self.assertGreaterEqual(report.count, 2)
+        self.assertIsNone(report.uid)  # inotify: aucune attribution
+        self.assertEqual(watcher.mode, 'inotify')
+        self.assertIn('create', later[os.path.join(watched, 'sub')])
+        self.assertIn('create', later[os.path.join(watched, 'sub', 'nested.txt')])
+        self.assertFalse([path for path in later if not path.startswith(watched)])
+
+class EventStreamTests(unittest.TestCase):
+    """Flux WebSocket local: filtres d'abonnement et rejet des filtres invalides"""
+    
+    @classmethod
+    def setUpClass(cls):
+        cls.monitoring = load_security_module(MONITORING_MODULE)
+        try:
+            websockets.connect
+        except ImportError:
+            raise unittest.SkipTest("websockets non installé")
+    
+    def _event(self, agent_id: str, severity: str, event_type: str = 'unauthorized_access'):
+        return self.monitoring.SecurityEvent(
+            timestamp=datetime.now(), agent_id=agent_id, event_type=event_type, severity=severity,
+            resource='github', action='read_file', source_ip='', user_agent='', details={},
+            risk_score=1.0, compliance_flags=[])
+    
+    async def _run_stream(self, scenario):
+        stream = self.monitoring.SecurityEventStream('localhost', 0)
+        await stream.start()
+        try:
+            port = stream.server.sockets[0].getsockname()[1]
+            return await asyncio.wait_for(scenario(stream, f'ws://localhost:{port}'), 10)
+        finally:
+            await stream.stop()
+    
+    async def _subscribe(self, stream, url: str, filters: Dict):
+        client = await websockets.connect(url)
+        await client.send(json.dumps(filters))
+        while not stream.subscriptions:
+            await asyncio.sleep(0.01)
+        return client
+    
+    def test_subscription_filters(self):
+        """Seuls les événements correspondant au filtre (agents × sévérités) sont reçus"""
+        async def scenario(stream, url):
+            client = await self._subscribe(stream, url, {'agents': ['bmad-qa'], 'severities': ['HIGH']})
+            try:
+                stream.publish_event(self._event('bmad-qa', 'LOW'))
+                stream.publish_event(self._event('rogue-agent', 'HIGH'))
+                stream.publish_event(self._event('bmad-qa', 'HIGH', 'privilege_escalation'))
+                stream.publish_alert({'agent_id': 'bmad-qa', 'severity': 'HIGH', 'event_type': 'alert'})
+                return [json.loads(await client.recv()) for _ in range(2)]
+            finally:
+                await client.close()
+        
+        messages = asyncio.run(self._run_stream(scenario))
+        self.assertEqual([message['type'] for message in messages], ['security_event', 'alert'])
+        self.assertEqual(messages[0]['data']['agent_id'], 'bmad-qa')
+        self.assertEqual(messages[0]['data']['event_type'], 'privilege_escalation')
+    
+    def test_invalid_filter_rejected(self):
+        """Filtre non conforme (élément non chaîne): trame d'erreur puis fermeture 1003"""
+        async def scenario(stream, url):
+            async with websockets.connect(url) as client:
+                await client.send(json.dumps({'agents': [{'a': 1}]}))
+                error = json.loads(await client.recv())
+                with self.assertRaises(websockets.exceptions.ConnectionClosed) as closed:
+                    await client.recv()
+                return error, closed.exception.rcvd.code, len(stream.subscriptions)
+        
+        error, close_code, subscriptions = asyncio.run(self._run_stream(scenario))
+        self.assertEqual(error['type'], 'error')
+        self.assertEqual(close_code, 1003)
+        self.assertEqual(subscriptions, 0)
+
+def _coordination_replica(redis_url: str, key_prefix: str, replica_id: str, audit_lines: List[str],
+                          settle_seconds: float, report, stop):
+    """Réplica de test (processus séparé) lisant le même audit log que les autres réplicas
+    
+    Rapporte (réplica, erreur, shards possédés, traitements par agent, empreintes escaladées).
+    """
+    try:
+        asyncio.run(_run_coordination_replica(redis_url, key_prefix, replica_id, audit_lines,
+                                               settle_seconds, report, stop))
+    except Exception as e:
+        report.put((replica_id, repr(e), [], {}, []))
+
+async def _run_coordination_replica(redis_url: str, key_prefix: str, replica_id: str, audit_lines: List[str],
+                                    settle_seconds: float, report, stop):
+    monitoring = load_security_module(MONITORING_MODULE)
+    config = monitoring.default_monitoring_config()
+    config.update({
+        'log_path': None,
+        'violation_db_path': ':memory:',
+        'redis': redis.connection.parse_url(redis_url),
+        'coordination': {'enabled': True, 'replica_id': replica_id, 'key_prefix': key_prefix,
+                         'shards': ReplicaCoordinationTests.SHARDS, 'lease_ttl': 2.0, 'renew_interval': 0.2}
+    })
+    processor = monitoring.SecurityEventProcessor(config)
+    coordinator = processor.coordinator
+    
+    async def settle():
+        deadline = time.monotonic() + settle_seconds
+        while time.monotonic() < deadline:
+            await processor._renew_coordination()
+            await asyncio.sleep(coordinator.renew_interval)
+    
+    try:
+        # Convergence des baux (rendezvous hashing sur les réplicas vivants)
+        await settle()
+        held = sorted(coordinator.held)
+        
+        # Audit log partagé: chaque réplica lit les mêmes lignes aux mêmes offsets
+        offset, agents = 0, []
+        for line in audit_lines:
+            event_data = json.loads(line)
+            agents.append(event_data['agent_id'])
+            await processor._process_mcp_event(event_data, processor._audit_line_id(offset, line))
+            offset += len(line.encode())
+        escalated = await asyncio.to_thread(
+            processor.agent_state.claim_escalations, {'encryption': ['fingerprint-a', 'fingerprint-b']})
+        
+        # Relais: envoi des lignes non possédées, réception et traitement des lignes relayées
+        relay = asyncio.create_task(processor._relay_forwarded_events())
+        await settle()
+        relay.cancel()
+        
+        requests = processor.agent_requests
+        processed = {agent_id: round(requests.rate(agent_id) * requests.window / 60) for agent_id in agents}
+        report.put((replica_id, None, held, {agent_id: count for agent_id, count in processed.items() if count},
+                    sorted(escalated)))
+        await asyncio.to_thread(stop.wait, 30)
+    finally:
+        await asyncio.to_thread(coordinator.release)
+
+class ReplicaCoordinationTests(unittest.TestCase):
+    """Réplicas HA du monitor: plusieurs processus locaux contre un même Redis
+    
+    Redis cible: BMAD_TEST_REDIS_URL (défaut redis://localhost:6379/15);
+    test ignoré si Redis est injoignable. Clés isolées par préfixe aléatoire.
+    """
+    
+    REDIS_URL = os.environ.get('BMAD_TEST_REDIS_URL', 'redis://localhost:6379/15')
+    REPLICAS = 3
+    SHARDS = 16
+    SETTLE_SECONDS = 2.5
+    
+    def setUp(self):
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            self.skipTest("Processus réplicas: start method fork requise")
+        try:
+            self.redis = redis.Redis.from_url(self.REDIS_URL)
+            self.redis.ping()
+        except Exception as e:
+            self.skipTest(f"Redis indisponible ({self.REDIS_URL}): {e}")
+        self.key_prefix = f"bmad:test:{uuid.uuid4().hex[:12]}"
+        
+    def tearDown(self):
+        keys = list(self.redis.scan_iter(match=f"{self.key_prefix}:*"))
+        if keys:
+            self.redis.delete(*keys)
+    
+    def test_shared_audit_log_processed_exactly_once(self):
+        """Chaque shard a un seul propriétaire; une ligne lue par tous les réplicas est traitée une fois"""
+        monitoring = load_security_module(MONITORING_MODULE)
+        context = multiprocessing.get_context('fork')
+        report, stop = context.Queue(), context.Event()
+        agents = [f'agent-{index}' for index in range(40)]
+        timestamp = datetime.now(timezone.utc).isoformat()
+        audit_lines = [json.dumps({'timestamp': timestamp, 'agent_id': agent_id, 'server_name': 'github',
+                                   'method': 'read_file', 'response_status': 200, 'duration_ms': 5}) + '\n'
+                       for agent_id in agents]
+        processes = [
+            context.Process(target=_coordination_replica, args=(
+                self.REDIS_URL, self.key_prefix, f'replica-{index}', audit_lines,
+                self.SETTLE_SECONDS, report, stop))
+            for index in range(self.REPLICAS)
+        ]
+        for process in processes:
+            process.start()
+        try:
+            results = [report.get(timeout=30) for _ in processes]
+        finally:
+            stop.set()
+            for process in processes:
+                process.join(timeout=10)
+                if process.is_alive():
+                    process.terminate()
+        
+        for replica_id, error, _, _, _ in results:
+            self.assertIsNone(error, f"Réplica {replica_id} en échec")
+        
+        # Partition: chaque shard possédé par exactement un réplica
+        all_held = sorted(shard for _, _, held, _, _ in results for shard in held)
+        self.assertEqual(all_held, list(range(self.SHARDS)))
+        
+        # Exactement une fois: chaque ligne traitée une seule fois, par le propriétaire de son agent
+        observer = monitoring.ShardCoordinator(self.redis, 'observer', shards=self.SHARDS,
+                                               key_prefix=self.key_prefix)
+        for replica_id, _, held, processed, _ in results:
+            owned = {agent_id: 1 for agent_id in agents if observer.shard_of(agent_id) in held}
+            self.assertEqual(processed, owned, f"Traitements inattendus sur {replica_id}")
+        
+        # Escalade: chaque empreinte revendiquée par un seul réplica du cluster
+        escalated = sorted(fingerprint for _, _, _, _, claimed in results for fingerprint in claimed)
+        self.assertEqual(escalated, ['fingerprint-a', 'fingerprint-b'])
+
+SECURITY_TEST_CLASSES = [ResourceIsolationTests, TLSAuthenticationTests, SecurityComplianceTests,
+                         MonitoringReplayTests, SeverityQueueTests, FileSystemWatcherTests,
+                         EventStreamTests, ReplicaCoordinationTests]
+
+def run_security_test_suite(test_classes: Optional[List[type]] = None):
+    """Exécute suite complète tests sécurité (ou les classes demandées)"""
     print("🔒 BMAD MCP ENTERPRISE SECURITY TESTING SUITE")
     print("=" * 50)
     
@@ -414,12 +1533,11 @@ def run_security_test_suite():
     suite = unittest.TestSuite()
     
     # Add test classes
-    suite.addTests(loader.loadTestsFromTestCase(ResourceIsolationTests))
-    suite.addTests(loader.loadTestsFromTestCase(TLSAuthenticationTests))  
-    suite.addTests(loader.loadTestsFromTestCase(SecurityComplianceTests))
+    for test_class in test_classes or SECURITY_TEST_CLASSES:
+        suite.addTests(loader.loadTestsFromTestCase(test_class))
     
     # Run tests with detailed output
-    runner = unittest.TextTestRunner(verbosity=2)
+    runner = unittest.TextTestRunner(verbosity=2, resultclass=TimedTestResult)
     result = runner.run(suite)
     
     # Generate summary report
@@ -428,6 +1546,7 @@ def run_security_test_suite():
     print(f"Tests exécutés: {result.testsRun}")
     print(f"Échecs: {len(result.failures)}")
     print(f"Erreurs: {len(result.errors)}")
+    print(f"Succès inattendus: {len(result.unexpectedSuccesses)}")
     
     if result.failures:
         print("\n❌ ÉCHECS SÉCURITÉ:")
@@ -441,7 +1560,7 @@ def run_security_test_suite():
     
     # Security posture assessment
     total_tests = result.testsRun
-    failed_tests = len(result.failures) + len(result.errors)
+    failed_tests = len(result.failures) + len(result.errors) + len(result.unexpectedSuccesses)
     success_rate = ((total_tests - failed_tests) / total_tests) * 100
     
     print(f"\n📈 SCORE SÉCURITÉ: {success_rate:.1f}%")
@@ -453,7 +1572,46 @@ def run_security_test_suite():
     else:
         print("🚨 SÉCURITÉ: CRITIQUE - REMÉDIATION IMMÉDIATE")
     
+    # Historique durées/statuts pour suivi tendances
+    history = SecurityTestHistory()
+    run_id = history.record_run(result.test_timings, success_rate)
+    print(f"🗄️ Run {run_id} enregistré dans {history.db_path}")
+    
     return result
 
+def report_security_test_trends(threshold: float = 0.25, window: int = 30):
+    """Rapport percentiles + régressions de durée des tests sécurité"""
+    history = SecurityTestHistory()
+    report = history.regression_report(threshold=threshold, window=window)
+    report_path = history.write_report(report)
+    
+    print("📈 TENDANCES TESTS SÉCURITÉ")
+    print("=" * 50)
+    for test_id, stats in report['tests'].items():
+        print(f"- {test_id}: p50={stats['p50_s']} p90={stats['p90_s']} "
+              f"p99={stats['p99_s']} dernier={stats.get('latest_s')}")
+    
+    if report['regressions']:
+        print(f"\n⚠️ RÉGRESSIONS (> +{threshold:.0%} vs médiane):")
+        for regression in report['regressions']:
+            print(f"- {regression['test_id']}: x{regression['ratio_vs_p50']}")
+    else:
+        print("\n✅ Aucune régression de durée détectée")
+    
+    print(f"\nRapport: {report_path}")
+    return report
+
 if __name__ == "__main__":
-    run_security_test_suite()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="BMAD MCP security testing suite")
+    subparsers = parser.add_subparsers(dest='command')
+    report_parser = subparsers.add_parser('report', help="Rapport tendances durées tests")
+    report_parser.add_argument('--threshold', type=float, default=0.25,
+                               help="Seuil régression (ratio vs médiane, défaut 0.25)")
+    report_parser.add_argument('--window', type=int, default=30,
+                               help="Nombre de runs historiques comparés")
+    args = parser.parse_args()
+    
+    if args.command == 'report':
+        report_security_test_trends(threshold=args.threshold, window=args.window)
+    else:
+        run_security_test_suite()
\ No newline at end of file